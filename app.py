@@ -2,6 +2,7 @@ from datetime import timedelta
 from flask import Flask, redirect, session
 
 from config import Config
+from models import SessionLocal
 from core.db_init import init_database
 
 # Импортируем Blueprint-ы
@@ -16,6 +17,7 @@ from core.curator_bp import curator_bp
 from core.starosta import starosta_bp
 from core.tech_bp import tech_bp
 from core.chat_bp import chat_bp  # <--- [1] Импортируем ЧАТ
+from core.assets_bp import init_assets
 
 # ───────────────── helpers для шаблонов ─────────────────
 
@@ -49,6 +51,13 @@ app.permanent_session_lifetime = timedelta(days=30)
 # Инициализация базы
 init_database()
 
+
+@app.teardown_appcontext
+def remove_db_session(exc=None):
+    """Возвращаем соединение в пул после каждого запроса (scoped_session)."""
+    SessionLocal.remove()
+
+
 # Регистрация блюпринтов
 app.register_blueprint(auth_bp)
 app.register_blueprint(checkin_bp)
@@ -62,6 +71,9 @@ app.register_blueprint(starosta_bp)
 app.register_blueprint(tech_bp)
 app.register_blueprint(chat_bp)  # <--- [2] Регистрируем ЧАТ
 
+# статика с отпечатками в именах (/assets/...), см. core.assets
+init_assets(app)
+
 # Регистрация Jinja-фильтров
 app.jinja_env.filters["status_label"] = status_label
 
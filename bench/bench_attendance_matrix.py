@@ -0,0 +1,185 @@
+"""
+Бенчмарк: семестровая статистика группы — три способа посчитать одно и то же.
+
+  * legacy  — прежний _detailed_student_table: ORM-объекты отметок и цикл
+              Python с разбором причин по каждой отметке;
+  * summary — build_group_report(engine="summary"): суммы по attendance_daily;
+  * matrix  — build_group_report(engine="matrix"): сырые отметки в NumPy;
+  * reduce  — только векторные свёртки уже загруженной AttendanceMatrix
+              (status_counts/reason_counts/percentages) — сколько стоит сама
+              арифметика без чтения из БД.
+
+Перед замерами строки всех способов сверяются между собой.
+
+Запуск (из корня репозитория):
+    python bench/bench_attendance_matrix.py --students 30 --days 120 --rounds 20
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, time as dtime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+PERIODS = ["p1", "p2", "p3", "p4", "p5", "p6"]
+STATUSES = ["present", "present", "present", "late", "absent", "excused"]
+REASONS = [None, "", "заявление", "по болезни", "sick", "соревнования", "семейные"]
+START = date(2025, 9, 1)
+
+
+def _legacy_table(SessionLocal, Attendance, PeriodSkip, Student, group_id, start, end):
+    """Прежний подсчёт (до attendance_daily), перенесён без изменений логики."""
+    from sqlalchemy import and_
+
+    hours = 2
+    with SessionLocal() as s:
+        students = (
+            s.query(Student).filter(Student.group_id == group_id)
+            .order_by(Student.full_name).all()
+        )
+        records = (
+            s.query(Attendance)
+            .join(Student, Student.id == Attendance.student_id)
+            .outerjoin(
+                PeriodSkip,
+                and_(
+                    PeriodSkip.date == Attendance.date,
+                    PeriodSkip.period_code == Attendance.period_code,
+                    PeriodSkip.group_id == Student.group_id,
+                ),
+            )
+            .filter(
+                Student.group_id == group_id,
+                Attendance.date >= start,
+                Attendance.date <= end,
+                Attendance.status.in_(["present", "absent", "late", "excused"]),
+                PeriodSkip.id.is_(None),
+            )
+            .all()
+        )
+
+    by_student: dict[int, list] = {}
+    for r in records:
+        by_student.setdefault(r.student_id, []).append(r)
+
+    rows = []
+    for idx, st in enumerate(students, start=1):
+        recs = by_student.get(st.id, [])
+        c = dict.fromkeys(("statement", "sick", "competition", "other", "unexcused"), 0)
+        missed = 0
+        for r in recs:
+            status = (r.status or "").strip().lower()
+            reason = (r.reason or "").strip().lower()
+            if status not in ("absent", "excused"):
+                continue
+            missed += 1
+            if "заяв" in reason or reason in ("application",):
+                c["statement"] += 1
+            elif "бол" in reason or reason in ("sick",):
+                c["sick"] += 1
+            elif "соревн" in reason or reason in ("competition", "contest"):
+                c["competition"] += 1
+            elif status == "absent":
+                c["unexcused"] += 1
+            else:
+                c["other"] += 1
+        total = len(recs)
+        rows.append({
+            "num": idx,
+            "full_name": st.full_name,
+            "total": missed * hours,
+            **{k: v * hours for k, v in c.items()},
+            "pct": (total - missed) * 100.0 / total if total else 100.0,
+        })
+    group_pct = sum(r["pct"] for r in rows) / len(rows) if rows else 0.0
+    return {"rows": rows, "group_pct": group_pct}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--students", type=int, default=30)
+    ap.add_argument("--days", type=int, default=120, help="учебных дней в семестре")
+    ap.add_argument("--rounds", type=int, default=20)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="ldo-bench-matrix-")
+    os.environ["DB_URL"] = f"sqlite:///{Path(tmp, 'bench.db').as_posix()}"
+
+    from sqlalchemy import select
+    from models import SessionLocal, Attendance, PeriodSkip, Student, get_or_create_group
+    from core.db_init import init_database
+    from core.matrix import AttendanceMatrix
+    from core.reports import build_group_report
+    from core.summary import rebuild
+
+    init_database()
+    rnd = random.Random(1)
+
+    with SessionLocal() as s:
+        gid = get_or_create_group(s, "BENCH-1").id
+        s.add_all(
+            Student(uid=f"s{i}", full_name=f"Студент {i:03d}", group_id=gid)
+            for i in range(args.students)
+        )
+        s.flush()
+        ids = s.execute(select(Student.id).where(Student.group_id == gid)).scalars().all()
+
+        days, d = [], START
+        while len(days) < args.days:
+            if d.weekday() < 5:
+                days.append(d)
+            d += timedelta(days=1)
+        end = days[-1]
+
+        rows = []
+        for d in days:
+            for sid in ids:
+                for pc in PERIODS:
+                    st = rnd.choice(STATUSES)
+                    reason = rnd.choice(REASONS) if st in ("absent", "excused") else None
+                    rows.append({"date": d, "period_code": pc, "student_id": sid,
+                                 "status": st, "reason": reason, "time": dtime(8, 0)})
+        s.execute(Attendance.__table__.insert(), rows)
+        for d in days[::10]:
+            s.add(PeriodSkip(date=d, period_code="p6", group_id=gid))
+        s.flush()
+        rebuild(s)
+        s.commit()
+
+    with SessionLocal() as s:
+        matrix = AttendanceMatrix.load(s, gid, START, end)
+
+    legacy = _legacy_table(SessionLocal, Attendance, PeriodSkip, Student, gid, START, end)
+    summary = build_group_report(gid, START, end, engine="summary").detail
+    vectorized = build_group_report(gid, START, end, engine="matrix").detail
+    assert legacy == summary == vectorized == matrix.detail(), "результаты расходятся"
+
+    def timed(fn) -> float:
+        fn()  # прогрев
+        started = time.perf_counter()
+        for _ in range(args.rounds):
+            fn()
+        return (time.perf_counter() - started) / args.rounds * 1000
+
+    def reduce():
+        counts = matrix.status_counts()
+        matrix.reason_counts()
+        matrix.percentages(counts)
+
+    print(f"students={args.students} days={args.days} periods={len(PERIODS)} "
+          f"marks={len(rows)} (в отчёте {len(matrix)}) rounds={args.rounds}")
+    print(f"{'legacy':>8} {timed(lambda: _legacy_table(SessionLocal, Attendance, PeriodSkip, Student, gid, START, end)):>9.2f} ms")
+    print(f"{'summary':>8} {timed(lambda: build_group_report(gid, START, end, engine='summary')):>9.2f} ms")
+    print(f"{'matrix':>8} {timed(lambda: build_group_report(gid, START, end, engine='matrix')):>9.2f} ms")
+    print(f"{'reduce':>8} {timed(reduce):>9.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
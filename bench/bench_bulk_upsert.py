@@ -0,0 +1,101 @@
+"""
+Бенчмарк: массовая отметка «вся группа × все пары дня».
+
+Сравнивает прежнюю схему (SELECT + INSERT/UPDATE на каждую ячейку через ORM)
+с core.attendance.upsert_attendance (один SELECT + один executemany upsert).
+Статус на каждой итерации меняется, чтобы мерить именно обновления.
+
+Запуск (из корня репозитория):
+    python bench/bench_bulk_upsert.py --students 30 --rounds 50
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+PERIODS = ["p1", "p2", "p3", "p4", "p5", "p6", "p7"]
+STATUSES = ["present", "late", "absent", "excused"]
+
+
+def _legacy_mark(s, Attendance, d, student_ids, status, now_t):
+    """Прежний _upsert_attendance: по запросу на каждую ячейку."""
+    for sid in student_ids:
+        for pc in PERIODS:
+            rec = (
+                s.query(Attendance)
+                .filter(
+                    Attendance.date == d,
+                    Attendance.period_code == pc,
+                    Attendance.student_id == sid,
+                )
+                .first()
+            )
+            if not rec:
+                s.add(Attendance(date=d, period_code=pc, time=now_t, student_id=sid,
+                                 status=status, reason=None))
+            else:
+                rec.time = now_t
+                rec.status = status
+                rec.reason = None
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--students", type=int, default=30)
+    ap.add_argument("--rounds", type=int, default=50)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="ldo-bench-upsert-")
+    os.environ["DB_URL"] = f"sqlite:///{Path(tmp, 'bench.db').as_posix()}"
+
+    from models import SessionLocal, Attendance, Student, get_or_create_group
+    from core.db_init import init_database
+    from core.attendance import upsert_attendance
+    from core.summary import refresh_daily
+
+    init_database()
+    with SessionLocal() as s:
+        gid = get_or_create_group(s, "PO-175").id
+        for i in range(args.students):
+            s.add(Student(uid=f"b{i}", full_name=f"Студент {i:03d}", group_id=gid))
+        s.commit()
+        student_ids = [sid for (sid,) in s.query(Student.id)]
+
+    cells = len(student_ids) * len(PERIODS)
+    print(f"students={len(student_ids)} periods={len(PERIODS)} cells={cells} rounds={args.rounds}")
+
+    def run(name, mark, d):
+        started = time.perf_counter()
+        for r in range(args.rounds):
+            status = STATUSES[r % len(STATUSES)]
+            now_t = datetime.now().time()
+            with SessionLocal() as s:
+                mark(s, d, status, now_t)
+                s.commit()
+        per_round = (time.perf_counter() - started) / args.rounds * 1000
+        print(f"{name:<10} {per_round:8.2f} ms/mark  {cells / per_round * 1000:10.0f} cells/s")
+
+    def legacy(s, d, status, now_t):
+        _legacy_mark(s, Attendance, d, student_ids, status, now_t)
+        refresh_daily(s, [(sid, d) for sid in student_ids])
+
+    def bulk(s, d, status, now_t):
+        upsert_attendance(
+            s, [(d, pc, sid, status, None, now_t) for sid in student_ids for pc in PERIODS]
+        )
+
+    # разные даты, чтобы оба варианта начинали с пустого дня
+    run("legacy", legacy, date(2025, 9, 2))
+    run("upsert", bulk, date(2025, 9, 3))
+
+
+if __name__ == "__main__":
+    main()
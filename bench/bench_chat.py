@@ -0,0 +1,227 @@
+"""
+Бенчмарк: чат техподдержки — хранение по парам ФИО и по диалогам.
+
+Одни и те же сообщения лежат в двух видах:
+  * fio          — прежняя chat_messages (sender_fio / recipient_fio и
+                   индексы до миграции m012), запросы — как были в chat_bp;
+  * conversation — текущая схема: участники, conversations,
+                   chat_messages.conversation_id и индекс (conversation_id, id).
+
+Меряются список собеседников (первая страница), страница истории
+длинного диалога, догрузка новых после last_id и пометка «прочитано».
+История и догрузка в обоих видах — голый SQL (без построения объектов
+ORM), чтобы сравнивались только доступ к данным. Перед замерами
+результаты обоих видов сверяются (для текущей схемы — через chat_bp).
+
+Запуск (из корня репозитория):
+    python bench/bench_chat.py --students 3000 --messages 20 --heavy 20000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# прежняя таблица (как после m011) — под другим именем рядом с текущей
+FIO_DDL = (
+    "CREATE TABLE chat_fio (id INTEGER PRIMARY KEY, sender_fio VARCHAR(255) NOT NULL, "
+    "recipient_fio VARCHAR(255) NOT NULL, message TEXT NOT NULL, "
+    "created_at DATETIME NOT NULL, is_read BOOLEAN NOT NULL)",
+    "CREATE INDEX ix_chat_fio_recipient_fio ON chat_fio (recipient_fio)",
+    "CREATE INDEX ix_chat_fio_recipient_read ON chat_fio (recipient_fio, is_read)",
+    "CREATE INDEX ix_chat_fio_pair ON chat_fio (sender_fio, recipient_fio, id)",
+)
+
+FIO_SIDEBAR = """
+WITH conv AS (
+    SELECT CASE WHEN sender_fio = :me THEN recipient_fio ELSE sender_fio END AS fio,
+           max(id) AS last_id,
+           sum(CASE WHEN recipient_fio = :me AND is_read = 0 THEN 1 ELSE 0 END) AS unread
+    FROM chat_fio WHERE sender_fio = :me OR recipient_fio = :me
+    GROUP BY 1
+)
+SELECT conv.fio, m.message, conv.unread FROM (
+    SELECT * FROM conv ORDER BY last_id DESC LIMIT :limit
+) conv JOIN chat_fio m ON m.id = conv.last_id
+ORDER BY conv.last_id DESC
+"""
+FIO_HISTORY = """
+SELECT * FROM chat_fio WHERE id IN (
+    SELECT id FROM (SELECT id FROM chat_fio WHERE sender_fio = :a AND recipient_fio = :b
+                    AND id < :before ORDER BY id DESC LIMIT :limit)
+    UNION ALL
+    SELECT id FROM (SELECT id FROM chat_fio WHERE sender_fio = :b AND recipient_fio = :a
+                    AND id < :before ORDER BY id DESC LIMIT :limit)
+) ORDER BY id DESC LIMIT :limit
+"""
+FIO_AFTER = """
+SELECT * FROM chat_fio WHERE id > :last_id AND (
+    (sender_fio = :a AND recipient_fio = :b) OR (sender_fio = :b AND recipient_fio = :a)
+) ORDER BY id
+"""
+FIO_READ = ("UPDATE chat_fio SET is_read = 1 "
+            "WHERE sender_fio = :b AND recipient_fio = :a AND is_read = 0")
+
+# то же для текущей схемы — SQL, который строят _history / _conversation_after
+CONV_HISTORY = """
+SELECT * FROM chat_messages WHERE conversation_id = :conv AND id < :before
+ORDER BY id DESC LIMIT :limit
+"""
+CONV_AFTER = "SELECT * FROM chat_messages WHERE conversation_id = :conv AND id > :last_id ORDER BY id"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--students", type=int, default=3000, help="студентов, писавших в поддержку")
+    ap.add_argument("--messages", type=int, default=20, help="сообщений на обычный диалог")
+    ap.add_argument("--heavy", type=int, default=20000, help="сообщений в одном длинном диалоге")
+    ap.add_argument("--rounds", type=int, default=20)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="ldo-bench-chat-")
+    os.environ["DB_URL"] = f"sqlite:///{Path(tmp, 'bench.db').as_posix()}"
+
+    from sqlalchemy import text
+    from models import (
+        SessionLocal, ChatMessage, ChatParticipant, Conversation, Student, get_or_create_group,
+    )
+    from core.db_init import init_database
+    from core.chat_bp import (
+        TECH_NAME, CHAT_HISTORY_PAGE, CHAT_SIDEBAR_PAGE,
+        _conversation_after, _history, _support_id, _tech_conversations,
+    )
+
+    init_database()
+    rnd = random.Random(1)
+    started = datetime(2025, 9, 1)
+
+    with SessionLocal() as s:
+        support = _support_id(s)
+        gids = [get_or_create_group(s, f"ПО-{n:03d}").id for n in range(args.students // 25 + 1)]
+        names = [f"Студент {i:05d}" for i in range(args.students)]
+        s.add_all(
+            Student(uid=f"s{i}", full_name=name, group_id=gids[i // 25])
+            for i, name in enumerate(names)
+        )
+        s.flush()
+        s.add_all(
+            ChatParticipant(kind="student", student_id=sid, name=name)
+            for sid, name in s.query(Student.id, Student.full_name)
+        )
+        s.flush()
+        pids = dict(s.query(ChatParticipant.name, ChatParticipant.id)
+                    .filter(ChatParticipant.kind == "student"))
+        s.add_all(Conversation(a_id=support, b_id=pids[name]) for name in names)
+        s.flush()
+        convs = dict(s.query(Conversation.b_id, Conversation.id))
+
+        rows = []
+        for n, name in enumerate(names):
+            for k in range(args.heavy if n == 0 else args.messages):
+                incoming = k % 2 == 0
+                rows.append({
+                    "name": name, "incoming": incoming, "message": f"сообщение {k}",
+                    "created_at": started + timedelta(minutes=rnd.randint(0, 60 * 24 * 90)),
+                    "is_read": not incoming or rnd.random() < 0.8,
+                })
+        rows.sort(key=lambda r: r["created_at"])  # id растёт вместе со временем, как в жизни
+        for i, r in enumerate(rows, 1):
+            r["id"] = i
+        s.execute(ChatMessage.__table__.insert(), [
+            {"id": r["id"], "conversation_id": convs[pids[r["name"]]],
+             "sender_id": pids[r["name"]] if r["incoming"] else support,
+             "message": r["message"], "created_at": r["created_at"], "is_read": r["is_read"]}
+            for r in rows
+        ])
+        for ddl in FIO_DDL:
+            s.execute(text(ddl))
+        s.execute(text(
+            "INSERT INTO chat_fio VALUES (:id, :sender_fio, :recipient_fio, :message, "
+            ":created_at, :is_read)"
+        ), [
+            {"id": r["id"], "sender_fio": r["name"] if r["incoming"] else TECH_NAME,
+             "recipient_fio": TECH_NAME if r["incoming"] else r["name"],
+             "message": r["message"], "created_at": r["created_at"], "is_read": r["is_read"]}
+            for r in rows
+        ])
+        s.commit()
+        s.execute(text("ANALYZE"))
+
+    heavy, heavy_pid = names[0], pids[names[0]]
+    heavy_conv = convs[heavy_pid]
+    before = max(r["id"] for r in rows if r["name"] == heavy) + 1
+    last_id = before - 1 - args.heavy // 10  # догрузка хвоста длинного диалога
+
+    def fio_sidebar(s):
+        return s.execute(text(FIO_SIDEBAR), {"me": TECH_NAME, "limit": CHAT_SIDEBAR_PAGE}).all()
+
+    def fio_history(s):
+        return s.execute(text(FIO_HISTORY), {"a": TECH_NAME, "b": heavy, "before": before,
+                                             "limit": CHAT_HISTORY_PAGE}).all()
+
+    def fio_after(s):
+        return s.execute(text(FIO_AFTER), {"a": TECH_NAME, "b": heavy, "last_id": last_id}).all()
+
+    def conv_history(s):
+        return s.execute(text(CONV_HISTORY), {"conv": heavy_conv, "before": before,
+                                              "limit": CHAT_HISTORY_PAGE}).all()
+
+    def conv_after(s):
+        return s.execute(text(CONV_AFTER), {"conv": heavy_conv, "last_id": last_id}).all()
+
+    def fio_read(s):
+        s.execute(text(FIO_READ), {"a": TECH_NAME, "b": heavy})
+        s.rollback()
+
+    def conv_read(s):
+        s.query(ChatMessage).filter(
+            ChatMessage.conversation_id == heavy_conv,
+            ChatMessage.sender_id == heavy_pid,
+            ChatMessage.is_read == False,
+        ).update({"is_read": True}, synchronize_session=False)
+        s.rollback()
+
+    with SessionLocal() as s:
+        sidebar, _ = _tech_conversations(s, support, 0)
+        assert [u["fio"] for u in sidebar] == [r[0] for r in fio_sidebar(s)], "списки расходятся"
+        assert [u["unread"] for u in sidebar] == [r[2] for r in fio_sidebar(s)], "непрочитанные"
+        page, _ = _history(s, heavy_conv, before)
+        assert [m.id for m in page] == sorted(r.id for r in fio_history(s)), "история расходится"
+        assert [m.id for m in page] == sorted(r.id for r in conv_history(s))
+        tail = _conversation_after(s, heavy_conv, last_id)
+        assert [m["id"] for m in tail] == [r.id for r in fio_after(s)], "догрузка расходится"
+        assert [m["id"] for m in tail] == [r.id for r in conv_after(s)]
+
+    cases = [
+        ("список", fio_sidebar, lambda s: _tech_conversations(s, support, 0)),
+        ("история", fio_history, conv_history),
+        ("догрузка", fio_after, conv_after),
+        ("прочитано", fio_read, conv_read),
+    ]
+
+    def timed(fn) -> float:
+        with SessionLocal() as s:
+            fn(s)  # прогрев
+        t0 = time.perf_counter()
+        for _ in range(args.rounds):
+            with SessionLocal() as s:
+                fn(s)
+        return (time.perf_counter() - t0) / args.rounds * 1000
+
+    print(f"students={args.students} messages={len(rows)} heavy={args.heavy} "
+          f"rounds={args.rounds}")
+    print(f"{'':>10} {'fio':>9} {'conversation':>13}")
+    for label, fio_fn, conv_fn in cases:
+        print(f"{label:>10} {timed(fio_fn):>7.2f}ms {timed(conv_fn):>11.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Бенчмарк: конкурентная запись в /checkin/quick и /student/checkin.
+
+Имитирует пик первой пары: несколько процессов (как воркеры gunicorn)
+одновременно отмечают студентов. Сравниваются два профиля SQLite:
+    off — «голый» SQLite (rollback-journal), как было раньше
+    wal — WAL + busy_timeout + настроенные PRAGMA (models.make_engine)
+
+Запуск (из корня репозитория):
+    python bench/bench_checkin_concurrency.py --workers 4 --requests 200
+"""
+from __future__ import annotations
+
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+GROUP = "PO-175"
+CURATOR = "Брусенко Владислав Сергеевич"
+STUDENTS = 30
+
+
+def _pin_clock():
+    """Фиксируем «сейчас идёт пара p1 во вторник», чтобы бенчмарк не зависел от даты запуска."""
+    import config
+    import core.helpers
+    import core.checkin_bp
+    import core.student_bp
+
+    def schedule(_group_id=None, _d=None):
+        return config.COMPILED_WEEKLY_SCHEDULE[1]  # вторник
+
+    core.helpers.now_minutes = lambda _dt=None: config.to_minutes("08:00")
+    core.checkin_bp.schedule_for = schedule
+    core.student_bp.schedule_for = schedule
+
+
+def _seed():
+    from models import SessionLocal, Student, get_or_create_group
+    from core.db_init import init_database
+
+    init_database()
+    with SessionLocal() as s:
+        gid = get_or_create_group(s, GROUP).id
+        for i in range(STUDENTS):
+            s.add(Student(uid=f"b{i}", full_name=f"Студент {i:03d}", group_id=gid))
+        s.commit()
+        return [sid for (sid,) in s.query(Student.id).order_by(Student.id)]
+
+
+def _worker(args):
+    worker_no, n_requests, student_ids = args
+    from app import app
+
+    _pin_clock()
+    curator = app.test_client()
+    with curator.session_transaction() as sess:
+        sess["user"] = {"role": "curator", "fio": CURATOR}
+    student = app.test_client()
+    with student.session_transaction() as sess:
+        sess["user"] = {"role": "student", "fio": f"Студент {worker_no % STUDENTS:03d}"}
+
+    ok = errors = 0
+    started = time.perf_counter()
+    for i in range(n_requests):
+        try:
+            if i % 2:
+                resp = student.post("/student/checkin")
+                good = resp.status_code == 302
+            else:
+                sid = student_ids[(worker_no * 7 + i) % len(student_ids)]
+                resp = curator.post(
+                    "/checkin/quick", data={"student_id": sid, "status": "present"}
+                )
+                good = resp.status_code == 200
+        except Exception:
+            good = False
+        if good:
+            ok += 1
+        else:
+            errors += 1
+    return ok, errors, time.perf_counter() - started
+
+
+def run_profile(profile: str, workers: int, n_requests: int) -> dict:
+    tmp = tempfile.mkdtemp(prefix=f"ldo-bench-{profile}-")
+    os.environ["DB_URL"] = f"sqlite:///{Path(tmp, 'bench.db').as_posix()}"
+    os.environ["DB_SQLITE_PROFILE"] = profile
+    os.environ["FLASK_DEBUG"] = "0"
+
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(1) as pool:
+        student_ids = pool.apply(_seed)
+
+    started = time.perf_counter()
+    with ctx.Pool(workers) as pool:
+        results = pool.map(
+            _worker, [(w, n_requests, student_ids) for w in range(workers)]
+        )
+    wall = time.perf_counter() - started
+
+    ok = sum(r[0] for r in results)
+    errors = sum(r[1] for r in results)
+    busy = sum(r[2] for r in results)
+    return {
+        "profile": profile,
+        "ok": ok,
+        "errors": errors,
+        "wall_s": wall,
+        "rps": ok / busy * workers if busy else 0.0,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--requests", type=int, default=200, help="запросов на воркер")
+    args = ap.parse_args()
+
+    print(f"workers={args.workers} requests/worker={args.requests}")
+    print(f"{'profile':<8} {'ok':>6} {'errors':>7} {'wall, s':>9} {'req/s':>9}")
+    for profile in ("off", "wal"):
+        r = run_profile(profile, args.workers, args.requests)
+        print(
+            f"{r['profile']:<8} {r['ok']:>6} {r['errors']:>7} "
+            f"{r['wall_s']:>9.2f} {r['rps']:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
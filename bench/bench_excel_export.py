@@ -0,0 +1,197 @@
+"""
+Бенчмарк: выгрузка Excel за семестр по всему отделению (лист на группу).
+
+  * inmemory — прежний способ: обычный Workbook, ячейки по одной
+               (как было в group_export_excel), затем save в BytesIO;
+  * stream   — core.excel: write-only книга, .xlsx отдаётся кусками
+               через stream_workbook (куски здесь просто считаются).
+
+Для каждого способа: общее время, время до первого куска и пик памяти
+Python (tracemalloc, отдельным прогоном). Ступени по числу групп показывают, что у stream
+пик не растёт с размером отделения.
+
+Запуск (из корня репозитория):
+    python bench/bench_excel_export.py --groups 10,50,200 --students 25
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from io import BytesIO
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+START = date(2025, 9, 1)
+END = date(2025, 12, 31)
+COLS = ("present", "late", "absent", "excused",
+        "statement", "sick", "competition", "other", "unexcused")
+
+
+def _legacy_sheet(ws, g, period_title, detail):
+    """Разметка листа из прежнего group_export_excel (обычный режим openpyxl)."""
+    from openpyxl.styles import Alignment, Font, Border, Side
+
+    bold = Font(bold=True)
+    thin = Side(style="thin")
+    border_all = Border(left=thin, right=thin, top=thin, bottom=thin)
+    center = Alignment(horizontal="center", vertical="center", wrap_text=True)
+    left = Alignment(horizontal="left", vertical="center", wrap_text=True)
+
+    ws.merge_cells("A2:I2")
+    ws["A2"].value = f"Посещаемость группы {g} {period_title}"
+    ws["A2"].font = Font(bold=True, size=14)
+    ws["A2"].alignment = center
+    for ref, v in (("A5", "№"), ("B5", "Аты жөні"), ("C5", "Всего пропусков(кол-во часов)"),
+                   ("D5", "В том числе"), ("I5", "Процент посещаемости"),
+                   ("D6", "Заявление"), ("E6", "По болезни"), ("F6", "Соревнования"),
+                   ("G6", "Другое"), ("H6", "По неуважительной причине")):
+        ws[ref].value = v
+    for ref in ("A5:A6", "B5:B6", "C5:C6", "D5:H5", "I5:I6"):
+        ws.merge_cells(ref)
+    for row in (5, 6):
+        for col in range(1, 10):
+            cell = ws.cell(row=row, column=col)
+            cell.font, cell.alignment, cell.border = bold, center, border_all
+    for col, width in zip("ABCDEFGHI", (4, 30, 18, 12, 12, 14, 12, 22, 18)):
+        ws.column_dimensions[col].width = width
+
+    row_idx = 7
+    for r in detail["rows"]:
+        values = (r["num"], r["full_name"], r["total"], r["statement"], r["sick"],
+                  r["competition"], r["other"], r["unexcused"], round(r["pct"], 2))
+        for col, v in enumerate(values, start=1):
+            cell = ws.cell(row=row_idx, column=col, value=v)
+            cell.alignment = left if col == 2 else center
+            cell.border = border_all
+        row_idx += 1
+    ws.merge_cells(start_row=row_idx, start_column=1, end_row=row_idx, end_column=8)
+    ws.cell(row=row_idx, column=1, value="Посещаемость по группе").font = bold
+    ws.cell(row=row_idx, column=9, value=round(detail["group_pct"], 2)).font = bold
+    for col in range(1, 10):
+        ws.cell(row=row_idx, column=col).border = border_all
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--groups", default="10,50,200", help="ступени числа групп через запятую")
+    ap.add_argument("--students", type=int, default=25, help="студентов в группе")
+    args = ap.parse_args()
+    steps = sorted(int(x) for x in args.groups.split(","))
+
+    tmp = tempfile.mkdtemp(prefix="ldo-bench-excel-")
+    os.environ["DB_URL"] = f"sqlite:///{Path(tmp, 'bench.db').as_posix()}"
+
+    from openpyxl import Workbook, load_workbook
+    from sqlalchemy import select
+    from models import SessionLocal, AttendanceDaily, Student, get_or_create_group
+    from core.db_init import init_database
+    from core.excel import add_sheet, stream_workbook, write_group_sheet, write_summary_sheet
+    from core.reports import build_group_report
+
+    init_database()
+    rnd = random.Random(1)
+    days = [START + timedelta(days=k) for k in range((END - START).days + 1)]
+    days = [d for d in days if d.weekday() < 5]
+
+    groups: list[tuple[str, int]] = []
+
+    def add_groups(first: int, last: int):
+        with SessionLocal() as s:
+            for n in range(first, last):
+                code = f"ПО-{n:03d}"
+                gid = get_or_create_group(s, code).id
+                groups.append((code, gid))
+                s.add_all(
+                    Student(uid=f"g{n}s{i}", full_name=f"Студент {n:03d}-{i:02d}", group_id=gid)
+                    for i in range(args.students)
+                )
+                s.flush()
+                ids = s.execute(select(Student.id).where(Student.group_id == gid)).scalars().all()
+                rows = []
+                for sid in ids:
+                    for d in days:
+                        row = dict.fromkeys(COLS, 0)
+                        row.update(student_id=sid, date=d, group_id=gid)
+                        row["present"] = rnd.randint(3, 6)
+                        row["absent"] = row["unexcused"] = rnd.randint(0, 1)
+                        row["excused"] = row["sick"] = rnd.randint(0, 1)
+                        rows.append(row)
+                s.execute(AttendanceDaily.__table__.insert(), rows)
+            s.commit()
+
+    period_title = f"за семестр ({START:%d.%m.%Y}–{END:%d.%m.%Y})"
+
+    def inmemory() -> tuple[int, float]:
+        wb = Workbook()
+        wb.remove(wb.active)
+        for code, gid in groups:
+            _legacy_sheet(wb.create_sheet(code), code, period_title,
+                          build_group_report(gid, START, END).detail)
+        out = BytesIO()
+        wb.save(out)
+        return len(out.getvalue()), 0.0
+
+    def stream() -> tuple[int, float]:
+        summary = []
+
+        def group_sheet(code, gid):
+            def fill_sheet(ws):
+                detail = build_group_report(gid, START, END).detail
+                write_group_sheet(ws, code, period_title, detail)
+                summary.append((code, len(detail["rows"]), detail["group_pct"]))
+            return fill_sheet
+
+        def fill(wb):
+            for code, gid in groups:
+                add_sheet(wb, code, group_sheet(code, gid))
+            add_sheet(wb, "Сводка", lambda ws: write_summary_sheet(ws, "Сводка", summary))
+
+        started = time.perf_counter()
+        size, first = 0, None
+        for chunk in stream_workbook(fill):
+            if first is None:
+                first = time.perf_counter() - started
+            size += len(chunk)
+        return size, first * 1000
+
+    def measure(fn):
+        started = time.perf_counter()
+        size, ttfb = fn()
+        elapsed = (time.perf_counter() - started) * 1000
+        # память — отдельным прогоном: под tracemalloc всё заметно медленнее
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return elapsed, ttfb, peak / 2**20, size / 2**10
+
+    print(f"students/group={args.students} days={len(days)} (семестр)")
+    print(f"{'groups':>7} {'method':>9} {'total ms':>9} {'ttfb ms':>8} {'peak MiB':>9} {'size KiB':>9}")
+    for total in steps:
+        add_groups(len(groups), total)
+        for name, fn in (("inmemory", inmemory), ("stream", stream)):
+            elapsed, ttfb, peak, size = measure(fn)
+            ttfb_s = f"{ttfb:>8.0f}" if ttfb else f"{'—':>8}"
+            print(f"{len(groups):>7} {name:>9} {elapsed:>9.0f} {ttfb_s} {peak:>9.1f} {size:>9.0f}")
+
+    # потоковая книга читается и содержит все листы
+    buf = BytesIO()
+    for chunk in stream_workbook(lambda wb: [
+        add_sheet(wb, code, lambda ws, code=code, gid=gid: write_group_sheet(
+            ws, code, period_title, build_group_report(gid, START, END).detail))
+        for code, gid in groups
+    ]):
+        buf.write(chunk)
+    assert len(load_workbook(buf, read_only=True).sheetnames) == len(groups)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Бенчмарк: /journal куратора при росте числа групп в колледже.
+
+У куратора всегда 2 группы; остальные группы колледжа добавляются
+ступенями (--groups 10,50,200). На каждой ступени меряется:
+  * legacy — прежняя выборка всех отметок дня (s.query(Attendance) по дате);
+  * scoped — выборка, которую теперь делает журнал (только его студенты, 5 колонок);
+  * route  — полный GET /journal через test_client.
+Время legacy растёт с размером колледжа, scoped/route — остаются ровными.
+
+Запуск (из корня репозитория):
+    python bench/bench_journal_scaling.py --groups 10,50,200 --students 25 --rounds 30
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, time as dtime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+PERIODS = ["p1", "p2", "p3", "p4", "p5", "p6", "p7"]
+STATUSES = ["present", "present", "late", "absent", "excused"]
+DAY = date(2025, 9, 2)  # вторник
+CURATOR = "Куратор Бенчмарк"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--groups", default="10,50,200", help="ступени числа групп через запятую")
+    ap.add_argument("--students", type=int, default=25, help="студентов в группе")
+    ap.add_argument("--rounds", type=int, default=30)
+    args = ap.parse_args()
+    steps = sorted(int(x) for x in args.groups.split(","))
+
+    tmp = tempfile.mkdtemp(prefix="ldo-bench-journal-")
+    os.environ["DB_URL"] = f"sqlite:///{Path(tmp, 'bench.db').as_posix()}"
+
+    from sqlalchemy import select
+    from models import SessionLocal, Attendance, RoleScope, Student, get_or_create_group
+    from core.db_init import init_database
+    from app import app
+
+    init_database()
+
+    def add_groups(first: int, last: int) -> list[int]:
+        with SessionLocal() as s:
+            gids = []
+            for n in range(first, last):
+                gid = get_or_create_group(s, f"G-{n:04d}").id
+                gids.append(gid)
+                s.add_all(
+                    Student(uid=f"g{n}s{i}", full_name=f"Студент {n:04d}-{i:02d}", group_id=gid)
+                    for i in range(args.students)
+                )
+            s.flush()
+            ids = s.execute(select(Student.id).where(Student.group_id.in_(gids))).scalars().all()
+            s.execute(
+                Attendance.__table__.insert(),
+                [
+                    {"date": DAY, "period_code": pc, "student_id": sid,
+                     "status": STATUSES[(sid + k) % len(STATUSES)], "reason": None,
+                     "time": dtime(8, 0)}
+                    for sid in ids for k, pc in enumerate(PERIODS)
+                ],
+            )
+            s.commit()
+            return gids
+
+    def timed(fn) -> float:
+        fn()  # прогрев
+        started = time.perf_counter()
+        for _ in range(args.rounds):
+            fn()
+        return (time.perf_counter() - started) / args.rounds * 1000
+
+    curator_gids = add_groups(0, 2)
+    with SessionLocal() as s:
+        s.add_all(RoleScope(role="curator", fio=CURATOR, group_id=g) for g in curator_gids)
+        s.commit()
+        curator_ids = s.execute(
+            select(Student.id).where(Student.group_id.in_(curator_gids))
+        ).scalars().all()
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["user"] = {"role": "curator", "fio": CURATOR}
+
+    def legacy():
+        with SessionLocal() as s:
+            s.query(Attendance).filter(Attendance.date == DAY).all()
+
+    def scoped():
+        with SessionLocal() as s:
+            s.execute(
+                select(
+                    Attendance.student_id, Attendance.period_code, Attendance.status,
+                    Attendance.reason, Attendance.time,
+                ).where(Attendance.student_id.in_(curator_ids), Attendance.date == DAY)
+            ).all()
+
+    def route():
+        r = client.get(f"/journal?d={DAY:%Y-%m-%d}")
+        assert r.status_code == 200, r.status_code
+
+    print(f"students/group={args.students} periods={len(PERIODS)} rounds={args.rounds}")
+    print(f"{'groups':>7} {'marks/day':>10} {'legacy ms':>10} {'scoped ms':>10} {'route ms':>10}")
+    have = 2
+    for total in steps:
+        if total > have:
+            add_groups(have, total)
+            have = total
+        marks = have * args.students * len(PERIODS)
+        print(f"{have:>7} {marks:>10} {timed(legacy):>10.2f} {timed(scoped):>10.2f} "
+              f"{timed(route):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 # config.py
 from __future__ import annotations
+from bisect import bisect_right
+from dataclasses import dataclass, field
 from datetime import datetime, date
 import os
 from pathlib import Path
@@ -61,10 +63,84 @@ WEEKLY_SCHEDULE = {
 }
 
 
-def get_schedule_for(dt: date | datetime | None = None) -> list[dict]:
+# ── Скомпилированное расписание ──
+# Списки выше — для людей ("HH:MM"). Для кода они один раз превращаются
+# в неизменяемые объекты с минутами от полуночи, чтобы не разбирать строки
+# на каждую клетку журнала.
+
+
+@dataclass(frozen=True, slots=True)
+class Period:
+    code: str
+    title: str
+    start: str  # "HH:MM" — для отображения
+    end: str
+    start_min: int  # минуты от полуночи — для расчётов
+    end_min: int
+
+    @property
+    def is_pair(self) -> bool:
+        """Учебная пара (p1..p7), а не классный час и т.п."""
+        return self.code.startswith("p")
+
+
+@dataclass(frozen=True, slots=True)
+class Schedule:
+    """Расписание дня: пары по возрастанию начала + индекс для bisect."""
+    periods: tuple[Period, ...] = ()
+    starts: tuple[int, ...] = field(default=(), repr=False)
+    by_code: dict = field(default_factory=dict, repr=False, compare=False)
+
+    def __iter__(self):
+        return iter(self.periods)
+
+    def __len__(self) -> int:
+        return len(self.periods)
+
+    def __getitem__(self, i):
+        return self.periods[i]
+
+    def get(self, code: str) -> Period | None:
+        return self.by_code.get(code)
+
+    def index_at(self, minutes: int) -> int:
+        """Индекс пары, идущей в момент minutes (-1 — сейчас пары нет)."""
+        i = bisect_right(self.starts, minutes) - 1
+        if i >= 0 and minutes <= self.periods[i].end_min:
+            return i
+        return -1
+
+
+def compile_schedule(items: list[dict]) -> Schedule:
+    periods = tuple(sorted(
+        (
+            Period(
+                code=p["code"],
+                title=p["title"],
+                start=p["start"],
+                end=p["end"],
+                start_min=to_minutes(p["start"]),
+                end_min=to_minutes(p["end"]),
+            )
+            for p in items
+        ),
+        key=lambda p: p.start_min,
+    ))
+    return Schedule(
+        periods=periods,
+        starts=tuple(p.start_min for p in periods),
+        by_code={p.code: p for p in periods},
+    )
+
+
+COMPILED_WEEKLY_SCHEDULE = {wd: compile_schedule(items) for wd, items in WEEKLY_SCHEDULE.items()}
+EMPTY_SCHEDULE = compile_schedule([])
+
+
+def get_schedule_for(dt: date | datetime | None = None) -> Schedule:
     d = dt or datetime.now()
     wd = d.weekday()
-    return WEEKLY_SCHEDULE.get(wd, [])
+    return COMPILED_WEEKLY_SCHEDULE.get(wd, EMPTY_SCHEDULE)
 
 
 # ==== БЛОК КОНФИГА FLASK-ПРИЛОЖЕНИЯ ====
@@ -1,9 +1,11 @@
 from flask import Blueprint, jsonify, request, session
 from models import SessionLocal, Student, Attendance
 from datetime import datetime, date
-from config import get_schedule_for, to_minutes, LATE_GRACE_MIN
+from config import LATE_GRACE_MIN
 from core.helpers import current_period_index
+from core.schedule import schedule_for
 from core.permissions import student_in_curator_scope
+from core.summary import refresh_daily
 
 api_bp = Blueprint("api_bp", __name__)
 
@@ -21,7 +23,6 @@ def api_checkin():
 
     today_d = date.today()
     now_t = datetime.now().time()
-    schedule = get_schedule_for(today_d)
 
     with SessionLocal() as s:
         st = s.query(Student).filter_by(uid=uid).first()
@@ -34,11 +35,13 @@ def api_checkin():
             if not student_in_curator_scope(user.get("fio", ""), st.id):
                 return jsonify({"ok": False, "error": "not_allowed"}), 403
 
+        schedule = schedule_for(st.group_id, today_d)
+
         if not period_code:
             idx = current_period_index(schedule=schedule)
             if idx < 0:
                 return jsonify({"ok": False, "error": "Сейчас нет активной пары."}), 400
-            period_code = schedule[idx]["code"]
+            period_code = schedule[idx].code
 
         rec = s.query(Attendance).filter_by(date=today_d, period_code=period_code, student_id=st.id).first()
         if not rec:
@@ -46,15 +49,15 @@ def api_checkin():
             s.add(rec)
         else:
             rec.time = now_t
+        refresh_daily(s, [(st.id, today_d)])
         s.commit()
 
-        p = next((pp for pp in schedule if pp["code"] == period_code), None)
+        p = schedule.get(period_code)
         status = "present"
         if p:
-            start_m, end_m = to_minutes(p["start"]), to_minutes(p["end"])
             t_m = now_t.hour*60 + now_t.minute
-            if t_m <= start_m + LATE_GRACE_MIN: status = "present"
-            elif t_m <= end_m: status = "late"
+            if t_m <= p.start_min + LATE_GRACE_MIN: status = "present"
+            elif t_m <= p.end_min: status = "late"
             else: status = "absent"
 
         return jsonify({
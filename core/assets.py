@@ -0,0 +1,120 @@
+# core/assets.py
+"""
+Сборка статики: имена с хэшем содержимого и заранее сжатые копии.
+
+Каждый файл из static/ копируется в ASSETS_DIR под именем с отпечатком
+(style.css → style.3f9c0a1b2d4e.css), текстовые — ещё и в .gz и .br
+(если установлен brotli). Соответствие «исходное имя → имя с хэшем»
+пишется в manifest.json. Новое содержимое — новое имя, поэтому файлы
+можно кэшировать у клиента на год (immutable), а сжимать — один раз при
+сборке, а не на каждый запрос.
+
+Сборка запускается при старте приложения (core.assets_bp.init_assets) и
+отдельно — на выкладке:
+    python -m core.assets build
+Неизменившиеся файлы не пересобираются, устаревшие версии удаляются.
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from config import BASE_DIR
+
+try:
+    import brotli
+except ImportError:  # без brotli отдаём gzip
+    brotli = None
+
+STATIC_DIR = BASE_DIR / "static"
+ASSETS_DIR = Path(os.getenv("ASSETS_DIR", str(BASE_DIR / "static_build")))
+MANIFEST_NAME = "manifest.json"
+
+HASH_LEN = 12
+# png/jpg/woff2 уже сжаты — их только переименовываем
+COMPRESSIBLE = {".css", ".js", ".svg", ".json", ".txt", ".html", ".map", ".ico"}
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def fingerprint(rel: str, data: bytes) -> str:
+    """'img/logo.png' → 'img/logo.<хэш>.png'."""
+    digest = hashlib.sha256(data).hexdigest()[:HASH_LEN]
+    path = Path(rel)
+    return path.with_name(f"{path.stem}.{digest}{path.suffix}").as_posix()
+
+
+def _compress(encoding: str, data: bytes):
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(data, quality=11)
+    return None
+
+
+def _write(dst: Path, data: bytes) -> None:
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_name(f"{dst.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, dst)
+
+
+def build(static_dir: Path = STATIC_DIR, out_dir: Path = ASSETS_DIR) -> dict:
+    """Собрать статику; возвращает манифест {исходное имя: имя с хэшем}."""
+    manifest = {}
+    keep = {MANIFEST_NAME}
+    for src in sorted(static_dir.rglob("*")):
+        if not src.is_file() or src.name.startswith("."):
+            continue
+        rel = src.relative_to(static_dir).as_posix()
+        data = src.read_bytes()
+        name = fingerprint(rel, data)
+        manifest[rel] = name
+        keep.add(name)
+
+        dst = out_dir / name
+        if not dst.exists():
+            _write(dst, data)
+        if src.suffix.lower() not in COMPRESSIBLE:
+            continue
+        for encoding, suffix in ENCODINGS:
+            variant = dst.with_name(dst.name + suffix)
+            if not variant.exists():
+                packed = _compress(encoding, data)
+                # сжатие не помогло — отдаём как есть
+                if packed is None or len(packed) >= len(data):
+                    continue
+                _write(variant, packed)
+            keep.add(name + suffix)
+
+    _write(out_dir / MANIFEST_NAME,
+           json.dumps(manifest, ensure_ascii=False, indent=1).encode("utf-8"))
+    for old in out_dir.rglob("*"):
+        if old.is_file() and not old.name.endswith(".tmp") \
+                and old.relative_to(out_dir).as_posix() not in keep:
+            old.unlink(missing_ok=True)
+    return manifest
+
+
+def load_manifest(out_dir: Path = ASSETS_DIR) -> dict:
+    try:
+        with open(out_dir / MANIFEST_NAME, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Сборка статики")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("build", help="отпечатки имён и сжатые копии в ASSETS_DIR")
+    ap.parse_args()
+
+    for rel, name in build().items():
+        variants = [enc for enc, suffix in ENCODINGS if (ASSETS_DIR / (name + suffix)).exists()]
+        print(f"{rel} → {name}" + (f" (+{', '.join(variants)})" if variants else ""))
+    if brotli is None:
+        print("brotli не установлен — .br не собраны (pip install brotli)")
@@ -0,0 +1,78 @@
+# core/assets_bp.py
+"""
+Отдача собранной статики (core.assets) с годовым кэшем.
+
+В шаблонах url_for('static', filename='style.css') подменяется на
+/assets/style.<хэш>.css, если файл есть в манифесте; иначе остаётся
+обычный /static/... (например, статика ещё не собрана).
+"""
+from __future__ import annotations
+
+import mimetypes
+
+from flask import Blueprint, abort, request, send_file, url_for
+
+from core.assets import ASSETS_DIR, ENCODINGS, build
+
+assets_bp = Blueprint("assets_bp", __name__)
+
+ASSET_MAX_AGE = 365 * 24 * 3600  # имя меняется вместе с содержимым
+
+_MANIFEST: dict = {}
+_ENCODED: dict = {}  # имя с хэшем -> доступные сжатые варианты [(encoding, suffix)]
+
+
+def init_assets(app) -> None:
+    """Собрать статику, подключить маршрут и url_for с отпечатками в шаблонах."""
+    try:
+        manifest = build()
+    except OSError as e:  # каталог недоступен на запись — работаем со /static
+        app.logger.warning("сборка статики не удалась: %s", e)
+        manifest = {}
+
+    _MANIFEST.clear()
+    _MANIFEST.update(manifest)
+    _ENCODED.clear()
+    for name in manifest.values():
+        _ENCODED[name] = [
+            (encoding, suffix) for encoding, suffix in ENCODINGS
+            if (ASSETS_DIR / (name + suffix)).is_file()
+        ]
+
+    app.register_blueprint(assets_bp)
+    app.jinja_env.globals["url_for"] = asset_url_for
+
+
+def asset_url_for(endpoint: str, **values) -> str:
+    if endpoint == "static":
+        name = _MANIFEST.get(values.get("filename"))
+        if name is not None:
+            endpoint, values["filename"] = "assets_bp.asset", name
+    return url_for(endpoint, **values)
+
+
+@assets_bp.route("/assets/<path:filename>")
+def asset(filename):
+    variants = _ENCODED.get(filename)
+    if variants is None:
+        abort(404)
+
+    path, encoding = ASSETS_DIR / filename, None
+    for enc, suffix in variants:
+        if request.accept_encodings[enc]:
+            path, encoding = ASSETS_DIR / (filename + suffix), enc
+            break
+
+    resp = send_file(
+        path,
+        mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+        max_age=ASSET_MAX_AGE,
+        conditional=True,
+    )
+    if encoding is not None:
+        resp.headers["Content-Encoding"] = encoding
+    if variants:
+        resp.vary.add("Accept-Encoding")
+    resp.cache_control.public = True
+    resp.cache_control.immutable = True
+    return resp
@@ -0,0 +1,109 @@
+# core/attendance.py
+"""
+Запись отметок посещаемости пачкой.
+
+upsert_attendance() принимает список кортежей
+    (date, period_code, student_id, status, reason, time)
+и делает один SELECT (что было) + один executemany
+INSERT ... ON CONFLICT (date, period_code, student_id) DO UPDATE
+по ограничению uq_attendance_date_period_student, после чего
+обновляет дневную сводку только для реально изменившихся ячеек.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import date, time as dtime
+from typing import Iterable, Optional, Sequence
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import Attendance
+from core.summary import refresh_daily
+
+
+def _existing(s, marks: dict) -> dict:
+    """(date, period_code, student_id) -> (status, reason) для уже существующих ячеек."""
+    by_date: dict[date, tuple[set, set]] = defaultdict(lambda: (set(), set()))
+    for d, period_code, student_id in marks:
+        codes, ids = by_date[d]
+        codes.add(period_code)
+        ids.add(student_id)
+
+    found = {}
+    for d, (codes, ids) in by_date.items():
+        rows = s.execute(
+            select(
+                Attendance.date,
+                Attendance.period_code,
+                Attendance.student_id,
+                Attendance.status,
+                Attendance.reason,
+            ).where(
+                Attendance.date == d,
+                Attendance.period_code.in_(codes),
+                Attendance.student_id.in_(ids),
+            )
+        )
+        for rd, pc, sid, status, reason in rows:
+            found[(rd, pc, sid)] = (status, reason)
+    return found
+
+
+def upsert_attendance(
+    s,
+    marks: Iterable[Sequence],
+    *,
+    keep_time: bool = False,
+) -> list[tuple[date, str, int]]:
+    """
+    Записать отметки пачкой в текущей транзакции (commit — за вызывающим).
+
+    keep_time=True — не затирать уже сохранённое время отметки
+    (ручная правка статуса в журнале), иначе время перезаписывается.
+
+    Возвращает ключи (date, period_code, student_id) ячеек, которые
+    появились или у которых поменялся статус/причина.
+    """
+    latest: dict[tuple[date, str, int], tuple[Optional[str], Optional[str], Optional[dtime]]] = {}
+    for d, period_code, student_id, status, reason, t in marks:
+        latest[(d, period_code, student_id)] = (status, reason, t)
+    if not latest:
+        return []
+
+    before = _existing(s, latest)
+
+    stmt = sqlite_insert(Attendance)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["date", "period_code", "student_id"],
+        set_={
+            "status": stmt.excluded.status,
+            "reason": stmt.excluded.reason,
+            "time": (
+                func.coalesce(Attendance.__table__.c.time, stmt.excluded.time)
+                if keep_time
+                else stmt.excluded.time
+            ),
+        },
+    )
+    s.execute(
+        stmt,
+        [
+            {
+                "date": d,
+                "period_code": period_code,
+                "student_id": student_id,
+                "status": status,
+                "reason": reason,
+                "time": t,
+            }
+            for (d, period_code, student_id), (status, reason, t) in latest.items()
+        ],
+    )
+
+    changed = [
+        key for key, (status, reason, _t) in latest.items()
+        if before.get(key) != (status, reason)
+    ]
+    refresh_daily(s, {(student_id, d) for d, _pc, student_id in changed})
+    return changed
@@ -1,94 +1,391 @@
-from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for
-from models import SessionLocal, ChatMessage, User, Student
+import json
+import queue
+import time
+from typing import Optional
+
+from flask import Blueprint, Response, render_template, request, jsonify, session, redirect, url_for
+
+from models import SessionLocal, ChatMessage, ChatParticipant, Conversation, User, Student, Group
 from core.auth_bp import require_role
-from sqlalchemy import or_, and_, desc
-from sqlalchemy.orm import joinedload # Добавил для чистоты импортов
+from core.chat_broker import (
+    BROADCAST_TOPIC, chat_broker, conversation_topic, read_unread, unread_topic,
+)
+from core.conditional import not_modified, with_etag
+from sqlalchemy import or_, case, func, null, select, union_all
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
 
 chat_bp = Blueprint("chat_bp", __name__)
 
 TECH_NAME = "Техническая Поддержка" 
 
+# SSE: соединение живёт не дольше CHAT_STREAM_MAX_AGE, потом браузер
+# переподключается сам (с Last-Event-ID) — воркер не держится вечно.
+# Каждый поток занимает поток воркера: gunicorn — gthread (gunicorn.conf.py)
+CHAT_STREAM_MAX_AGE = 300  # сек
+CHAT_STREAM_KEEPALIVE = 25  # сек; комментарий в поток, чтобы прокси не рвали соединение
+CHAT_STREAM_RETRY_MS = 3000
+
+CHAT_SIDEBAR_PAGE = 50  # собеседников на страницу списка техподдержки
+CHAT_HISTORY_PAGE = 50  # сообщений при открытии диалога и на «показать ранее»
+
+
+# ───────────────── участники и диалоги ─────────────────
+
+_SUPPORT_ID = None  # id ящика техподдержки не меняется (создаёт миграция m012)
+
+
+def _support_id(s) -> int:
+    global _SUPPORT_ID
+    if _SUPPORT_ID is None:
+        pid = s.execute(
+            select(ChatParticipant.id).where(ChatParticipant.kind == "support")
+            .order_by(ChatParticipant.id).limit(1)
+        ).scalar()
+        if pid is None:
+            support = ChatParticipant(kind="support", name=TECH_NAME)
+            s.add(support)
+            s.commit()
+            pid = support.id
+        _SUPPORT_ID = pid
+    return _SUPPORT_ID
+
+
+def _participant(s, kind: str, name: str, **key) -> int:
+    """id участника для сотрудника (user_id=) или студента (student_id=); создаётся при первом обращении."""
+    (column, value), = key.items()
+    q = select(ChatParticipant.id).where(getattr(ChatParticipant, column) == value)
+    pid = s.execute(q).scalar()
+    if pid is None:
+        # прошлые объявления новичку видны в чате, но непрочитанными не считаются
+        p = ChatParticipant(kind=kind, name=name, broadcast_read_id=_last_broadcast_id(s), **key)
+        s.add(p)
+        try:
+            s.commit()
+            pid = p.id
+        except IntegrityError:  # параллельный запрос создал того же участника
+            s.rollback()
+            pid = s.execute(q).scalar()
+    return pid
+
+
+def _me(s) -> Optional[int]:
+    """
+    id участника текущего пользователя (None — пользователя уже нет).
+    В сессии хранится только ФИО и роль, поэтому id ищется один раз
+    и запоминается рядом с ними.
+    """
+    user = session["user"]
+    cached = session.get("chat_pid")
+    if cached and cached[:2] == [user["role"], user["fio"]]:
+        return cached[2]
+
+    if user["role"] == "tech":
+        pid = _support_id(s)
+    elif user["role"] == "student":
+        student_id = s.execute(
+            select(Student.id).where(Student.full_name == user["fio"]).order_by(Student.id).limit(1)
+        ).scalar()
+        pid = student_id and _participant(s, "student", user["fio"], student_id=student_id)
+    else:
+        user_id = s.execute(
+            select(User.id).where(User.fio == user["fio"]).order_by(User.id).limit(1)
+        ).scalar()
+        pid = user_id and _participant(s, "user", user["fio"], user_id=user_id)
+
+    if pid:
+        session["chat_pid"] = [user["role"], user["fio"], pid]
+    return pid or None
+
+
+def _partner(s, me: int, pid=None, user_id=None) -> Optional[int]:
+    """
+    Собеседник: для tech — участник pid или сотрудник user_id (из списка,
+    ещё без переписки); для остальных — всегда техподдержка.
+    """
+    if session["user"]["role"] != "tech":
+        return _support_id(s)
+    try:
+        pid, user_id = int(pid or 0), int(user_id or 0)
+    except (TypeError, ValueError):
+        return None
+    if user_id:
+        staff = s.get(User, user_id)
+        pid = staff and staff.role != "tech" and _participant(s, "user", staff.fio, user_id=staff.id)
+    elif pid and s.get(ChatParticipant, pid) is None:
+        pid = None
+    return pid if pid and pid != me else None
+
+
+def _participant_name(s, pid: int) -> str:
+    """Текущее ФИО участника (подпись — если человека уже нет)."""
+    return s.execute(
+        select(func.coalesce(User.fio, Student.full_name, ChatParticipant.name))
+        .select_from(ChatParticipant)
+        .outerjoin(User, User.id == ChatParticipant.user_id)
+        .outerjoin(Student, Student.id == ChatParticipant.student_id)
+        .where(ChatParticipant.id == pid)
+    ).scalar() or ""
+
+
+def _conversation(s, a: int, b: int, create: bool = False) -> Optional[Conversation]:
+    """Диалог участников a и b (поиск по уникальному ключу); create — завести, если нет."""
+    a, b = min(a, b), max(a, b)
+    q = select(Conversation).where(Conversation.a_id == a, Conversation.b_id == b)
+    conv = s.execute(q).scalar()
+    if conv is None and create:
+        conv = Conversation(a_id=a, b_id=b)
+        s.add(conv)
+        try:
+            s.flush()
+        except IntegrityError:  # первое сообщение пришло одновременно из двух воркеров
+            s.rollback()
+            conv = s.execute(q).scalar_one()
+    return conv
+
+
+# ───────────────── сообщения ─────────────────
+
+
+def _sources(conv_id: Optional[int], broadcasts: bool) -> list:
+    """Условия выборки для чата: сообщения диалога и/или объявления всем."""
+    sources = []
+    if conv_id:
+        sources.append(ChatMessage.conversation_id == conv_id)
+    if broadcasts:
+        sources.append(ChatMessage.conversation_id.is_(None))
+    return sources
+
+
+def _conversation_after(s, conv_id: Optional[int], last_id: int, broadcasts: bool = False) -> list:
+    """Сообщения диалога (и объявления, если broadcasts) с id > last_id (в формате to_dict)."""
+    sources = _sources(conv_id, broadcasts)
+    if not sources:
+        return []
+    new_msgs = s.query(ChatMessage).filter(
+        or_(*sources),
+        ChatMessage.id > last_id,
+    ).order_by(ChatMessage.id).all()
+    return [m.to_dict() for m in new_msgs]
+
+
+def _messages_after(s, me: int, conv_id: Optional[int], last_id: int,
+                    broadcasts: bool = False) -> list:
+    """То же, входящие сразу помечаются прочитанными."""
+    data = _conversation_after(s, conv_id, last_id, broadcasts)
+    _mark_read(s, me, data)
+    return data
+
+
+def _mark_read(s, me: int, messages: list) -> None:
+    """Пометить прочитанными входящие (и объявления) из уже показанных сообщений."""
+    ids = [m["id"] for m in messages
+           if m["conversation_id"] and m["sender_id"] != me and not m["is_read"]]
+    seen = max((m["id"] for m in messages if m["conversation_id"] is None), default=0)
+    if ids:
+        s.query(ChatMessage).filter(
+            ChatMessage.id.in_(ids),
+            ChatMessage.is_read == False
+        ).update({"is_read": True}, synchronize_session=False)
+    if (seen and _read_broadcasts(s, me, seen)) or ids:
+        s.commit()
+        chat_broker.poke()  # счётчик непрочитанных изменился (chat_unread — триггеры)
+
+
+def _last_broadcast_id(s) -> int:
+    return s.execute(
+        select(func.max(ChatMessage.id)).where(ChatMessage.conversation_id.is_(None))
+    ).scalar() or 0
+
+
+def _read_broadcasts(s, me: int, upto: int) -> bool:
+    """Сдвинуть отметку «объявления дочитаны до upto» (без commit); True — сдвинулась."""
+    return s.query(ChatParticipant).filter(
+        ChatParticipant.id == me,
+        ChatParticipant.broadcast_read_id < upto,
+    ).update({"broadcast_read_id": upto}, synchronize_session=False) > 0
+
+
+def _read_conversation(s, conv: Conversation, partner: int) -> None:
+    """Все входящие от partner в диалоге — прочитаны (частичный индекс по непрочитанным)."""
+    s.query(ChatMessage).filter(
+        ChatMessage.conversation_id == conv.id,
+        ChatMessage.sender_id == partner,
+        ChatMessage.is_read == False
+    ).update({"is_read": True}, synchronize_session=False)
+    s.commit()
+    chat_broker.poke()
+
+
+def _history(s, conv_id: Optional[int], before_id=None,
+             limit: int = CHAT_HISTORY_PAGE, broadcasts: bool = False) -> tuple[list, bool]:
+    """
+    Последние limit сообщений диалога (старше before_id, если задан) по
+    возрастанию id и флаг «есть ещё раньше». Обратный проход по индексу
+    (conversation_id, id) с LIMIT — цена страницы не зависит от длины переписки.
+    С broadcasts в ленту подмешиваются объявления всем: такой же проход по
+    ним, из двух страниц берутся последние limit.
+    """
+    def page(source):
+        q = select(ChatMessage.id).where(source)
+        if before_id is not None:
+            q = q.where(ChatMessage.id < before_id)
+        return select(q.order_by(ChatMessage.id.desc()).limit(limit + 1).subquery().c.id)
+
+    sources = _sources(conv_id, broadcasts)
+    if not sources:
+        return [], False
+    ids = union_all(*(page(source) for source in sources)).subquery()
+    rows = (
+        s.query(ChatMessage)
+        .filter(ChatMessage.id.in_(select(ids.c.id)))
+        .order_by(ChatMessage.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    return rows[:limit][::-1], len(rows) > limit
+
+
+def _tech_conversations(s, me: int, page: int) -> tuple[list, bool]:
+    """
+    Список собеседников техподдержки одним запросом: все диалоги участника
+    me и все пользователи (кроме tech), с кем переписки ещё нет, — с ролью
+    или группой, последним сообщением, его временем и числом непрочитанных.
+    Сначала свежие диалоги (conversations.last_message_id), потом
+    пользователи без переписки (по ФИО). Возвращает (страница, есть ли следующая).
+    """
+    conv = (
+        select(
+            Conversation.id.label("conv_id"),
+            case((Conversation.a_id == me, Conversation.b_id), else_=Conversation.a_id).label("pid"),
+            Conversation.last_message_id.label("last_id"),
+        )
+        .where(or_(Conversation.a_id == me, Conversation.b_id == me))
+        .cte("conv")
+    )
+    talked = (
+        select(ChatParticipant.user_id)
+        .join(conv, conv.c.pid == ChatParticipant.id)
+        .where(ChatParticipant.user_id.is_not(None))
+    )
+    people = union_all(
+        select(conv.c.conv_id, conv.c.pid, conv.c.last_id,
+               null().label("user_id"), null().label("fio")),
+        select(null(), null(), null(), User.id, User.fio)
+        .where(User.role != "tech", User.fio != "", User.id.not_in(talked)),
+    ).subquery("people")
+    # сначала страница (только ключи), имена/группы и тексты — уже для неё
+    page_rows = (
+        select(people)
+        .order_by(people.c.last_id.is_(None), people.c.last_id.desc(), people.c.fio)
+        .limit(CHAT_SIDEBAR_PAGE + 1)
+        .offset(page * CHAT_SIDEBAR_PAGE)
+        .subquery("page_rows")
+    )
+    last = aliased(ChatMessage)
+    unread = (
+        select(func.count()).select_from(ChatMessage)
+        .where(ChatMessage.conversation_id == page_rows.c.conv_id,
+               ChatMessage.sender_id == page_rows.c.pid,
+               ChatMessage.is_read == False)
+        .scalar_subquery()
+    )
+    rows = s.execute(
+        select(
+            page_rows.c.pid, User.id.label("user_id"),
+            func.coalesce(User.fio, Student.full_name, ChatParticipant.name).label("fio"),
+            User.role, Group.code.label("group_code"),
+            last.message, last.created_at, unread.label("unread"),
+        )
+        .select_from(page_rows)
+        .outerjoin(ChatParticipant, ChatParticipant.id == page_rows.c.pid)
+        .outerjoin(User, User.id == func.coalesce(ChatParticipant.user_id, page_rows.c.user_id))
+        .outerjoin(Student, Student.id == ChatParticipant.student_id)
+        .outerjoin(Group, Group.id == Student.group_id)
+        .outerjoin(last, last.id == page_rows.c.last_id)
+        .order_by(page_rows.c.last_id.is_(None), page_rows.c.last_id.desc(), page_rows.c.fio)
+    ).all()
+
+    users_list = [
+        {
+            "pid": r.pid,
+            "user_id": r.user_id,
+            "fio": r.fio,
+            "role": r.role or r.group_code or "Студент",
+            "type": "staff" if r.role else "student",
+            "last_message": r.message,
+            "last_time": r.created_at,
+            "unread": r.unread or 0,
+        }
+        for r in rows[:CHAT_SIDEBAR_PAGE]
+    ]
+    return users_list, len(rows) > CHAT_SIDEBAR_PAGE
+
+
 @chat_bp.route("/chat")
 def chat_page():
     user = session.get("user")
     if not user: return redirect("/login")
     
-    my_fio = user["fio"]
     role = user["role"]
 
     session_db = SessionLocal()
     try:
+        me = _me(session_db)
+        if me is None:
+            return redirect("/login")
+
         # 1. ТЕХПОДДЕРЖКА (Tech) - Видит список чатов
         if role == "tech":
-            selected_user = request.args.get("u")
-            
-            users_list = []
-            
-            # Логика загрузки пользователей для sidebar
-            users_list = []
-            staff = session_db.query(User).filter(User.role != "tech").all()
-            for u in staff:
-                users_list.append({"fio": u.fio, "role": u.role, "type": "staff"})
-                
-            active_participants = session_db.query(ChatMessage.sender_fio).filter(
-                ChatMessage.recipient_fio == TECH_NAME
-            ).distinct().all()
+            partner = _partner(session_db, me, request.args.get("p"), request.args.get("user"))
             
-            active_names = {r[0] for r in active_participants}
-            
-            # Добавляем активных студентов
-            for name in active_names:
-                if not any(u['fio'] == name for u in users_list):
-                    student_info = session_db.query(Student.group_code).filter(Student.full_name == name).first()
-                    role_str = student_info[0] if student_info and student_info[0] else "Студент"
-                    users_list.append({"fio": name, "role": role_str, "type": "student"})
-
-
-            messages = []
-            if selected_user:
-                messages = session_db.query(ChatMessage).filter(
-                    or_(
-                        and_(ChatMessage.sender_fio == TECH_NAME, ChatMessage.recipient_fio == selected_user),
-                        and_(ChatMessage.sender_fio == selected_user, ChatMessage.recipient_fio == TECH_NAME)
-                    )
-                ).order_by(ChatMessage.created_at).all()
-                
-                # Помечаем прочитанными входящие для Tech
-                session_db.query(ChatMessage).filter(
-                    ChatMessage.sender_fio == selected_user,
-                    ChatMessage.recipient_fio == TECH_NAME,
-                    ChatMessage.is_read == False
-                ).update({"is_read": True}, synchronize_session=False)
-                session_db.commit()
+            try:
+                page = max(int(request.args.get("page") or 0), 0)
+            except ValueError:
+                page = 0
+
+            messages, history_more = [], False
+            if partner:
+                conv = _conversation(session_db, me, partner)
+                if conv is not None:
+                    # Помечаем прочитанными входящие для Tech
+                    _read_conversation(session_db, conv, partner)
+                    # последние сообщения; более ранние — /api/chat/history
+                    messages, history_more = _history(session_db, conv.id)
+
+            # список — после пометки «прочитано», чтобы у открытого диалога было 0
+            users_list, users_more = _tech_conversations(session_db, me, page)
 
             return render_template("tech_chat.html", 
                                    users=users_list, 
-                                   selected_user=selected_user, 
+                                   page=page,
+                                   users_more=users_more,
+                                   selected_user=partner and _participant_name(session_db, partner),
+                                   selected_pid=partner,
                                    messages=messages,
-                                   my_fio=my_fio,
+                                   history_more=history_more,
+                                   my_pid=me,
                                    is_tech=True)
 
         # 2. ОБЫЧНЫЙ ПОЛЬЗОВАТЕЛЬ (Student/Curator/Head)
         else:
-            messages = session_db.query(ChatMessage).filter(
-                or_(
-                    and_(ChatMessage.sender_fio == my_fio, ChatMessage.recipient_fio == TECH_NAME),
-                    and_(ChatMessage.sender_fio == TECH_NAME, ChatMessage.recipient_fio == my_fio)
-                )
-            ).order_by(ChatMessage.created_at).all()
-            
-            # Помечаем прочитанными сообщения от Техподдержки
-            session_db.query(ChatMessage).filter(
-                ChatMessage.sender_fio == TECH_NAME,
-                ChatMessage.recipient_fio == my_fio,
-                ChatMessage.is_read == False
-            ).update({"is_read": True}, synchronize_session=False)
-            session_db.commit()
+            support = _support_id(session_db)
+            conv = _conversation(session_db, me, support)
+            if conv is not None:
+                # Помечаем прочитанными сообщения от Техподдержки
+                _read_conversation(session_db, conv, support)
+            if _read_broadcasts(session_db, me, _last_broadcast_id(session_db)):
+                session_db.commit()
+                chat_broker.poke()
+            # диалог с поддержкой вперемешку с объявлениями всем
+            messages, history_more = _history(session_db, conv and conv.id, broadcasts=True)
             
             return render_template("tech_chat.html", 
                                    selected_user=TECH_NAME, 
+                                   selected_pid=support,
                                    messages=messages, 
-                                   my_fio=my_fio,
+                                   history_more=history_more,
+                                   my_pid=me,
                                    is_tech=False)
     finally:
         session_db.close()
@@ -101,24 +398,54 @@ def send_message():
     
     data = request.json
     text = data.get("text")
-    recipient = data.get("recipient") 
 
-    if not text or not recipient:
+    if not text:
         return jsonify({"ok": False}), 400
 
-    sender = user["fio"]
-    
-    if user["role"] != "tech":
-        recipient = TECH_NAME
-    
-    msg = ChatMessage(sender_fio=sender, recipient_fio=recipient, message=text)
-    
-    session_db = SessionLocal()
-    session_db.add(msg)
-    session_db.commit()
-    session_db.close()
+    with SessionLocal() as session_db:
+        me = _me(session_db)
+        if me is None:
+            return jsonify({"ok": False}), 403
+        # не-tech всегда пишут в поддержку; tech — участнику из списка
+        partner = _partner(session_db, me, data.get("recipient"))
+        if not partner:
+            return jsonify({"ok": False}), 400
+
+        conv = _conversation(session_db, me, partner, create=True)
+        msg = ChatMessage(conversation_id=conv.id, sender_id=me, message=text)
+        session_db.add(msg)
+        session_db.commit()
+        payload = msg.to_dict()
+        # подписчики диалога в этом воркере получают сообщение сразу
+        chat_broker.publish(conv, [payload])
+    chat_broker.poke()
     
-    return jsonify({"ok": True})
+    return jsonify({"ok": True, "id": payload["id"]})
+
+
+@chat_bp.route("/api/chat/broadcast", methods=["POST"])
+def send_broadcast():
+    """
+    Объявление техподдержки всем: одна строка chat_messages без диалога.
+    Получателям оно подмешивается в чат и в счётчик непрочитанных при чтении.
+    """
+    user = session.get("user")
+    if not user or user["role"] != "tech": return jsonify({"ok": False}), 403
+
+    text = ((request.json or {}).get("text") or "").strip()
+    if not text:
+        return jsonify({"ok": False}), 400
+
+    with SessionLocal() as session_db:
+        msg = ChatMessage(conversation_id=None, sender_id=_support_id(session_db),
+                          message=text, is_read=True)
+        session_db.add(msg)
+        session_db.commit()
+        payload = msg.to_dict()
+    chat_broker.publish(None, [payload])
+    chat_broker.poke()  # счётчики всех подписчиков выросли
+
+    return jsonify({"ok": True, "id": payload["id"]})
 
 
 @chat_bp.route("/api/chat/updates")
@@ -127,52 +454,175 @@ def get_updates():
     user = session.get("user")
     if not user: return jsonify({"messages": []})
     
-    my_fio = user["fio"]
-    target_user = request.args.get("u")
-    last_id = int(request.args.get("last_id", 0))
+    last_id = request.args.get("last_id", 0, type=int)
+    broadcasts = user["role"] != "tech"
 
-    if not target_user:
-        return jsonify({"messages": []})
+    with SessionLocal() as session_db:
+        me = _me(session_db)
+        partner = me and _partner(session_db, me, request.args.get("p"))
+        if not partner:
+            return jsonify({"messages": []})
+        conv = _conversation(session_db, me, partner)
+        return jsonify({"messages": _messages_after(
+            session_db, me, conv and conv.id, last_id, broadcasts
+        )})
+
+
+@chat_bp.route("/api/chat/history")
+def chat_history():
+    """Более ранние сообщения диалога: до before_id, страница CHAT_HISTORY_PAGE."""
+    user = session.get("user")
+    if not user: return jsonify({"messages": [], "has_more": False}), 403
 
-    session_db = SessionLocal()
     try:
-        new_msgs = session_db.query(ChatMessage).filter(
-            ChatMessage.id > last_id,
-            or_(
-                and_(ChatMessage.sender_fio == my_fio, ChatMessage.recipient_fio == target_user),
-                and_(ChatMessage.sender_fio == target_user, ChatMessage.recipient_fio == my_fio)
-            )
-        ).order_by(ChatMessage.created_at).all()
-
-        if new_msgs:
-            # Помечаем прочитанными только те сообщения, которые мы только что получили
-            session_db.query(ChatMessage).filter(
-                ChatMessage.id.in_([m.id for m in new_msgs]),
-                ChatMessage.recipient_fio == my_fio,
-                ChatMessage.is_read == False
-            ).update({"is_read": True}, synchronize_session=False)
-            session_db.commit()
-
-        data = [m.to_dict() for m in new_msgs]
-        return jsonify({"messages": data})
-    finally:
-        session_db.close()
+        before_id = int(request.args.get("before_id") or 0) or None
+    except ValueError:
+        return jsonify({"messages": [], "has_more": False}), 400
+
+    with SessionLocal() as session_db:
+        me = _me(session_db)
+        partner = me and _partner(session_db, me, request.args.get("p"))
+        if not partner:
+            return jsonify({"messages": [], "has_more": False})
+        conv = _conversation(session_db, me, partner)
+        messages, has_more = _history(session_db, conv and conv.id, before_id,
+                                      broadcasts=user["role"] != "tech")
+        return jsonify({"messages": [m.to_dict() for m in messages], "has_more": has_more})
+
+
+@chat_bp.route("/api/chat/stream")
+def chat_stream():
+    """
+    Новые сообщения диалога через SSE (вместо опроса /api/chat/updates).
+
+    Сначала догоняет историю после last_id (или заголовка Last-Event-ID
+    при переподключении), потом ждёт сообщения от chat_broker.
+    """
+    user = session.get("user")
+    if not user: return jsonify({"ok": False}), 403
+
+    with SessionLocal() as s:
+        me = _me(s)
+        partner = me and _partner(s, me, request.args.get("p"))
+    if not partner:
+        return jsonify({"ok": False}), 400
+    broadcasts = user["role"] != "tech"
+    try:
+        last_id = max(int(request.args.get("last_id") or 0),
+                      int(request.headers.get("Last-Event-ID") or 0))
+    except ValueError:
+        last_id = 0
+
+    def event_stream(last_id):
+        # тема — по участникам: диалог появится с первым сообщением
+        topics = [conversation_topic(me, partner)] + ([BROADCAST_TOPIC] if broadcasts else [])
+        q = None
+        for topic in topics:
+            q = chat_broker.subscribe(topic, q)
+        try:
+            yield f"retry: {CHAT_STREAM_RETRY_MS}\n\n"
+            with SessionLocal() as s:
+                conv = _conversation(s, me, partner)
+                batch = _conversation_after(s, conv and conv.id, last_id, broadcasts)
+            deadline = time.monotonic() + CHAT_STREAM_MAX_AGE
+            while True:
+                # одно сообщение может прийти дважды в одной пачке (publish + наблюдатель)
+                fresh = sorted(
+                    {m["id"]: m for m in batch if m["id"] > last_id}.values(),
+                    key=lambda m: m["id"],
+                )
+                if fresh:
+                    with SessionLocal() as s:
+                        _mark_read(s, me, fresh)
+                for m in fresh:
+                    last_id = m["id"]
+                    yield f"id: {m['id']}\ndata: {json.dumps(m, ensure_ascii=False)}\n\n"
+
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return
+                try:
+                    batch = [q.get(timeout=min(CHAT_STREAM_KEEPALIVE, left))]
+                except queue.Empty:
+                    batch = []
+                    yield ": keepalive\n\n"
+                    continue
+                while not q.empty():
+                    batch.append(q.get_nowait())
+        finally:
+            for topic in topics:
+                chat_broker.unsubscribe(topic, q)
+            SessionLocal.remove()  # поток ответа живёт дольше запроса
+
+    return Response(
+        event_stream(last_id),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @chat_bp.route("/api/chat/unread_count")
 def unread_count():
-    """Возвращает количество непрочитанных сообщений для текущего пользователя."""
+    """
+    Количество непрочитанных сообщений текущего пользователя.
+
+    Число берётся из chat_unread (ведут триггеры) одним поиском по ключу;
+    ETag — само число, так что опрос без изменений получает 304.
+    """
     user = session.get("user")
     if not user: return jsonify({"count": 0})
-    
-    my_fio = user["fio"]
-    
-    session_db = SessionLocal()
-    try:
-        count = session_db.query(ChatMessage).filter(
-            ChatMessage.recipient_fio == my_fio,
-            ChatMessage.is_read == False
-        ).count()
-        return jsonify({"count": count})
-    finally:
-        session_db.close()
\ No newline at end of file
+
+    with SessionLocal() as session_db:
+        me = _me(session_db)
+        count = read_unread(session_db.connection(), [me])[me] if me else 0
+
+    etag = f"unread-{count}"
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+    return with_etag(jsonify({"count": count}), etag)
+
+
+@chat_bp.route("/api/chat/unread_count/stream")
+def unread_count_stream():
+    """Число непрочитанных через SSE: сразу текущее, дальше — при каждом изменении."""
+    user = session.get("user")
+    if not user: return jsonify({"ok": False}), 403
+
+    with SessionLocal() as s:
+        me = _me(s)
+    if me is None:
+        return jsonify({"ok": False}), 403
+
+    def event_stream():
+        topic = unread_topic(me)
+        q = chat_broker.subscribe(topic)
+        try:
+            yield f"retry: {CHAT_STREAM_RETRY_MS}\n\n"
+            with SessionLocal() as s:
+                count = read_unread(s.connection(), [me])[me]
+            yield f"data: {count}\n\n"
+            deadline = time.monotonic() + CHAT_STREAM_MAX_AGE
+            while True:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return
+                try:
+                    fresh = q.get(timeout=min(CHAT_STREAM_KEEPALIVE, left))
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                while not q.empty():
+                    fresh = q.get_nowait()
+                if fresh != count:
+                    count = fresh
+                    yield f"data: {count}\n\n"
+        finally:
+            chat_broker.unsubscribe(topic, q)
+            SessionLocal.remove()  # поток ответа живёт дольше запроса
+
+    return Response(
+        event_stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
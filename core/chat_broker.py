@@ -0,0 +1,174 @@
+# core/chat_broker.py
+"""
+Доставка событий чата подписчикам (SSE) без опроса БД каждым клиентом.
+
+Темы подписки:
+    conversation_topic(a, b) — новые сообщения диалога участников a и b
+                               (/api/chat/stream);
+    BROADCAST_TOPIC          — объявления техподдержки всем (на неё же
+                               подписан поток чата каждого пользователя);
+    unread_topic(pid)        — число непрочитанных участника
+                               (/api/chat/unread_count/stream).
+
+publish() после commit в send_message сразу будит подписчиков диалога в
+текущем воркере, poke() — фоновый поток воркера, чтобы тот сразу
+перечитал счётчики непрочитанных. Правки из других воркеров gunicorn
+подбирает тот же поток: пока есть подписчики, раз в CHAT_POLL_INTERVAL
+секунд он читает chat_messages с id больше последнего виденного (поиск по
+первичному ключу) и версию cache_versions['chat_unread'] (её увеличивают
+триггеры на chat_messages, см. core.migrations); если версия сменилась —
+одним запросом берёт счётчики подписанных участников. Нагрузка на БД —
+пара лёгких запросов в секунду на воркер, сколько бы страниц ни было открыто.
+
+Одно событие может прийти подписчику дважды (publish + фоновый поток),
+поэтому подписчики отбрасывают уже отданное (id сообщения, то же число).
+"""
+from __future__ import annotations
+
+import queue
+import threading
+
+from sqlalchemy import func, select
+
+from models import engine, SessionLocal, ChatMessage, ChatParticipant, ChatUnread, Conversation
+from core.versions import read_version
+
+CHAT_POLL_INTERVAL = 1.0  # сек; задержка доставки между воркерами
+CHAT_POLL_BATCH = 500
+
+BROADCAST_TOPIC = "broadcast"
+
+
+def conversation_topic(a: int, b: int) -> frozenset:
+    """Тема диалога по id участников (диалога в БД может ещё не быть)."""
+    return frozenset((a, b))
+
+
+def unread_topic(pid: int) -> tuple:
+    return ("unread", pid)
+
+
+def read_unread(conn, pids) -> dict:
+    """
+    {id участника: непрочитанных}: счётчик диалогов из chat_unread (нет
+    строки — 0) плюс объявления новее его broadcast_read_id (диапазон
+    conversation_id IS NULL по индексу; объявлений немного).
+    """
+    pids = list(pids)
+    if not pids:
+        return {}
+    broadcasts = (
+        select(func.count()).select_from(ChatMessage)
+        .where(ChatMessage.conversation_id.is_(None),
+               ChatMessage.id > ChatParticipant.broadcast_read_id,
+               ChatMessage.sender_id != ChatParticipant.id)
+        .scalar_subquery()
+    )
+    found = dict(conn.execute(
+        select(ChatParticipant.id, func.coalesce(ChatUnread.unread, 0) + broadcasts)
+        .outerjoin(ChatUnread, ChatUnread.participant_id == ChatParticipant.id)
+        .where(ChatParticipant.id.in_(pids))
+    ).all())
+    return {pid: found.get(pid, 0) for pid in pids}
+
+
+class ChatBroker:
+    def __init__(self, poll_interval: float = CHAT_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._subs: dict = {}  # тема -> set[Queue]
+        self._wake = threading.Event()
+        self._watcher = None
+
+    def subscribe(self, topic, q: queue.Queue = None) -> queue.Queue:
+        """Подписка на тему; q — подписать уже имеющуюся очередь ещё и на эту тему."""
+        if q is None:
+            q = queue.Queue()
+        with self._lock:
+            self._subs.setdefault(topic, set()).add(q)
+            if self._watcher is None:
+                # отсчёт — до того, как подписчик дочитает текущее состояние
+                # (историю, счётчик), чтобы правка между этими чтениями не потерялась
+                with engine.connect() as conn:
+                    last_id = conn.execute(select(func.max(ChatMessage.id))).scalar() or 0
+                    unread_version = read_version(conn, "chat_unread")
+                self._watcher = threading.Thread(
+                    target=self._watch, args=(last_id, unread_version),
+                    name="chat-broker", daemon=True,
+                )
+                self._watcher.start()
+        return q
+
+    def unsubscribe(self, topic, q: queue.Queue) -> None:
+        with self._lock:
+            subs = self._subs.get(topic)
+            if subs is not None:
+                subs.discard(q)
+                if not subs:
+                    del self._subs[topic]
+
+    def publish(self, conversation, messages: list[dict]) -> None:
+        """
+        Разбудить подписчиков диалога (conversation=None — объявления всем);
+        сообщения — в формате ChatMessage.to_dict.
+        """
+        if conversation is None:
+            topic = BROADCAST_TOPIC
+        else:
+            topic = conversation_topic(conversation.a_id, conversation.b_id)
+        self._deliver([(topic, m) for m in messages])
+
+    def poke(self) -> None:
+        """Счётчики непрочитанных изменились в этом воркере — перечитать сейчас."""
+        if self._watcher is not None:
+            self._wake.set()
+
+    def _deliver(self, items) -> None:
+        with self._lock:
+            targets = [(q, item) for topic, item in items for q in self._subs.get(topic, ())]
+        for q, item in targets:
+            q.put(item)
+
+    # ───────────────── правки других воркеров ─────────────────
+
+    def _watch(self, last_id: int, unread_version: int) -> None:
+        try:
+            while True:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                with self._lock:
+                    if not self._subs:
+                        self._watcher = None  # подписчиков нет — поток завершается
+                        return
+                    pids = [t[1] for t in self._subs if isinstance(t, tuple)]
+                try:
+                    with SessionLocal() as s:
+                        rows = s.execute(
+                            select(ChatMessage, Conversation.a_id, Conversation.b_id)
+                            .outerjoin(Conversation, Conversation.id == ChatMessage.conversation_id)
+                            .where(ChatMessage.id > last_id)
+                            .order_by(ChatMessage.id)
+                            .limit(CHAT_POLL_BATCH)
+                        ).all()
+                        messages = [
+                            (BROADCAST_TOPIC if m.conversation_id is None
+                             else conversation_topic(a, b), m.to_dict())
+                            for m, a, b in rows
+                        ]
+                        counts = {}
+                        version = read_version(s.connection(), "chat_unread")
+                        if pids and version != unread_version:
+                            counts = read_unread(s.connection(), pids)
+                except Exception:
+                    continue  # БД занята/недоступна — попробуем на следующем шаге
+                if messages:
+                    last_id = messages[-1][1]["id"]
+                    self._deliver(messages)
+                unread_version = version
+                if counts:
+                    self._deliver([(unread_topic(pid), n) for pid, n in counts.items()])
+        finally:
+            SessionLocal.remove()  # сессия этого потока (scoped_session)
+
+
+chat_broker = ChatBroker()
@@ -1,78 +1,60 @@
 # core/routes_checkin.py
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, session
-from models import SessionLocal, Student, Attendance
+from models import SessionLocal, Student, Group
 from datetime import date, datetime
 from core.helpers import current_period_index
-from config import get_schedule_for, today_key
+from core.schedule import schedule_for
+from config import today_key
 from core.auth_bp import require_role
-from .permissions import get_curator_groups, student_in_curator_scope
-from sqlalchemy import func
+from core.attendance import upsert_attendance
+from .permissions import (
+    get_curator_groups,
+    group_id_of_student,
+    group_ids_for_codes,
+    student_in_curator_scope,
+    students_in_curator_scope,
+)
 
 checkin_bp = Blueprint("checkin_bp", __name__)
 
 # ---------- ВСПОМОГАТЕЛЬНОЕ ----------
 VALID_STATUSES = ("present", "late", "absent", "excused")
 
-def _upsert_attendance(s, *, d, student_id, period_code, status, reason, now_time):
-    """Создаёт/обновляет отметку посещаемости на дату/пару/студента."""
-    rec = (
-        s.query(Attendance)
-        .filter(
-            Attendance.date == d,
-            Attendance.period_code == period_code,
-            Attendance.student_id == student_id,
-        )
-        .first()
-    )
-    if not rec:
-        rec = Attendance(
-            date=d,
-            period_code=period_code,
-            time=now_time,
-            student_id=student_id,
-            status=status,
-            reason=reason,
-        )
-        s.add(rec)
-    else:
-        rec.time = now_time
-        rec.status = status
-        rec.reason = reason
-
 # ---------- СТРАНИЦА ----------
 @checkin_bp.route("/checkin")
 @require_role("curator")
 def checkin_page():
     d = date.today()
-    schedule = get_schedule_for(d)
 
     # текущий куратор и его группы
     fio = (session.get("user") or {}).get("fio", "")
     curator_groups = [g.strip() for g in (get_curator_groups(fio) or []) if g and g.strip()]
+    group_ids = group_ids_for_codes(curator_groups)
 
     # выбранная группа из параметра ?g=PO-175 (или пусто = все группы куратора)
     selected_group = (request.args.get("g") or "").strip()
+    # расписание выбранной группы (для «все группы» — общее)
+    schedule = schedule_for(group_ids.get(selected_group), d)
 
     with SessionLocal() as s:
         # базовый фильтр: только студенты из групп куратора
         q = s.query(Student)
-        if curator_groups:
-            q = q.filter(func.trim(Student.group_code).in_(curator_groups))
+        if group_ids:
+            q = q.filter(Student.group_id.in_(group_ids.values()))
         else:
             q = q.filter(Student.id == -1)  # если у куратора не настроены группы — пусто
 
         # список доступных групп по фактическим данным
         groups_available = [
-            g for (g,) in s.query(func.trim(Student.group_code))
-                           .filter(func.trim(Student.group_code).in_(curator_groups))
-                           .distinct()
-                           .order_by(func.trim(Student.group_code))
+            g for (g,) in s.query(Group.code)
+                           .filter(Group.id.in_(group_ids.values()), Group.students.any())
+                           .order_by(Group.code)
         ]
 
         # если выбрана конкретная группа — дополнительно сузим
         if selected_group:
-            if selected_group in curator_groups:
-                q = q.filter(func.trim(Student.group_code) == selected_group)
+            if selected_group in group_ids:
+                q = q.filter(Student.group_id == group_ids[selected_group])
             else:
                 q = q.filter(Student.id == -1)
 
@@ -123,15 +105,7 @@ def do_checkin():
         if not st:
             flash("Студент не найден", "error")
             return redirect(url_for("checkin_bp.checkin_page"))
-        _upsert_attendance(
-            s,
-            d=today_d,
-            student_id=student_id,
-            period_code=period_code,
-            status=status,
-            reason=reason,
-            now_time=now_t,
-        )
+        upsert_attendance(s, [(today_d, period_code, student_id, status, reason, now_t)])
         s.commit()
     flash("✅ Отметка сохранена", "ok")
     return redirect(url_for("checkin_bp.checkin_page"))
@@ -164,16 +138,16 @@ def do_checkin_bulk():
 
     with SessionLocal() as s:
         if all_students_flag:
+            curator_groups = [g.strip() for g in (get_curator_groups(fio) or []) if g and g.strip()]
+            group_ids = group_ids_for_codes(curator_groups)
+            q = s.query(Student)
             # если фильтр по группе задан — берём только её
             if selected_group:
-                q = s.query(Student).filter(func.trim(Student.group_code) == selected_group)
+                q = q.filter(Student.group_id == group_ids.get(selected_group, -1))
+            elif group_ids:
+                q = q.filter(Student.group_id.in_(group_ids.values()))
             else:
-                curator_groups = [g.strip() for g in (get_curator_groups(fio) or []) if g and g.strip()]
-                q = s.query(Student)
-                if curator_groups:
-                    q = q.filter(func.trim(Student.group_code).in_(curator_groups))
-                else:
-                    q = q.filter(Student.id == -1)
+                q = q.filter(Student.id == -1)
             students = q.order_by(Student.full_name).all()
             student_ids = [st.id for st in students]
         else:
@@ -181,37 +155,32 @@ def do_checkin_bulk():
                 candidate_ids = [int(x) for x in sel_student_ids]
             except ValueError:
                 candidate_ids = []
-            # защита: только те, кто в зоне куратора
-            student_ids = [sid for sid in candidate_ids if student_in_curator_scope(fio, sid)]
+            # защита: только те, кто в зоне куратора (одним запросом)
+            allowed = students_in_curator_scope(fio, candidate_ids)
+            student_ids = [sid for sid in candidate_ids if sid in allowed]
 
         if not student_ids:
             flash("Не выбраны студенты", "error")
             return redirect(url_for("checkin_bp.checkin_page", g=selected_group))
 
-        # пары
-        schedule = get_schedule_for(today_d)
-        if all_periods_flag:
-            period_codes = [p["code"] for p in schedule if p["code"].startswith("p")]
-        else:
-            period_codes = [p for p in sel_periods if p.startswith("p")]
-        if not period_codes:
+        # пары: «все пары» — по расписанию группы каждого студента
+        chosen = [p for p in sel_periods if p.startswith("p")]
+        marks = []
+        for sid in student_ids:
+            if all_periods_flag:
+                schedule = schedule_for(group_id_of_student(sid), today_d)
+                codes = [p.code for p in schedule if p.is_pair]
+            else:
+                codes = chosen
+            marks.extend((today_d, pc, sid, status, reason, now_t) for pc in codes)
+        if not marks:
             flash("Не выбраны пары", "error")
             return redirect(url_for("checkin_bp.checkin_page", g=selected_group))
 
-        for sid in student_ids:
-            for pc in period_codes:
-                _upsert_attendance(
-                    s,
-                    d=today_d,
-                    student_id=sid,
-                    period_code=pc,
-                    status=status,
-                    reason=reason,
-                    now_time=now_t,
-                )
+        upsert_attendance(s, marks)
         s.commit()
 
-    flash(f"✅ Сохранены отметки: {len(student_ids)} студент(ов) × {len(period_codes)} пар(ы)", "ok")
+    flash(f"✅ Сохранены отметки: {len(student_ids)} студент(ов), всего {len(marks)}", "ok")
     # сохраняем выбранную группу после POST
     return redirect(url_for("checkin_bp.checkin_page", g=selected_group))
 
@@ -237,24 +206,16 @@ def do_checkin_quick():
 
     today_d = date.today()
     now_t = datetime.now().time()
-    schedule = get_schedule_for(today_d)
+    schedule = schedule_for(group_id_of_student(student_id), today_d)
     idx = current_period_index(schedule=schedule)
     if idx is None or idx < 0:
         return jsonify({"ok": False, "error": "no current period"}), 400
-    period_code = schedule[idx]["code"]
+    period_code = schedule[idx].code
 
     with SessionLocal() as s:
         st = s.query(Student).filter(Student.id == student_id).first()
         if not st:
             return jsonify({"ok": False, "error": "student not found"}), 404
-        _upsert_attendance(
-            s,
-            d=today_d,
-            student_id=student_id,
-            period_code=period_code,
-            status=status,
-            reason=reason,
-            now_time=now_t,
-        )
+        upsert_attendance(s, [(today_d, period_code, student_id, status, reason, now_t)])
         s.commit()
     return jsonify({"ok": True, "period_code": period_code, "status": status})
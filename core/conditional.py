@@ -0,0 +1,95 @@
+# core/conditional.py
+"""
+Условные GET (ETag / 304) для страниц с отчётами по группам.
+
+ETag страницы — хэш от вида, его параметров, версий данных групп
+(group_versions), версий 'scope' и 'schedule' (cache_versions),
+пользователя, сегодняшней даты и сборки (шаблоны и код). Счётчики
+увеличивают триггеры БД при каждой записи отметок, снятых пар, состава
+групп и расписания, поэтому совпавший ETag значит: страница та же.
+
+Версии читаются одним маленьким запросом по первичным ключам — это
+дешевле любого отчёта, поэтому If-None-Match проверяется до запросов к
+отметкам:
+
+    etag = page_etag("head_group", (g, day, mode), [gid])
+    if (resp := not_modified(etag)) is not None:
+        return resp
+    ...
+    return with_etag(render_template(...), etag)
+
+Страницы личные, поэтому Cache-Control: private, no-cache — браузер
+хранит копию, но каждый раз переспрашивает сервер.
+"""
+from __future__ import annotations
+
+import hashlib
+from datetime import date
+from typing import Iterable, Optional
+
+from flask import make_response, request, session
+from sqlalchemy import select
+
+from config import BASE_DIR
+from models import engine, CacheVersion
+from core.versions import read_group_versions
+
+PAGE_CACHE_CONTROL = "private, no-cache"
+
+_WATCHED_VERSIONS = ("scope", "schedule")
+
+
+def _build_stamp() -> str:
+    """Отпечаток сборки: после выкладки новых шаблонов/кода старые ETag не подходят."""
+    mtimes = [
+        p.stat().st_mtime_ns
+        for folder in ("templates", "core")
+        for p in (BASE_DIR / folder).glob("*.*")
+        if p.suffix in (".html", ".py")
+    ]
+    return str(max(mtimes, default=0))
+
+
+_BUILD = _build_stamp()
+
+
+def page_etag(view: str, params: tuple, group_ids: Iterable[int], clock=None) -> str:
+    """
+    ETag страницы view. clock — то, от чего страница зависит помимо данных
+    (например, текущая минута для сегодняшнего журнала: статусы пустых
+    клеток меняются по мере того, как проходят пары).
+    """
+    with engine.connect() as conn:
+        groups = sorted(read_group_versions(conn, set(group_ids)).items())
+        versions = dict(conn.execute(
+            select(CacheVersion.name, CacheVersion.version)
+            .where(CacheVersion.name.in_(_WATCHED_VERSIONS))
+        ).all())
+    user = session.get("user") or {}
+    parts = (
+        view, params, groups, [versions.get(n, 0) for n in _WATCHED_VERSIONS],
+        user.get("fio", ""), user.get("role", ""), session.get("lang"),
+        date.today().isoformat(), clock, _BUILD,
+    )
+    return hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _set_headers(resp, etag: str):
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = PAGE_CACHE_CONTROL
+    resp.vary.add("Cookie")
+    return resp
+
+
+def not_modified(etag: str) -> Optional[object]:
+    """Ответ 304, если у клиента та же версия страницы; иначе None."""
+    if "_flashes" in session:
+        return None  # сообщения показываются один раз — страницу надо отрисовать
+    if not request.if_none_match.contains(etag):
+        return None
+    return _set_headers(make_response("", 304), etag)
+
+
+def with_etag(body, etag: str):
+    """Ответ со страницей, её ETag и Cache-Control."""
+    return _set_headers(make_response(body), etag)
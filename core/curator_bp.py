@@ -3,17 +3,14 @@ from datetime import date
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash
 
 from core.auth_bp import require_role
-from core.permissions import get_curator_groups
+from core.conditional import not_modified, page_etag, with_etag
+from core.permissions import get_curator_groups, group_id_for_code
 from core.head_bp import (
     _parse_day,
     _month_range,
     _semester_range,
-    _load_students,
-    _load_day_attendance,
-    _load_skips_for_day,
-    _attendance_stats,
-    _detailed_student_table,
 )
+from core.reports import build_group_report
 
 curator_bp = Blueprint("curator_bp", __name__, url_prefix="/curator")
 
@@ -68,6 +65,11 @@ def group_view():
         flash("Эта группа не входит в вашу зону ответственности.", "error")
         return redirect(url_for("curator_bp.choose_group"))
 
+    gid = group_id_for_code(g)
+    if gid is None:
+        flash("Группа не найдена.", "error")
+        return redirect(url_for("curator_bp.choose_group"))
+
     # фильтры
     day = _parse_day(request.args.get("day"))
     mode = (request.args.get("mode") or "day")  # day|month|semester
@@ -79,23 +81,27 @@ def group_view():
     else:
         start = end = day
 
-    students = _load_students(g)
-    day_map = _load_day_attendance(g, day) if mode == "day" else {}
-    skips = _load_skips_for_day(g, day)
-    stats = _attendance_stats(g, start, end)
-    detail = _detailed_student_table(g, start, end)
+    # данные группы не менялись с прошлого показа — 304 без отчёта
+    etag = page_etag("curator_group", (g, day, mode), [gid])
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
 
-    return render_template(
+    # шаблону куратора нужна только таблица по студентам и агрегаты —
+    # мини-журнал за день не грузим
+    report = build_group_report(gid, start, end)
+
+    return with_etag(render_template(
         "curator_group.html",
         group=g,
         day=day,
         mode=mode,
-        students=students,
-        day_map=day_map,   # пригодится, если захотим добавить мини-журнал
-        skips=skips,
-        stats=stats,
-        detail=detail,     # детальная табличка по студентам
+        students=report.students,
+        day_map=report.day_map,   # пригодится, если захотим добавить мини-журнал
+        skips=report.skips,
+        stats=report.stats,
+        detail=report.detail,     # детальная табличка по студентам
         start=start,
         end=end,
         today=date.today(),
-    )
+    ), etag)
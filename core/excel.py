@@ -0,0 +1,260 @@
+# core/excel.py
+"""
+Выгрузка «Таблицы посещаемости по студентам» в Excel.
+
+Книга создаётся в write-only режиме openpyxl, а листы — «ленивыми»
+(add_sheet): строки листа считаются и пишутся в тот момент, когда
+wb.save() доходит до него, и лист сразу уходит в zip. stream_workbook()
+запускает save в фоновом потоке и отдаёт .xlsx кусками через ограниченную
+очередь. Поэтому первый байт уходит клиенту после первой группы, а в
+памяти одновременно отчёт одной группы и несколько кусков zip — сколько
+бы групп ни было в книге.
+
+    def fill(wb):
+        add_sheet(wb, "ПО-175", lambda ws: write_group_sheet(ws, ...))
+    Response(stream_workbook(fill), mimetype=XLSX_MIMETYPE)
+"""
+from __future__ import annotations
+
+import queue
+import threading
+from typing import Any, Callable, Iterator
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+
+from models import SessionLocal
+
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+STREAM_CHUNK_SIZE = 16 * 1024
+STREAM_QUEUE_CHUNKS = 16  # столько кусков может ждать медленного клиента
+STREAM_PUT_TIMEOUT = 60  # клиент не читает дольше — выгрузка прерывается
+STREAM_GET_TIMEOUT = 300  # книга не выдала ни куска дольше — ответ обрывается ошибкой
+
+_BOLD = Font(bold=True)
+_TITLE = Font(bold=True, size=14)
+_THIN = Side(style="thin")
+_BORDER = Border(left=_THIN, right=_THIN, top=_THIN, bottom=_THIN)
+_CENTER = Alignment(horizontal="center", vertical="center", wrap_text=True)
+_LEFT = Alignment(horizontal="left", vertical="center", wrap_text=True)
+
+_WIDTHS = {"A": 4, "B": 30, "C": 18, "D": 12, "E": 12, "F": 14, "G": 12, "H": 22, "I": 18}
+_REASON_KEYS = ("statement", "sick", "competition", "other", "unexcused")
+_BAD_TITLE_CHARS = str.maketrans({c: "_" for c in "[]:*?/\\"})
+
+
+# ───────────────── листы ─────────────────
+
+
+def _cell(ws, value=None, *, font=None, alignment=None, border=_BORDER) -> WriteOnlyCell:
+    cell = WriteOnlyCell(ws, value=value)
+    if font is not None:
+        cell.font = font
+    if alignment is not None:
+        cell.alignment = alignment
+    if border is not None:
+        cell.border = border
+    return cell
+
+
+def sheet_title(title: str) -> str:
+    """Имя листа по правилам Excel: без []:*?/\\ и не длиннее 31 символа."""
+    return (title.translate(_BAD_TITLE_CHARS).strip() or "Лист")[:31]
+
+
+def add_sheet(wb: Workbook, title: str, fill_sheet: Callable[[Any], None]):
+    """
+    Лист, который заполнит fill_sheet(ws) уже во время wb.save():
+    ExcelWriter закрывает write-only листы по порядку (ws.close()) и тут же
+    кладёт каждый в архив, так что данные группы живут только пока пишется
+    её лист.
+    """
+    ws = wb.create_sheet(sheet_title(title))
+    close = ws.close
+
+    def fill_and_close():
+        fill_sheet(ws)
+        close()
+
+    ws.close = fill_and_close
+    return ws
+
+
+def write_group_sheet(ws, group_code: str, period_title: str, detail: dict):
+    """
+    Лист в формате файла «Посещаемость ПО-175 сентябрь.xlsx».
+    detail — build_group_report(...).detail.
+    """
+    # ширины колонок и объединения — до первой строки (write-only)
+    for col, width in _WIDTHS.items():
+        ws.column_dimensions[col].width = width
+    for ref in ("A2:I2", "A5:A6", "B5:B6", "C5:C6", "D5:H5", "I5:I6"):
+        ws.merged_cells.add(ref)
+
+    def head(value=None):
+        return _cell(ws, value, font=_BOLD, alignment=_CENTER)
+
+    ws.append([])
+    ws.append([_cell(ws, f"Посещаемость группы {group_code} {period_title}",
+                     font=_TITLE, alignment=_CENTER, border=None)])
+    ws.append([])
+    ws.append([])
+    ws.append([
+        head("№"), head("Аты жөні"), head("Всего пропусков(кол-во часов)"),
+        head("В том числе"), head(), head(), head(), head(), head("Процент посещаемости"),
+    ])
+    ws.append([
+        head(), head(), head(),
+        head("Заявление"), head("По болезни"), head("Соревнования"), head("Другое"),
+        head("По неуважительной причине"), head(),
+    ])
+
+    for r in detail["rows"]:
+        ws.append([
+            _cell(ws, r["num"], alignment=_CENTER),
+            _cell(ws, r["full_name"], alignment=_LEFT),
+            _cell(ws, r["total"], alignment=_CENTER),
+            *[_cell(ws, r[k], alignment=_CENTER) for k in _REASON_KEYS],
+            _cell(ws, round(r["pct"], 2), alignment=_CENTER),
+        ])
+
+    # итоговая строка «Посещаемость по группе»
+    last = 7 + len(detail["rows"])
+    ws.merged_cells.add(f"A{last}:H{last}")
+    ws.append([
+        _cell(ws, "Посещаемость по группе", font=_BOLD, alignment=_LEFT),
+        *[_cell(ws) for _ in range(7)],
+        _cell(ws, round(detail["group_pct"], 2), font=_BOLD, alignment=_CENTER),
+    ])
+
+
+def write_summary_sheet(ws, heading: str, groups: list[tuple[str, int, float]]):
+    """Сводный лист: (группа, студентов, посещаемость %) по строке на группу."""
+    for col, width in (("A", 4), ("B", 18), ("C", 12), ("D", 18)):
+        ws.column_dimensions[col].width = width
+    ws.merged_cells.add("A1:D1")
+    ws.append([_cell(ws, heading, font=_TITLE, alignment=_LEFT, border=None)])
+    ws.append([])
+    ws.append([_cell(ws, v, font=_BOLD, alignment=_CENTER)
+               for v in ("№", "Группа", "Студентов", "Процент посещаемости")])
+    for num, (group_code, students, pct) in enumerate(groups, start=1):
+        ws.append([
+            _cell(ws, num, alignment=_CENTER),
+            _cell(ws, group_code, alignment=_LEFT),
+            _cell(ws, students, alignment=_CENTER),
+            _cell(ws, round(pct, 2), alignment=_CENTER),
+        ])
+
+
+# ───────────────── потоковая отдача ─────────────────
+
+
+class _Cancelled(Exception):
+    pass
+
+
+class _QueueWriter:
+    """Файлоподобный приёмник для zipfile: копит байты и кладёт куски в очередь."""
+
+    def __init__(self, q: queue.Queue, cancelled: threading.Event):
+        self._q = q
+        self._cancelled = cancelled
+        self._buf = bytearray()
+        self._aborted = False
+
+    def write(self, data) -> int:
+        if self._aborted:  # поток уже оборван: zipfile дописывает хвост при сборке мусора
+            return len(data)
+        self._buf += data
+        if len(self._buf) >= STREAM_CHUNK_SIZE:
+            self._put(bytes(self._buf))
+            self._buf.clear()
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self._buf:
+            self._put(bytes(self._buf))
+            self._buf.clear()
+
+    def abort(self):
+        self._aborted = True
+        self._buf.clear()
+
+    def _put(self, item):
+        while True:
+            if self._cancelled.is_set():
+                self.abort()
+                raise _Cancelled
+            try:
+                self._q.put(item, timeout=STREAM_PUT_TIMEOUT)
+                return
+            except queue.Full:
+                self._cancelled.set()
+
+
+def _finish(q: queue.Queue, item) -> None:
+    """Положить последний элемент потока, даже если очередь забита (выкинув кусок)."""
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
+
+
+def stream_workbook(fill: Callable[[Workbook], None]) -> Iterator[bytes]:
+    """
+    Сохраняет write-only книгу в фоновом потоке и отдаёт .xlsx кусками.
+    Если клиент ушёл (генератор закрыт), поток прерывается на следующем куске.
+
+    Поток всегда заканчивается маркером: done или исключение. Ошибка книги,
+    застрявший клиент или молчащий поток книги поднимают исключение в
+    генераторе — сервер рвёт ответ, и клиент не получит обрезанный файл
+    как целый.
+    """
+    q: queue.Queue = queue.Queue(maxsize=STREAM_QUEUE_CHUNKS)
+    cancelled = threading.Event()
+    done = object()
+
+    def produce():
+        writer = _QueueWriter(q, cancelled)
+        end = None
+        try:
+            wb = Workbook(write_only=True)
+            fill(wb)
+            wb.save(writer)
+            writer.close()
+            writer._put(done)
+        except _Cancelled:
+            end = _Cancelled("клиент не забирал выгрузку — поток прерван")
+        except BaseException as e:  # отдадим ошибку в поток ответа
+            writer.abort()
+            end = e
+        finally:
+            if end is not None:
+                _finish(q, end)
+            SessionLocal.remove()  # сессия этого потока (scoped_session)
+
+    threading.Thread(target=produce, name="xlsx-export", daemon=True).start()
+
+    try:
+        while True:
+            try:
+                item = q.get(timeout=STREAM_GET_TIMEOUT)
+            except queue.Empty:
+                raise RuntimeError("выгрузка xlsx не отвечает") from None
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        cancelled.set()
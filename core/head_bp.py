@@ -1,24 +1,43 @@
 from datetime import date, datetime, timedelta
-from io import BytesIO
+from typing import Optional
+from urllib.parse import quote
 
 from flask import (
     Blueprint,
+    Response,
     render_template,
     request,
     redirect,
     url_for,
     session,
     flash,
+    jsonify,
     send_file,
 )
+from config import now_minutes
+from models import SessionLocal
 from core.auth_bp import require_role
+from core.conditional import not_modified, page_etag, with_etag
 from core.permissions import (
     get_head_allowed_prefixes,
     head_list_groups_for_prefixes,
     head_group_allowed,
+    group_id_for_code,
+    group_code_for_id,
 )
-from models import SessionLocal, Student, Attendance, PeriodSkip
-from sqlalchemy import func, and_
+from core.report_jobs import (
+    REPORT_MIMETYPES,
+    ReportJob,
+    cached_report,
+    make_job,
+    parse_key,
+    report_state,
+    result_path,
+    submit_report,
+    tee_to_cache,
+)
+from core.reports import build_group_report, day_skips
+from core.schedule import term_range
 
 head_bp = Blueprint("head_bp", __name__, url_prefix="/head")
 
@@ -47,223 +66,9 @@ def _month_range(d: date):
     return start, end
 
 
-# Примитив: семестр — 01.09..31.12 и 01.01..31.05 (можешь поменять под свой колледж)
+# Семестр — из учебного календаря (academic_terms), см. core.schedule.term_range
 def _semester_range(d: date):
-    if d.month >= 9:  # осенний
-        start = date(d.year, 9, 1)
-        end = date(d.year, 12, 31)
-    else:  # весенний
-        start = date(d.year, 1, 1)
-        end = date(d.year, 5, 31)
-    return start, end
-
-
-def _attendance_stats(group_code: str, start: date, end: date):
-    """Агрегация по статусам в интервале [start..end].
-
-    ВАЖНО: считаем только те пары, которые реально были в расписании
-    (если на день для группы есть PeriodSkip по паре, эта пара из статистики
-    исключается, даже если по ошибке по ней проставили посещаемость).
-    """
-    with SessionLocal() as s:
-        q = (
-            s.query(
-                Attendance.status,
-                func.count(Attendance.id),
-            )
-            .join(Student, Student.id == Attendance.student_id)
-            .outerjoin(
-                PeriodSkip,
-                and_(
-                    func.date(PeriodSkip.date) == func.date(Attendance.date),
-                    PeriodSkip.period_code == Attendance.period_code,
-                    func.trim(PeriodSkip.group_code) == func.trim(Student.group_code),
-                ),
-            )
-            .filter(
-                func.date(Attendance.date) >= start,
-                func.date(Attendance.date) <= end,
-                func.trim(Student.group_code) == group_code,
-                Attendance.status.in_(["present", "late", "absent", "excused"]),
-                PeriodSkip.id.is_(None),  # игнорируем отменённые пары
-            )
-            .group_by(Attendance.status)
-        )
-
-        counts = {"present": 0, "late": 0, "absent": 0, "excused": 0}
-        total = 0
-        for st, cnt in q.all():
-            if st in counts:
-                counts[st] += cnt
-                total += cnt
-
-        pct = {}
-        for k, v in counts.items():
-            pct[k] = (v * 100.0 / total) if total else 0.0
-
-        return {"counts": counts, "total": total, "pct": pct}
-
-
-def _detailed_student_table(group_code: str, start: date, end: date):
-    """Таблица по студентам в стиле Excel-прототипа (за период start..end).
-
-    Считаем:
-    - всего пропусков в академических часах (по умолчанию 2 часа за пару),
-    - разбивку по причинам (заявление / по болезни / соревнования / другое / неуважительная),
-    - процент посещаемости по каждому студенту и средний по группе.
-    """
-    HOURS_PER_LESSON = 2  # если в колледже другая длительность пары — поменяй это значение
-
-    with SessionLocal() as s:
-        students = (
-            s.query(Student)
-            .filter(func.trim(Student.group_code) == group_code)
-            .order_by(Student.full_name)
-            .all()
-        )
-
-        if not students:
-            return {"rows": [], "group_pct": 0.0}
-
-        # Берём отметки посещаемости за период, НО сразу исключаем пары, которые были отменены
-        records = (
-            s.query(Attendance)
-            .join(Student, Student.id == Attendance.student_id)
-            .outerjoin(
-                PeriodSkip,
-                and_(
-                    func.date(PeriodSkip.date) == func.date(Attendance.date),
-                    PeriodSkip.period_code == Attendance.period_code,
-                    func.trim(PeriodSkip.group_code) == func.trim(Student.group_code),
-                ),
-            )
-            .filter(
-                func.trim(Student.group_code) == group_code,
-                func.date(Attendance.date) >= start,
-                func.date(Attendance.date) <= end,
-                Attendance.status.in_(["present", "absent", "late", "excused"]),
-                PeriodSkip.id.is_(None),  # если по паре стоит "таких пар нету" — не учитываем её
-            )
-            .all()
-        )
-
-    # Группируем по студенту
-    by_student: dict[int, list[Attendance]] = {}
-    for r in records:
-        by_student.setdefault(r.student_id, []).append(r)
-
-    rows: list[dict] = []
-
-    for idx, st in enumerate(students, start=1):
-        recs = by_student.get(st.id, [])
-
-        total_lessons = len(recs)
-        missed_lessons = 0
-
-        by_statement = 0
-        by_sick = 0
-        by_competition = 0
-        by_other = 0
-        by_unexcused = 0
-
-        for r in recs:
-            status = (r.status or "").strip().lower()
-            reason = (r.reason or "").strip().lower()
-
-            # считаем только пропуски (отсутствовал или уважительная)
-            if status not in ("absent", "excused"):
-                continue
-
-            missed_lessons += 1
-
-            # Грубая эвристика по причинам — под реальные значения можно подстроить
-            if "заяв" in reason or reason in ("application",):
-                by_statement += 1
-            elif "бол" in reason or reason in ("sick",):
-                by_sick += 1
-            elif "соревн" in reason or reason in ("competition", "contest"):
-                by_competition += 1
-            elif status == "absent" and not reason:
-                # отсутствие без причины → неуважительная
-                by_unexcused += 1
-            elif status == "absent" and reason:
-                # отсутствие с непонятной причиной → тоже считаем как неуважительную,
-                # если не попали в категории выше
-                by_unexcused += 1
-            else:
-                # все остальные уважительные
-                by_other += 1
-
-        # переведём количество пар в академические часы
-        total_hours = missed_lessons * HOURS_PER_LESSON
-
-        row = {
-            "num": idx,
-            "full_name": st.full_name,
-            "total": total_hours,
-            "statement": by_statement * HOURS_PER_LESSON,
-            "sick": by_sick * HOURS_PER_LESSON,
-            "competition": by_competition * HOURS_PER_LESSON,
-            "other": by_other * HOURS_PER_LESSON,
-            "unexcused": by_unexcused * HOURS_PER_LESSON,
-        }
-
-        if total_lessons:
-            attended = total_lessons - missed_lessons
-            row["pct"] = attended * 100.0 / total_lessons
-        else:
-            # если по студенту нет отметок — считаем 100% посещаемость
-            row["pct"] = 100.0
-
-        rows.append(row)
-
-    group_pct = sum(r["pct"] for r in rows) / len(rows) if rows else 0.0
-
-    return {
-        "rows": rows,
-        "group_pct": group_pct,
-    }
-
-
-def _load_students(group_code: str):
-    with SessionLocal() as s:
-        return (
-            s.query(Student)
-            .filter(func.trim(Student.group_code) == group_code)
-            .order_by(Student.full_name)
-            .all()
-        )
-
-
-def _load_day_attendance(group_code: str, d: date):
-    """Записи посещаемости по группе за день d (для мини-журнала)."""
-    with SessionLocal() as s:
-        rows = (
-            s.query(Attendance)
-            .join(Student, Student.id == Attendance.student_id)
-            .filter(
-                func.trim(Student.group_code) == group_code,
-                func.date(Attendance.date) == d,
-            )
-            .all()
-        )
-        # Группируем: (student_id -> list of records)
-        by_st = {}
-        for r in rows:
-            by_st.setdefault(r.student_id, []).append(r)
-        return by_st
-
-
-def _load_skips_for_day(group_code: str, d: date):
-    with SessionLocal() as s:
-        return (
-            s.query(PeriodSkip)
-            .filter(
-                func.date(PeriodSkip.date) == d,
-                func.trim(PeriodSkip.group_code) == group_code,
-            )
-            .all()
-        )
+    return term_range(d)
 
 
 # ───────────────── routes ─────────────────
@@ -308,6 +113,11 @@ def group_view():
         flash("Эта группа не входит в вашу зону ответственности.", "error")
         return redirect(url_for("head_bp.choose_group"))
 
+    gid = group_id_for_code(g)
+    if gid is None:
+        flash("Группа не найдена.", "error")
+        return redirect(url_for("head_bp.choose_group"))
+
     # фильтры
     day = _parse_day(request.args.get("day"))
     mode = (request.args.get("mode") or "day")  # day|month|semester
@@ -319,31 +129,90 @@ def group_view():
     else:
         start = end = day
 
-    students = _load_students(g)
-    day_map = _load_day_attendance(g, day) if mode == "day" else {}
-    skips = _load_skips_for_day(g, day)
-    stats = _attendance_stats(g, start, end)
-    detail = _detailed_student_table(g, start, end)
-
-    return render_template(
+    # данные группы не менялись с прошлого показа — 304 без отчёта;
+    # мини-журнал за сегодня зависит и от текущей минуты (какая пара идёт)
+    etag = page_etag(
+        "head_group", (g, day, mode), [gid],
+        clock=now_minutes() if mode == "day" and day == _today() else None,
+    )
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+
+    # месяц/семестр: если данные группы не менялись с ночного прогона
+    # (или прошлой фоновой выгрузки json) — берём готовую статистику
+    report = None
+    if mode != "day":
+        report = cached_report(make_job(gid, g, start, end, "json"))
+        if report is not None:
+            with SessionLocal() as s:
+                report.skips = day_skips(s, gid, day)
+    if report is None:
+        # мини-журнал и снятые пары — на выбранный день (как и раньше)
+        report = build_group_report(gid, start, end, day=day, with_marks=(mode == "day"))
+
+    return with_etag(render_template(
         "head_group.html",
         group=g,
         day=day,
         mode=mode,
-        students=students,
-        day_map=day_map,  # {student_id: [Attendance,...]}
-        skips=skips,  # PeriodSkip за день
-        stats=stats,  # агрегаты на период
-        detail=detail,  # детальная табличка по студентам
+        students=report.students,
+        day_map=report.day_map,  # {student_id: [DayMark,...]}
+        skips=report.skips,  # снятые пары за день
+        stats=report.stats,  # агрегаты на период
+        detail=report.detail,  # детальная табличка по студентам
         start=start,
         end=end,
         today=_today(),
-    )
+    ), etag)
 
 
 # ───────────────── выгрузка Excel «Таблица посещаемости по студентам» ─────────────────
 
 
+def _export_period(day: date, mode: str) -> tuple[date, date, str]:
+    if mode == "month":
+        start, end = _month_range(day)
+        return start, end, f"за месяц ({start:%d.%m.%Y}–{end:%d.%m.%Y})"
+    if mode == "semester":
+        start, end = _semester_range(day)
+        return start, end, f"за семестр ({start:%d.%m.%Y}–{end:%d.%m.%Y})"
+    return day, day, f"за {day:%d.%m.%Y}"
+
+
+def _xlsx_response(fill, filename: str, cache_job: Optional[ReportJob] = None) -> Response:
+    """Потоковая выгрузка; с cache_job файл заодно сохраняется в кэш отчётов."""
+    from core.excel import XLSX_MIMETYPE, stream_workbook  # openpyxl — только для выгрузок
+
+    chunks = stream_workbook(fill)
+    if cache_job is not None:
+        chunks = tee_to_cache(cache_job, chunks)
+    return Response(
+        chunks,
+        mimetype=XLSX_MIMETYPE,
+        headers={
+            "Content-Disposition": (
+                f"attachment; filename=\"attendance.xlsx\"; filename*=UTF-8''{quote(filename)}"
+            ),
+            "Cache-Control": "no-store",
+        },
+    )
+
+
+def _export_filename(g: str, start: date, end: date, fmt: str = "xlsx") -> str:
+    return f"Посещаемость {g} {start:%Y-%m-%d}_{end:%Y-%m-%d}.{fmt}"
+
+
+def _send_report(path, filename: str):
+    return send_file(
+        path,
+        as_attachment=True,
+        download_name=filename,
+        mimetype=REPORT_MIMETYPES[path.suffix.lstrip(".")],
+        max_age=0,
+    )
+
+
 @head_bp.route("/group/export_excel")
 @require_role("head")
 def group_export_excel():
@@ -367,122 +236,138 @@ def group_export_excel():
         flash("Эта группа не входит в вашу зону ответственности.", "error")
         return redirect(url_for("head_bp.choose_group"))
 
+    gid = group_id_for_code(g)
+    if gid is None:
+        flash("Группа не найдена.", "error")
+        return redirect(url_for("head_bp.choose_group"))
+
     day = _parse_day(request.args.get("day"))
     mode = (request.args.get("mode") or "day")
+    start, end, period_title = _export_period(day, mode)
+    filename = _export_filename(g, start, end)
 
-    if mode == "month":
-        start, end = _month_range(day)
-        period_title = f"за месяц ({start:%d.%m.%Y}–{end:%d.%m.%Y})"
-    elif mode == "semester":
-        start, end = _semester_range(day)
-        period_title = f"за семестр ({start:%d.%m.%Y}–{end:%d.%m.%Y})"
-    else:
-        start = end = day
-        period_title = f"за {day:%d.%m.%Y}"
-
-    detail = _detailed_student_table(g, start, end)
-    rows = detail["rows"]
-    group_pct = detail["group_pct"]
-
-    # ─ Excel ─
-    from openpyxl import Workbook
-    from openpyxl.styles import Alignment, Font, Border, Side
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Посещаемость"
-
-    bold = Font(bold=True)
-    thin = Side(style="thin")
-    border_all = Border(left=thin, right=thin, top=thin, bottom=thin)
-    center = Alignment(horizontal="center", vertical="center", wrap_text=True)
-    left = Alignment(horizontal="left", vertical="center", wrap_text=True)
-
-    # Заголовок
-    title = f"Посещаемость группы {g} {period_title}"
-    ws.merge_cells("A2:I2")
-    cell = ws["A2"]
-    cell.value = title
-    cell.font = Font(bold=True, size=14)
-    cell.alignment = center
-
-    # Шапка таблицы (как в твоём Excel)
-    ws["A5"].value = "№"
-    ws["B5"].value = "Аты жөні"
-    ws["C5"].value = "Всего пропусков(кол-во часов)"
-    ws["D5"].value = "В том числе"
-    ws["I5"].value = "Процент посещаемости"
-
-    ws["D6"].value = "Заявление"
-    ws["E6"].value = "По болезни"
-    ws["F6"].value = "Соревнования"
-    ws["G6"].value = "Другое"
-    ws["H6"].value = "По неуважительной причине"
-
-    # слияния
-    ws.merge_cells("A5:A6")
-    ws.merge_cells("B5:B6")
-    ws.merge_cells("C5:C6")
-    ws.merge_cells("D5:H5")
-    ws.merge_cells("I5:I6")
-
-    # стили шапки
-    for row in (5, 6):
-        for col in range(1, 10):
-            cell = ws.cell(row=row, column=col)
-            cell.font = bold
-            cell.alignment = center
-            cell.border = border_all
-
-    # ширина колонок
-    ws.column_dimensions["A"].width = 4
-    ws.column_dimensions["B"].width = 30
-    ws.column_dimensions["C"].width = 18
-    ws.column_dimensions["D"].width = 12
-    ws.column_dimensions["E"].width = 12
-    ws.column_dimensions["F"].width = 14
-    ws.column_dimensions["G"].width = 12
-    ws.column_dimensions["H"].width = 22
-    ws.column_dimensions["I"].width = 18
-
-    # Данные по студентам
-    row_idx = 7
-    for r in rows:
-        ws.cell(row=row_idx, column=1, value=r["num"]).alignment = center
-        ws.cell(row=row_idx, column=2, value=r["full_name"]).alignment = left
-
-        ws.cell(row=row_idx, column=3, value=r["total"]).alignment = center
-        ws.cell(row=row_idx, column=4, value=r["statement"]).alignment = center
-        ws.cell(row=row_idx, column=5, value=r["sick"]).alignment = center
-        ws.cell(row=row_idx, column=6, value=r["competition"]).alignment = center
-        ws.cell(row=row_idx, column=7, value=r["other"]).alignment = center
-        ws.cell(row=row_idx, column=8, value=r["unexcused"]).alignment = center
-        ws.cell(row=row_idx, column=9, value=round(r["pct"], 2)).alignment = center
-
-        for col in range(1, 10):
-            ws.cell(row=row_idx, column=col).border = border_all
-
-        row_idx += 1
-
-    # Итоговая строка "Посещаемость по группе"
-    ws.merge_cells(start_row=row_idx, start_column=1, end_row=row_idx, end_column=8)
-    ws.cell(row=row_idx, column=1, value="Посещаемость по группе").alignment = left
-    ws.cell(row=row_idx, column=1).font = bold
-    ws.cell(row=row_idx, column=9, value=round(group_pct, 2)).alignment = center
-    ws.cell(row=row_idx, column=9).font = bold
-
-    for col in range(1, 10):
-        ws.cell(row=row_idx, column=col).border = border_all
-
-    # файл в память
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-
-    filename = f"Посещаемость {g} {start:%Y-%m-%d}_{end:%Y-%m-%d}.xlsx"
-    return send_file(
-        output,
-        as_attachment=True,
-        download_name=filename,
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-    )
+    # данные группы не менялись с прошлой выгрузки — отдаём готовый файл
+    job = make_job(gid, g, start, end, "xlsx", period_title)
+    if job.path.exists():
+        return _send_report(job.path, filename)
+
+    from core.excel import add_sheet, write_group_sheet
+
+    def fill(wb):
+        add_sheet(wb, "Посещаемость", lambda ws: write_group_sheet(
+            ws, g, period_title, build_group_report(gid, start, end).detail
+        ))
+
+    return _xlsx_response(fill, filename, cache_job=job)
+
+
+@head_bp.route("/export_department")
+@require_role("head")
+def department_export_excel():
+    """
+    Все группы заведующей одной книгой: по листу на группу и сводный лист.
+
+    Листы заполняются по одному прямо во время отдачи файла (core.excel),
+    так что память не зависит от числа групп. Параметры day/mode — как
+    у group_export_excel, по умолчанию — семестр.
+    """
+    user = session.get("user") or {}
+    fio = user.get("fio", "")
+    groups = head_list_groups_for_prefixes(get_head_allowed_prefixes(fio))
+    if not groups:
+        flash("Подходящих групп не найдено.", "error")
+        return redirect(url_for("head_bp.choose_group"))
+
+    day = _parse_day(request.args.get("day"))
+    mode = (request.args.get("mode") or "semester")
+    start, end, period_title = _export_period(day, mode)
+
+    from core.excel import add_sheet, write_group_sheet, write_summary_sheet
+
+    summary: list[tuple[str, int, float]] = []
+
+    def group_sheet(g: str, gid: int):
+        def fill_sheet(ws):
+            detail = build_group_report(gid, start, end).detail
+            write_group_sheet(ws, g, period_title, detail)
+            summary.append((g, len(detail["rows"]), detail["group_pct"]))
+        return fill_sheet
+
+    def fill(wb):
+        for g in groups:
+            gid = group_id_for_code(g)
+            if gid is not None:
+                add_sheet(wb, g, group_sheet(g, gid))
+        # сводка — последним листом: к моменту её записи все группы уже посчитаны
+        add_sheet(wb, "Сводка", lambda ws: write_summary_sheet(
+            ws, f"Посещаемость групп {period_title}", summary
+        ))
+
+    filename = f"Посещаемость отделения {start:%Y-%m-%d}_{end:%Y-%m-%d}.xlsx"
+    return _xlsx_response(fill, filename)
+
+
+# ───────────────── фоновые отчёты (core.report_jobs) ─────────────────
+
+
+def _job_json(key: str, state: dict, status: int = 200):
+    body = {"job": key, **state, "status_url": url_for("head_bp.report_status", key=key)}
+    if state["state"] == "done":
+        body["download_url"] = url_for("head_bp.report_download", key=key)
+    return jsonify(body), status
+
+
+def _job_group_code(key: str) -> Optional[str]:
+    """Код группы задачи, если она в зоне текущей заведующей."""
+    gid = parse_key(key)
+    code = group_code_for_id(gid) if gid is not None else None
+    fio = (session.get("user") or {}).get("fio", "")
+    return code if code and head_group_allowed(fio, code) else None
+
+
+@head_bp.route("/reports", methods=["POST"])
+@require_role("head")
+def report_enqueue():
+    """
+    Поставить отчёт в очередь: g, day, mode (как у выгрузки), format=xlsx|json.
+    Ответ 202 с job/status_url; если такой отчёт уже посчитан для текущих
+    данных — сразу 200 и download_url.
+    """
+    data = request.get_json(silent=True) or request.form
+    fio = (session.get("user") or {}).get("fio", "")
+    g = (data.get("g") or "").strip()
+    fmt = (data.get("format") or "xlsx").strip()
+    if fmt not in REPORT_MIMETYPES:
+        return jsonify({"error": "format: xlsx или json"}), 400
+    if not g or not head_group_allowed(fio, g):
+        return jsonify({"error": "Эта группа не входит в вашу зону ответственности."}), 403
+    gid = group_id_for_code(g)
+    if gid is None:
+        return jsonify({"error": "Группа не найдена."}), 404
+
+    day = _parse_day(data.get("day"))
+    start, end, period_title = _export_period(day, data.get("mode") or "day")
+    job = make_job(gid, g, start, end, fmt, period_title)
+    state = submit_report(job)
+    return _job_json(job.key, {"state": state}, 200 if state == "done" else 202)
+
+
+@head_bp.route("/reports/<key>")
+@require_role("head")
+def report_status(key: str):
+    if _job_group_code(key) is None:
+        return jsonify({"error": "Отчёт не найден."}), 404
+    state = report_state(key)
+    return _job_json(key, state, 404 if state["state"] == "missing" else 200)
+
+
+@head_bp.route("/reports/<key>/download")
+@require_role("head")
+def report_download(key: str):
+    g = _job_group_code(key)
+    path = result_path(key) if g else None
+    if path is None:
+        return jsonify({"error": "Отчёт не найден или ещё не готов."}), 404
+    _gid, start, end = key.split("-")[:3]
+    start, end = (datetime.strptime(x, "%Y%m%d").date() for x in (start, end))
+    return _send_report(path, _export_filename(g, start, end, path.suffix.lstrip(".")))
@@ -1,7 +1,7 @@
 # core/helpers.py
-from datetime import datetime, date
-from typing import Optional, Dict, Any, List
-from config import get_schedule_for, LATE_GRACE_MIN, to_minutes, now_minutes
+from datetime import datetime, date, time as dtime
+from typing import Optional, Iterable, List, Union
+from config import get_schedule_for, LATE_GRACE_MIN, to_minutes, now_minutes, Period, Schedule
 
 STATUS_LABELS = {
     "present": "Присутствовал",
@@ -28,38 +28,44 @@ def parse_date_param(s: Optional[str]) -> date:
     except Exception:
         return date.today()
 
-def current_period_index(now_mins: Optional[int] = None, schedule: Optional[List[Dict[str, Any]]] = None) -> int:
+def current_period_index(now_mins: Optional[int] = None, schedule: Optional[Schedule] = None) -> int:
+    """Индекс идущей сейчас пары (bisect по началам пар), -1 — пары нет."""
     nm = now_mins if now_mins is not None else now_minutes()
-    schedule = schedule or get_schedule_for()
-    for i, p in enumerate(schedule):
-        if to_minutes(p["start"]) <= nm <= to_minutes(p["end"]):
-            return i
-    return -1
+    schedule = schedule if schedule is not None else get_schedule_for()
+    return schedule.index_at(nm)
 
-def compute_status(mark_hhmm: Optional[str], period: Dict[str, Any], now_m: Optional[int] = None) -> str:
+def _mark_minutes(mark: Union[str, dtime, None]) -> Optional[int]:
+    """Отметка ("HH:MM" или time из БД) → минуты от полуночи."""
+    if not mark:
+        return None
+    if isinstance(mark, str):
+        return to_minutes(mark)
+    return mark.hour * 60 + mark.minute
+
+def compute_status(mark: Union[str, dtime, None], period: Period, now_m: Optional[int] = None) -> str:
     """Онлайн-статус сегодня, если в БД нет status."""
     nowm = now_m if now_m is not None else now_minutes()
-    start = to_minutes(period["start"])
-    end = to_minutes(period["end"])
-    late_border = start + LATE_GRACE_MIN
-    if not mark_hhmm:
-        if nowm < start: return ""
-        if nowm <= end: return ""
+    if not mark:
+        if nowm <= period.end_min: return ""
         return "absent"
-    m = to_minutes(mark_hhmm)
-    if m <= start: return "present"
-    if start < m <= end:
-        return "late" if m > late_border else "present"
-    return "late"
+    return _status_by_minutes(_mark_minutes(mark), period.start_min, period.end_min)
 
-def compute_status_by_mark(mark_hhmm: Optional[str], period: Dict[str, Any]) -> str:
-    """Оффлайн-статус для прошедших дат, если в БД нет status."""
-    if not mark_hhmm:
+def _status_by_minutes(m: Optional[int], start: int, end: int) -> str:
+    if m is None:
         return "absent"
-    start = to_minutes(period["start"])
-    end   = to_minutes(period["end"])
-    m     = to_minutes(mark_hhmm)
     if m <= start: return "present"
     if start < m <= end:
         return "late" if m > start + LATE_GRACE_MIN else "present"
     return "late"
+
+def compute_status_by_mark(mark: Union[str, dtime, None], period: Period) -> str:
+    """Оффлайн-статус для прошедших дат, если в БД нет status."""
+    return _status_by_minutes(_mark_minutes(mark), period.start_min, period.end_min)
+
+def compute_status_by_mark_batch(marks: Iterable[Optional[dtime]], period: Period) -> List[str]:
+    """
+    compute_status_by_mark для многих отметок одной пары: время берётся
+    из БД как есть (без strftime/split), границы пары уже в минутах.
+    """
+    start, end = period.start_min, period.end_min
+    return [_status_by_minutes(_mark_minutes(t), start, end) for t in marks]
@@ -1,83 +1,146 @@
 from flask import Blueprint, render_template, jsonify, request, session
 from models import SessionLocal, Student, Attendance, PeriodSkip
+from sqlalchemy import select
 from datetime import date, datetime, timedelta
-from config import get_schedule_for, today_key, now_minutes
+from config import today_key, now_minutes
 from core.helpers import (
     parse_date_param,
     compute_status_by_mark,
+    compute_status_by_mark_batch,
     compute_status,
     STATUS_LABELS,
     REASON_LABELS,
 )
 from core.auth_bp import require_role
-from core.permissions import get_curator_groups
-from sqlalchemy import func
+from core.conditional import not_modified, page_etag, with_etag
+from core.attendance import upsert_attendance
+from core.summary import refresh_group_day
+from core.permissions import get_curator_groups, group_ids_for_codes, group_student_ids
+from core.schedule import schedule_for
 
 journal_bp = Blueprint("journal_bp", __name__)
 
 VALID_STATUSES = {"present", "late", "absent", "excused"}
 
+# диапазонный режим: не больше месяца за один запрос
+JOURNAL_RANGE_MAX_DAYS = 31
+
+
+# ───────────────── helpers ─────────────────
+
+
+def _curator_group_ids() -> dict:
+    """Код -> id групп текущего куратора."""
+    fio = (session.get("user") or {}).get("fio", "")
+    curator_groups = [g.strip() for g in (get_curator_groups(fio) or []) if g and g.strip()]
+    return group_ids_for_codes(curator_groups)
+
+
+def _load_students(s, group_ids: dict, selected_gid):
+    """Студенты журнала — только нужные колонки (id, uid, full_name, group_id)."""
+    q_st = s.query(Student.id, Student.uid, Student.full_name, Student.group_id)
+
+    if group_ids:
+        q_st = q_st.filter(Student.group_id.in_(group_ids.values()))
+    else:
+        # у куратора не настроены группы → искусственно пустой результат
+        q_st = q_st.filter(Student.id == -1)
+
+    # если выбрана конкретная группа, сузим дополнительно
+    if selected_gid is not None:
+        q_st = q_st.filter(Student.group_id == selected_gid)
+
+    return q_st.order_by(Student.full_name).all()
+
+
+def _codes_without_pair(schedule, group_id, d: date) -> frozenset:
+    """
+    Коды из показанного расписания, которых нет в расписании группы на этот день
+    (праздник, своё расписание группы) — такие клетки показываем как «нет пары».
+    """
+    own = schedule_for(group_id, d)
+    if own is schedule:
+        return frozenset()
+    return frozenset(p.code for p in schedule if own.get(p.code) is None)
+
+
+def _week_range(d: date, today_d: date):
+    """Пн..Вс недели с днём d (не дальше сегодняшнего дня)."""
+    start = d - timedelta(days=d.weekday())
+    return start, min(start + timedelta(days=6), today_d)
+
+
+# ───────────────── routes ─────────────────
+
 
 @journal_bp.route("/journal")
 @require_role("curator")
 def journal():
+    # ?from=&to= — сетка за несколько дней
+    if request.args.get("from") or request.args.get("to"):
+        return _journal_range()
+
     d = parse_date_param(request.args.get("d"))
     today_d = date.today()
 
     # выбранная группа для фильтра (может быть пустой = все группы куратора)
     selected_group = (request.args.get("g") or "").strip()
 
-    schedule = get_schedule_for(d)
-    with SessionLocal() as s:
-        # список групп, которые привязаны к этому куратору
-        fio = (session.get("user") or {}).get("fio", "")
-        curator_groups = [g.strip() for g in (get_curator_groups(fio) or []) if g and g.strip()]
+    # список групп, которые привязаны к этому куратору
+    group_ids = _curator_group_ids()
+    selected_gid = group_ids.get(selected_group, -1) if selected_group else None
 
-        # базовый запрос по студентам
-        q_st = s.query(Student)
+    # сегодняшние пустые клетки зависят от текущей минуты (прошла ли пара)
+    etag = page_etag(
+        "journal", (d, selected_group), group_ids.values(),
+        clock=now_minutes() if d == today_d else None,
+    )
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
 
-        if curator_groups:
-            q_st = q_st.filter(func.trim(Student.group_code).in_(curator_groups))
-        else:
-            # у куратора не настроены группы → искусственно пустой результат
-            q_st = q_st.filter(Student.id == -1)
-
-        # если выбрана конкретная группа, сузим дополнительно
-        if selected_group:
-            q_st = q_st.filter(func.trim(Student.group_code) == selected_group)
-
-        students = q_st.order_by(Student.full_name).all()
-
-        # список групп для выпадающего фильтра
-        groups_available = [
-            g for (g,) in (
-                s.query(func.trim(Student.group_code))
-                .filter(func.trim(Student.group_code).in_(curator_groups))
-                .distinct()
-                .order_by(func.trim(Student.group_code))
-            )
-        ]
+    # колонки — расписание выбранной группы (для «все группы» — общее)
+    schedule = schedule_for(selected_gid if selected_gid != -1 else None, d)
+
+    with SessionLocal() as s:
 
-        # все отметки за день (по всем группам куратора)
-        recs = s.query(Attendance).filter(Attendance.date == d).all()
+        students = _load_students(s, group_ids, selected_gid)
+
+        # отметки за день — только по показанным студентам и только нужные колонки
+        # (индекс ix_attendance_student_date: объём не зависит от размера колледжа)
+        recs = []
+        if students:
+            recs = s.execute(
+                select(
+                    Attendance.student_id,
+                    Attendance.period_code,
+                    Attendance.status,
+                    Attendance.reason,
+                    Attendance.time,
+                ).where(
+                    Attendance.student_id.in_([st.id for st in students]),
+                    Attendance.date == d,
+                )
+            ).all()
 
         # все skip'ы по дате для групп этого куратора
-        q_sk = s.query(PeriodSkip).filter(PeriodSkip.date == d)
-        if curator_groups:
-            q_sk = q_sk.filter(func.trim(PeriodSkip.group_code).in_(curator_groups))
-        skips = q_sk.all()
+        skips = s.execute(
+            select(PeriodSkip.group_id, PeriodSkip.period_code).where(
+                PeriodSkip.date == d, PeriodSkip.group_id.in_(group_ids.values())
+            )
+        ).all()
+
+    # список групп для выпадающего фильтра (группы со студентами — из индекса прав)
+    groups_available = [g for g in sorted(group_ids) if group_student_ids(group_ids[g])]
 
-    # построим карту: group_code -> set(period_code)
+    # построим карту: group_id -> set(period_code)
     skips_by_group = {}
     for r in skips:
-        g_code = (r.group_code or "").strip()
-        if not g_code:
-            continue
-        skips_by_group.setdefault(g_code, set()).add(r.period_code)
+        skips_by_group.setdefault(r.group_id, set()).add(r.period_code)
 
     # для шапки: если выбрана группа, её skip'ы
     if selected_group:
-        skipped_codes = skips_by_group.get(selected_group, set())
+        skipped_codes = skips_by_group.get(selected_gid, set())
     else:
         skipped_codes = set()
 
@@ -91,17 +154,18 @@ def journal():
     valid_statuses = {"present", "late", "absent", "excused"}
     day_counts = {"present": 0, "late": 0, "absent": 0, "excused_sick": 0, "excused_other": 0}
     per_student_stats = {}
+    no_pair_by_group = {}
 
     # сколько пар в принципе может быть за день (используем для заголовков/подсказок)
     if selected_group:
-        group_skips_for_pairs = skips_by_group.get(selected_group, set())
+        group_skips_for_pairs = skips_by_group.get(selected_gid, set())
         pairs_considered = sum(
             1 for p in schedule
-            if p["code"].startswith("p") and p["code"] not in group_skips_for_pairs
+            if p.is_pair and p.code not in group_skips_for_pairs
         )
     else:
         # если смотрим все группы сразу — считаем по чистому расписанию
-        pairs_considered = sum(1 for p in schedule if p["code"].startswith("p"))
+        pairs_considered = sum(1 for p in schedule if p.is_pair)
 
     for i, st in enumerate(students, start=1):
         row = {
@@ -113,14 +177,17 @@ def journal():
         }
 
         # какие пары отменены именно у ЭТОЙ группы
-        st_group = (st.group_code or "").strip()
-        group_skipped_codes = skips_by_group.get(st_group, set())
+        group_skipped_codes = skips_by_group.get(st.group_id, set())
+        # каких пар у группы в этот день нет вовсе
+        if st.group_id not in no_pair_by_group:
+            no_pair_by_group[st.group_id] = _codes_without_pair(schedule, st.group_id, d)
+        group_no_pair = no_pair_by_group[st.group_id]
 
         attended = 0
         total = 0
 
         for p in schedule:
-            code = p["code"]
+            code = p.code
             rec = rec_map.get((st.id, code))
 
             if rec:
@@ -128,7 +195,8 @@ def journal():
                 reason = (rec.reason or None)
                 mark = rec.time.strftime("%H:%M") if rec.time else None
                 status = stored_status or (
-                    compute_status(mark, p, nowm) if is_today else compute_status_by_mark(mark, p)
+                    compute_status(rec.time, p, nowm) if is_today
+                    else compute_status_by_mark(rec.time, p)
                 )
             else:
                 reason = None
@@ -136,8 +204,8 @@ def journal():
                 status = compute_status(mark, p, nowm) if is_today else ""
 
             is_skipped = False
-            # Если для группы студента эта пара отменена → принудительно skip
-            if code in group_skipped_codes and code.startswith("p"):
+            # Если для группы студента эта пара отменена (или её нет) → принудительно skip
+            if (code in group_skipped_codes and code.startswith("p")) or code in group_no_pair:
                 status = "skip"
                 mark = None
                 reason = None
@@ -212,8 +280,9 @@ def journal():
 
     nav_prev = (d - timedelta(days=1)).strftime("%Y-%m-%d")
     nav_next = min(today_d, d + timedelta(days=1)).strftime("%Y-%m-%d")
+    week_from, week_to = _week_range(d, today_d)
 
-    return render_template(
+    return with_etag(render_template(
         "journal.html",
         schedule=schedule,
         table=table,
@@ -230,10 +299,187 @@ def journal():
         pairs_considered=pairs_considered,
         nav_prev=nav_prev,
         nav_next=nav_next,
+        week_from=week_from.strftime("%Y-%m-%d"),
+        week_to=week_to.strftime("%Y-%m-%d"),
         # фильтр групп
         groups_available=groups_available,
         selected_group=selected_group,
+    ), etag)
+
+
+# буква в клетке сетки и класс бейджа
+RANGE_CELL = {
+    "present": ("П", "bg-present"),
+    "late": ("О", "bg-late"),
+    "absent": ("Н", "bg-absent"),
+    "excused": ("У", "bg-excused"),
+    "skip": ("—", "bg-skip"),
+    "": ("·", "bg-empty"),
+}
+
+
+def _journal_range():
+    """
+    Журнал за диапазон дат: студенты × дни × пары одной страницей.
+
+    Отметки и снятые пары за весь диапазон берутся одним запросом каждые;
+    сетка — список статусов на студента, выровненный по списку колонок (день, пара).
+    Отметки без сохранённого статуса досчитываются пачкой по каждой колонке.
+    """
+    today_d = date.today()
+    start = parse_date_param(request.args.get("from") or request.args.get("to"))
+    end = min(parse_date_param(request.args.get("to") or request.args.get("from")), today_d)
+    if start > end:
+        start, end = end, start
+    start = max(start, end - timedelta(days=JOURNAL_RANGE_MAX_DAYS - 1))
+
+    selected_group = (request.args.get("g") or "").strip()
+    group_ids = _curator_group_ids()
+    selected_gid = group_ids.get(selected_group, -1) if selected_group else None
+    column_gid = selected_gid if selected_gid != -1 else None
+
+    etag = page_etag(
+        "journal_range", (start, end, selected_group), group_ids.values(),
+        clock=now_minutes() if start <= today_d <= end else None,
     )
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+
+    # колонки: только дни, на которые у группы (или по общему расписанию) есть пары
+    days = []
+    columns = []  # [(date, Period)]
+    day_starts = set()  # индексы первых колонок дня (для разделителей)
+    d = start
+    while d <= end:
+        schedule = schedule_for(column_gid, d)
+        if schedule:
+            days.append({"date": d, "span": len(schedule)})
+            day_starts.add(len(columns))
+            columns.extend((d, p) for p in schedule)
+        d += timedelta(days=1)
+    col_index = {(cd, p.code): j for j, (cd, p) in enumerate(columns)}
+
+    with SessionLocal() as s:
+        students = _load_students(s, group_ids, selected_gid)
+
+        recs = []
+        if students and columns:
+            recs = s.execute(
+                select(
+                    Attendance.student_id,
+                    Attendance.date,
+                    Attendance.period_code,
+                    Attendance.status,
+                    Attendance.time,
+                ).where(
+                    Attendance.student_id.in_([st.id for st in students]),
+                    Attendance.date >= start,
+                    Attendance.date <= end,
+                )
+            ).all()
+
+        skips = s.execute(
+            select(PeriodSkip.group_id, PeriodSkip.date, PeriodSkip.period_code).where(
+                PeriodSkip.group_id.in_(group_ids.values()),
+                PeriodSkip.date >= start,
+                PeriodSkip.date <= end,
+            )
+        ).all()
+
+    row_of = {st.id: i for i, st in enumerate(students)}
+    grid = [[""] * len(columns) for _ in students]
+
+    # сегодня: пустая клетка уже прошедшей пары = отсутствовал (как в дневном режиме)
+    if start <= today_d <= end:
+        nowm = now_minutes()
+        for j, (cd, p) in enumerate(columns):
+            if cd == today_d:
+                empty = compute_status(None, p, nowm)
+                if empty:
+                    for cells in grid:
+                        cells[j] = empty
+
+    # отметки; без статуса — досчитываем пачкой по колонке
+    pending = {}
+    for sid, rd, code, status, t in recs:
+        j = col_index.get((rd, code))
+        if j is None:
+            continue
+        status = (status or "").strip()
+        if status:
+            grid[row_of[sid]][j] = status
+        else:
+            pending.setdefault(j, []).append((row_of[sid], t))
+    for j, items in pending.items():
+        cd, p = columns[j]
+        if cd == today_d:
+            nowm = now_minutes()
+            statuses = [compute_status(t, p, nowm) for _i, t in items]
+        else:
+            statuses = compute_status_by_mark_batch([t for _i, t in items], p)
+        for (i, _t), status in zip(items, statuses):
+            grid[i][j] = status
+
+    # снятые пары групп + пары, которых у группы в этот день нет по расписанию
+    skipped_cols = {}
+    for gid, sd, code in skips:
+        j = col_index.get((sd, code))
+        if j is not None and code.startswith("p"):
+            skipped_cols.setdefault(gid, []).append(j)
+    for gid in {st.group_id for st in students}:
+        for day in days:
+            no_pair = _codes_without_pair(schedule_for(column_gid, day["date"]), gid, day["date"])
+            if no_pair:
+                skipped_cols.setdefault(gid, []).extend(
+                    col_index[(day["date"], code)] for code in no_pair
+                )
+
+    table = []
+    totals = dict.fromkeys(VALID_STATUSES, 0)
+    for i, st in enumerate(students):
+        cells = grid[i]
+        for j in skipped_cols.get(st.group_id, ()):
+            cells[j] = "skip"
+        attended = total = 0
+        for status in cells:
+            if status in VALID_STATUSES:
+                total += 1
+                totals[status] += 1
+                if status in ("present", "late"):
+                    attended += 1
+        table.append({
+            "num": i + 1,
+            "uid": st.uid,
+            "full_name": st.full_name,
+            "cells": cells,
+            "attended": attended,
+            "total": total,
+            "percent": round(attended / total * 100, 1) if total else 0.0,
+        })
+
+    span = end - start
+    prev_to = start - timedelta(days=1)
+    next_from = min(end + timedelta(days=1), today_d)
+
+    return with_etag(render_template(
+        "journal_range.html",
+        columns=columns,
+        days=days,
+        day_starts=day_starts,
+        table=table,
+        totals=totals,
+        cell_view=RANGE_CELL,
+        date_from=start.strftime("%Y-%m-%d"),
+        date_to=end.strftime("%Y-%m-%d"),
+        today=today_key(),
+        nav_prev=((prev_to - span).strftime("%Y-%m-%d"), prev_to.strftime("%Y-%m-%d")),
+        nav_next=(next_from.strftime("%Y-%m-%d"),
+                  min(next_from + span, today_d).strftime("%Y-%m-%d")),
+        groups_available=[g for g in sorted(group_ids) if group_student_ids(group_ids[g])],
+        selected_group=selected_group,
+        max_days=JOURNAL_RANGE_MAX_DAYS,
+    ), etag)
 
 
 @journal_bp.route("/journal/skip", methods=["POST"])
@@ -247,42 +493,46 @@ def journal_skip_toggle():
     if not code or not code.startswith("p"):
         return jsonify({"ok": False, "error": "Неверный period_code"}), 400
 
-    fio = (session.get("user") or {}).get("fio", "")
-    curator_groups = [gg.strip() for gg in (get_curator_groups(fio) or []) if gg and gg.strip()]
+    group_ids = _curator_group_ids()
 
-    if not curator_groups:
+    if not group_ids:
         return jsonify({"ok": False, "error": "Нет доступных групп"}), 400
 
     with SessionLocal() as s:
         if g == "__ALL__":
             # применяем ко всем группам куратора
-            for grp in curator_groups:
+            for gid in group_ids.values():
                 ex = (
                     s.query(PeriodSkip)
-                    .filter_by(date=d, period_code=code, group_code=grp)
+                    .filter_by(date=d, period_code=code, group_id=gid)
                     .first()
                 )
                 if on and not ex:
-                    s.add(PeriodSkip(date=d, period_code=code, group_code=grp))
+                    s.add(PeriodSkip(date=d, period_code=code, group_id=gid))
                 elif not on and ex:
                     s.delete(ex)
+                else:
+                    continue
+                refresh_group_day(s, gid, d)
             s.commit()
         else:
             if not g:
                 return jsonify({"ok": False, "error": "Не выбрана группа"}), 400
-            if g not in curator_groups:
+            if g not in group_ids:
                 return jsonify({"ok": False, "error": "Нет доступа к группе"}), 403
 
             ex = (
                 s.query(PeriodSkip)
-                .filter_by(date=d, period_code=code, group_code=g)
+                .filter_by(date=d, period_code=code, group_id=group_ids[g])
                 .first()
             )
             if on and not ex:
-                s.add(PeriodSkip(date=d, period_code=code, group_code=g))
+                s.add(PeriodSkip(date=d, period_code=code, group_id=group_ids[g]))
+                refresh_group_day(s, group_ids[g], d)
                 s.commit()
             elif not on and ex:
                 s.delete(ex)
+                refresh_group_day(s, group_ids[g], d)
                 s.commit()
 
     return jsonify({"ok": True})
@@ -309,29 +559,22 @@ def journal_set_status():
 
     now_t = datetime.now().time()
     with SessionLocal() as s:
-        rec = (
-            s.query(Attendance)
+        upsert_attendance(
+            s,
+            [(d, period_code, student_id, status, reason if status == "excused" else None, now_t)],
+            keep_time=True,  # ручная правка не сдвигает время фактической отметки
+        )
+        s.commit()
+        mark_time = (
+            s.query(Attendance.time)
             .filter(
                 Attendance.date == d,
                 Attendance.period_code == period_code,
                 Attendance.student_id == student_id,
             )
-            .first()
+            .scalar()
         )
-        if not rec:
-            rec = Attendance(
-                date=d,
-                period_code=period_code,
-                student_id=student_id,
-                time=now_t,
-            )
-            s.add(rec)
-        rec.status = status
-        rec.reason = reason if status == "excused" else None
-        if not rec.time:
-            rec.time = now_t
-        s.commit()
-        time_str = rec.time.strftime("%H:%M") if rec.time else ""
+        time_str = mark_time.strftime("%H:%M") if mark_time else ""
         label = STATUS_LABELS.get(status, status)
         reason_label = REASON_LABELS.get(reason) if reason else None
 
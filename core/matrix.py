@@ -0,0 +1,192 @@
+# core/matrix.py
+"""
+Матрица посещаемости группы за период на NumPy.
+
+AttendanceMatrix.load() одним запросом читает сырые отметки группы за
+[start..end] (без снятых PeriodSkip пар и праздников) и раскладывает их в пять
+параллельных целочисленных массивов — по элементу на отметку:
+
+    student  — индекс студента в matrix.students (порядок по ФИО)
+    day      — номер дня от start
+    period   — индекс кода пары в matrix.periods
+    status   — индекс в core.summary.STATUSES
+    reason   — индекс в core.summary.MISSED_REASONS, -1 — не пропуск
+
+Дальше всё считается векторно (np.bincount по плоскому индексу
+«студент × колонка»), без цикла Python по отметкам: часы пропусков по
+причинам, процент посещаемости, агрегаты по группе, разрезы по дням и
+парам. Результат строк совпадает с core.reports._student_row.
+
+Используется движком отчётов при REPORT_ENGINE=matrix
+(см. core.reports.build_group_report).
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date
+
+import numpy as np
+from sqlalchemy import Integer, and_, cast, func, select
+
+from models import Attendance, PeriodSkip, Student
+from core.reports import HOURS_PER_LESSON, StudentRow
+from core.summary import STATUSES, MISSED_REASONS, classify_missed, not_holiday
+
+_STATUS_CODE = {k: i for i, k in enumerate(STATUSES)}
+_REASON_CODE = {k: i for i, k in enumerate(MISSED_REASONS)}
+_ABSENT = _STATUS_CODE["absent"]
+_EXCUSED = _STATUS_CODE["excused"]
+
+
+def _codes(values, mapping: dict, dtype) -> np.ndarray:
+    return np.fromiter(map(mapping.__getitem__, values), dtype=dtype, count=len(values))
+
+
+@dataclass
+class AttendanceMatrix:
+    start: date
+    end: date
+    students: list[StudentRow]
+    periods: list[str]
+    student: np.ndarray
+    day: np.ndarray
+    period: np.ndarray
+    status: np.ndarray
+    reason: np.ndarray
+
+    @classmethod
+    def load(cls, s, group_id: int, start: date, end: date) -> "AttendanceMatrix":
+        students = [
+            StudentRow(sid, full_name) for sid, full_name in s.execute(
+                select(Student.id, Student.full_name)
+                .where(Student.group_id == group_id)
+                .order_by(Student.full_name)
+            )
+        ]
+        # Core-запрос через connection (без ORM-обработки строк); номер дня
+        # считает SQLite, чтобы не разбирать даты в Python
+        rows = s.connection().execute(
+            select(
+                Attendance.student_id,
+                cast(func.julianday(Attendance.date) - func.julianday(start.isoformat()), Integer),
+                Attendance.period_code,
+                Attendance.status,
+                Attendance.reason,
+            )
+            .join(Student, Student.id == Attendance.student_id)
+            .outerjoin(
+                PeriodSkip,
+                and_(
+                    PeriodSkip.group_id == Student.group_id,
+                    PeriodSkip.date == Attendance.date,
+                    PeriodSkip.period_code == Attendance.period_code,
+                ),
+            )
+            .where(
+                Student.group_id == group_id,
+                Attendance.date >= start,
+                Attendance.date <= end,
+                Attendance.status.in_(STATUSES),
+                PeriodSkip.id.is_(None),
+                not_holiday(group_id, Attendance.date),
+            )
+        ).all()
+
+        if not rows:
+            empty = np.empty(0, dtype=np.int32)
+            return cls(start, end, students, [], empty, empty, empty, empty, empty)
+
+        sids, days, codes, statuses, reasons = zip(*rows)
+        student_idx = {st.id: i for i, st in enumerate(students)}
+        periods = sorted(set(codes))
+        period_idx = {pc: i for i, pc in enumerate(periods)}
+        # причин мало и они повторяются — классифицируем каждую пару (статус, причина) один раз
+        pairs = list(zip(statuses, reasons))
+        reason_idx = {
+            pair: _REASON_CODE.get(classify_missed(*pair), -1) for pair in set(pairs)
+        }
+
+        return cls(
+            start,
+            end,
+            students,
+            periods,
+            student=_codes(sids, student_idx, np.int32),
+            day=np.fromiter(days, dtype=np.int32, count=len(days)),
+            period=_codes(codes, period_idx, np.int16),
+            status=_codes(statuses, _STATUS_CODE, np.int8),
+            reason=_codes(pairs, reason_idx, np.int8),
+        )
+
+    # ───────────────── свёртки ─────────────────
+
+    def __len__(self) -> int:
+        return len(self.status)
+
+    @property
+    def n_days(self) -> int:
+        return (self.end - self.start).days + 1
+
+    def _per_student(self, column: np.ndarray, width: int, mask=None) -> np.ndarray:
+        """Матрица (студенты × width): число отметок с каждым значением column."""
+        student = self.student
+        if mask is not None:
+            student, column = student[mask], column[mask]
+        n = len(self.students)
+        flat = student.astype(np.int64) * width + column
+        return np.bincount(flat, minlength=n * width).reshape(n, width)
+
+    def status_counts(self) -> np.ndarray:
+        """(студенты × STATUSES) — пары по статусам."""
+        return self._per_student(self.status, len(STATUSES))
+
+    def reason_counts(self) -> np.ndarray:
+        """(студенты × MISSED_REASONS) — пропущенные пары по причинам."""
+        return self._per_student(self.reason, len(MISSED_REASONS), self.reason >= 0)
+
+    def missed_by_day(self) -> np.ndarray:
+        """(студенты × дни периода) — пропущенные пары по дням."""
+        missed = (self.status == _ABSENT) | (self.status == _EXCUSED)
+        return self._per_student(self.day, self.n_days, missed)
+
+    def missed_by_period(self) -> np.ndarray:
+        """(студенты × matrix.periods) — пропуски по номеру пары."""
+        missed = (self.status == _ABSENT) | (self.status == _EXCUSED)
+        return self._per_student(self.period, len(self.periods), missed)
+
+    def percentages(self, counts: np.ndarray | None = None) -> np.ndarray:
+        """Процент посещаемости по студентам; без отметок — 100%."""
+        if counts is None:
+            counts = self.status_counts()
+        total = counts.sum(axis=1)
+        attended = total - counts[:, _ABSENT] - counts[:, _EXCUSED]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pct = attended * 100.0 / total
+        return np.where(total > 0, pct, 100.0)
+
+    # ───────────────── формат core.reports ─────────────────
+
+    def stats_counts(self) -> dict:
+        """Агрегаты по группе: {статус: число пар}."""
+        counts = np.bincount(self.status, minlength=len(STATUSES))
+        return dict(zip(STATUSES, counts.tolist()))
+
+    def detail(self) -> dict:
+        """{"rows", "group_pct"} — то же, что build_group_report(...).detail."""
+        counts = self.status_counts()
+        pct = self.percentages(counts).tolist()
+        total = ((counts[:, _ABSENT] + counts[:, _EXCUSED]) * HOURS_PER_LESSON).tolist()
+        reasons = (self.reason_counts() * HOURS_PER_LESSON).tolist()
+
+        rows = [
+            {
+                "num": i + 1,
+                "full_name": st.full_name,
+                "total": total[i],
+                **dict(zip(MISSED_REASONS, reasons[i])),
+                "pct": pct[i],
+            }
+            for i, st in enumerate(self.students)
+        ]
+        group_pct = sum(pct) / len(pct) if pct else 0.0
+        return {"rows": rows, "group_pct": group_pct}
@@ -0,0 +1,785 @@
+# core/migrations.py
+"""
+Версионные миграции схемы.
+
+В таблице schema_version хранятся применённые версии. При старте воркера
+делается один SELECT max(version); если схема актуальна — больше ничего.
+Если нет — первый воркер берёт файловую блокировку и применяет недостающие
+миграции по порядку (каждую в своей транзакции), остальные ждут и видят
+уже обновлённую версию.
+
+Новая миграция = новая функция + строка в MIGRATIONS (в конец списка).
+Миграции пишем идемпотентно: на свежей БД baseline уже создаёт таблицы
+по актуальным моделям, и последующие шаги должны это спокойно пережить.
+"""
+from __future__ import annotations
+
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import select, text
+from sqlalchemy.exc import OperationalError
+
+from models import (
+    engine, init_db, AcademicTerm, AttendanceDaily, CacheVersion, ChatMessage, ChatParticipant,
+    ChatUnread, Conversation, Group, GroupVersion,
+    HeadPrefix,
+    Holiday,
+    PeriodSkip, RoleScope, StarostaLock, TimetablePeriod,
+)
+
+
+# ───────────────── helpers ─────────────────
+
+
+def _has_table(conn, table: str) -> bool:
+    row = conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)
+    ).first()
+    return row is not None
+
+
+def _has_column(conn, table: str, column: str) -> bool:
+    cols = {r[1] for r in conn.exec_driver_sql(f"PRAGMA table_info({table})")}
+    return column in cols
+
+
+# ───────────────── миграции ─────────────────
+
+
+def m001_baseline(conn):
+    """Все таблицы по текущим моделям (CREATE ... IF NOT EXISTS)."""
+    init_db(conn)
+
+
+def m002_attendance_status_reason(conn):
+    """Старые БД: в attendance не было колонок status/reason."""
+    if not _has_column(conn, "attendance", "status"):
+        conn.exec_driver_sql("ALTER TABLE attendance ADD COLUMN status TEXT")
+    if not _has_column(conn, "attendance", "reason"):
+        conn.exec_driver_sql("ALTER TABLE attendance ADD COLUMN reason TEXT")
+
+
+def m003_trim_group_codes(conn):
+    """Коды групп без пробелов по краям (запросы сравнивают колонку напрямую)."""
+    # OR IGNORE + DELETE: если «чистый» дубль уже есть, грязная копия лишняя
+    tables = [t for t in ("students", "period_skips", "starosta_locks")
+              if _has_column(conn, t, "group_code")]
+    for table in tables:
+        conn.exec_driver_sql(
+            f"UPDATE OR IGNORE {table} SET group_code = trim(group_code) "
+            "WHERE group_code IS NOT NULL AND group_code != trim(group_code)"
+        )
+        if table != "students":
+            conn.exec_driver_sql(f"DELETE FROM {table} WHERE group_code != trim(group_code)")
+    if "students" in tables:
+        conn.exec_driver_sql("UPDATE students SET group_code = NULL WHERE group_code = ''")
+
+
+def m004_drop_duplicate_attendance_indexes(conn):
+    """
+    Прежний init_db() досоздавал копии уже существующих индексов
+    (уникальный по date+period_code+student_id и по status) — лишняя цена на каждой записи.
+    """
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ux_attendance_date_period_student")
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_attendance_status_dup")
+
+
+def _drop_indexes(conn, table: str) -> None:
+    """Удалить явные индексы таблицы (имена индексов в SQLite глобальны)."""
+    names = [
+        r[0] for r in conn.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type='index' AND tbl_name=? AND sql IS NOT NULL",
+            (table,),
+        )
+    ]
+    for name in names:
+        conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+
+
+def _rebuild_with_group_id(conn, model, columns: list[str]) -> None:
+    """
+    Пересоздать таблицу модели, заменив group_code на group_id.
+
+    SQLite не умеет менять уникальные ограничения «на месте»,
+    поэтому: переименовать → создать по модели → перелить данные → удалить старую.
+    """
+    table = model.__tablename__
+    old = f"{table}_old"
+    _drop_indexes(conn, table)
+    conn.exec_driver_sql(f"ALTER TABLE {table} RENAME TO {old}")
+    model.__table__.create(conn)
+    cols = ", ".join(columns)
+    src = ", ".join(f"o.{c}" for c in columns)
+    conn.exec_driver_sql(
+        f"INSERT OR IGNORE INTO {table} ({cols}, group_id) "
+        f"SELECT {src}, g.id FROM {old} o JOIN groups g ON g.code = o.group_code"
+    )
+    conn.exec_driver_sql(f"DROP TABLE {old}")
+
+
+def m005_groups(conn):
+    """
+    Группы — отдельная таблица с целочисленным id вместо строки group_code
+    в students / period_skips / starosta_locks.
+    """
+    Group.__table__.create(conn, checkfirst=True)
+
+    sources = [t for t in ("students", "period_skips", "starosta_locks")
+               if _has_column(conn, t, "group_code")]
+    for table in sources:
+        conn.exec_driver_sql(
+            f"INSERT OR IGNORE INTO groups (code) SELECT DISTINCT group_code FROM {table} "
+            "WHERE group_code IS NOT NULL AND group_code != ''"
+        )
+
+    if "students" in sources:
+        if not _has_column(conn, "students", "group_id"):
+            conn.exec_driver_sql(
+                "ALTER TABLE students ADD COLUMN group_id INTEGER REFERENCES groups(id)"
+            )
+        conn.exec_driver_sql(
+            "UPDATE students SET group_id = "
+            "(SELECT g.id FROM groups g WHERE g.code = students.group_code)"
+        )
+        conn.exec_driver_sql("DROP INDEX IF EXISTS ix_students_group_code")
+        conn.exec_driver_sql("ALTER TABLE students DROP COLUMN group_code")
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_students_group_id ON students (group_id)"
+    )
+
+    if "period_skips" in sources:
+        _rebuild_with_group_id(conn, PeriodSkip, ["id", "date", "period_code"])
+    if "starosta_locks" in sources:
+        _rebuild_with_group_id(
+            conn, StarostaLock, ["id", "date", "period_code", "submitted_by", "created_at"]
+        )
+
+
+def m006_attendance_daily(conn):
+    """Дневная сводка для отчётов + первичное заполнение из attendance."""
+    from core.summary import rebuild
+
+    AttendanceDaily.__table__.create(conn, checkfirst=True)
+    rebuild(conn)
+
+
+# Прежние зашитые в core/permissions.py карты — переносятся в БД один раз
+_LEGACY_SCOPES = {
+    "curator": {
+        "Султангазинова Диана Сериковна": ["PO-115", "PO-393"],
+        "Брусенко Владислав Сергеевич": ["PO-175", "PO-323"],
+    },
+    "starosta": {
+        "Староста ПО175": ["PO-175"],
+    },
+}
+_LEGACY_HEAD_PREFIXES = {
+    "Иванова Галина Петровна": ["PO-"],
+}
+
+# таблица -> события, после которых индекс зон ответственности надо пересобрать
+_SCOPE_TRIGGERS = {
+    "groups": ("INSERT", "UPDATE OF code", "DELETE"),
+    "students": ("INSERT", "UPDATE OF group_id", "DELETE"),
+    "role_scopes": ("INSERT", "UPDATE", "DELETE"),
+    "head_prefixes": ("INSERT", "UPDATE", "DELETE"),
+}
+
+
+def _version_trigger(conn, table: str, event: str, name: str) -> None:
+    """Триггер: любое событие event на table увеличивает cache_versions[name]."""
+    suffix = event.split()[0].lower()
+    conn.exec_driver_sql(
+        f"CREATE TRIGGER IF NOT EXISTS trg_{name}_{table}_{suffix} AFTER {event} ON {table} "
+        f"BEGIN UPDATE cache_versions SET version = version + 1 WHERE name = '{name}'; END"
+    )
+
+
+def m007_role_scopes(conn):
+    """
+    Зоны ответственности в БД вместо словарей в коде + счётчик версии 'scope',
+    который триггеры увеличивают при любой правке групп/студентов/назначений.
+    """
+    for model in (RoleScope, HeadPrefix, CacheVersion):
+        model.__table__.create(conn, checkfirst=True)
+    conn.exec_driver_sql("INSERT OR IGNORE INTO cache_versions (name, version) VALUES ('scope', 0)")
+
+    for role, by_fio in _LEGACY_SCOPES.items():
+        for fio, codes in by_fio.items():
+            for code in codes:
+                conn.exec_driver_sql("INSERT OR IGNORE INTO groups (code) VALUES (?)", (code,))
+                conn.exec_driver_sql(
+                    "INSERT OR IGNORE INTO role_scopes (role, fio, group_id) "
+                    "SELECT ?, ?, id FROM groups WHERE code = ?",
+                    (role, fio, code),
+                )
+    for fio, prefixes in _LEGACY_HEAD_PREFIXES.items():
+        for prefix in prefixes:
+            conn.exec_driver_sql(
+                "INSERT OR IGNORE INTO head_prefixes (fio, prefix) VALUES (?, ?)", (fio, prefix)
+            )
+
+    for table, events in _SCOPE_TRIGGERS.items():
+        for event in events:
+            _version_trigger(conn, table, event, "scope")
+
+
+_SCHEDULE_TABLES = ("timetable_periods", "academic_terms", "holidays")
+
+
+def m008_timetable_calendar(conn):
+    """
+    Расписание звонков, учебные периоды и праздники в БД + счётчик версии
+    'schedule' для кэша core.schedule. Общее расписание заполняется
+    из config.WEEKLY_SCHEDULE, если таблица пуста.
+    """
+    from config import WEEKLY_SCHEDULE
+
+    for model in (TimetablePeriod, AcademicTerm, Holiday):
+        model.__table__.create(conn, checkfirst=True)
+    conn.exec_driver_sql(
+        "INSERT OR IGNORE INTO cache_versions (name, version) VALUES ('schedule', 0)"
+    )
+
+    rows = [
+        {"group_id": None, "weekday": wd, "code": p["code"], "title": p["title"],
+         "start": p["start"], "end": p["end"]}
+        for wd, items in WEEKLY_SCHEDULE.items()
+        for p in items
+    ]
+    if rows and not conn.exec_driver_sql("SELECT 1 FROM timetable_periods LIMIT 1").first():
+        conn.execute(TimetablePeriod.__table__.insert(), rows)
+
+    for table in _SCHEDULE_TABLES:
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            _version_trigger(conn, table, event, "schedule")
+
+
+# (таблица, событие, выражение group_id) — какие записи меняют данные группы
+_GROUP_VERSION_TRIGGERS = [
+    ("attendance", "INSERT", "(SELECT group_id FROM students WHERE id = NEW.student_id)"),
+    ("attendance", "UPDATE", "(SELECT group_id FROM students WHERE id = NEW.student_id)"),
+    ("attendance", "DELETE", "(SELECT group_id FROM students WHERE id = OLD.student_id)"),
+    ("period_skips", "INSERT", "NEW.group_id"),
+    ("period_skips", "UPDATE", "NEW.group_id"),
+    ("period_skips", "DELETE", "OLD.group_id"),
+    ("students", "INSERT", "NEW.group_id"),
+    ("students", "UPDATE", "NEW.group_id"),
+    ("students", "DELETE", "OLD.group_id"),
+]
+
+
+def _group_version_bump(group_expr: str) -> str:
+    return (
+        f"INSERT INTO group_versions (group_id, version) "
+        f"SELECT g, 1 FROM (SELECT {group_expr} AS g) WHERE g IS NOT NULL "
+        f"ON CONFLICT (group_id) DO UPDATE SET version = version + 1;"
+    )
+
+
+def m009_group_versions(conn):
+    """
+    Версия данных по каждой группе (group_versions) для кэша отчётов.
+    UPDATE, переносящий запись в другую группу, увеличивает версию обеих.
+    """
+    GroupVersion.__table__.create(conn, checkfirst=True)
+    for table, event, group_expr in _GROUP_VERSION_TRIGGERS:
+        body = _group_version_bump(group_expr)
+        if event == "UPDATE":
+            old_expr = group_expr.replace("NEW.", "OLD.")
+            body += " " + _group_version_bump(
+                f"CASE WHEN {old_expr} IS NOT {group_expr} THEN {old_expr} END"
+            )
+        conn.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS trg_group_version_{table}_{event.lower()} "
+            f"AFTER {event} ON {table} BEGIN {body} END"
+        )
+
+
+
+def _chat_unread_delta(key_expr: str, delta: int, key: str = "participant_id") -> str:
+    return (
+        f"INSERT INTO chat_unread ({key}, unread) VALUES ({key_expr}, {delta}) "
+        f"ON CONFLICT ({key}) DO UPDATE SET unread = unread + {delta};"
+    )
+
+
+_CHAT_UNREAD_BUMP = "UPDATE cache_versions SET version = version + 1 WHERE name = 'chat_unread';"
+
+
+def m010_chat_unread(conn):
+    """
+    Счётчик непрочитанных по получателю (chat_unread) вместо COUNT(*) на
+    каждый опрос + индекс (recipient_fio, is_read). Триггеры держат счётчик
+    и версию cache_versions['chat_unread'] (по ней пуш-канал видит правки
+    из других воркеров).
+
+    Таблицы по ФИО переделывает m012; на свежей БД (сообщения уже по
+    диалогам) остаётся только строка версии.
+    """
+    conn.exec_driver_sql(
+        "INSERT OR IGNORE INTO cache_versions (name, version) VALUES ('chat_unread', 0)"
+    )
+    if not _has_column(conn, "chat_messages", "recipient_fio"):
+        return
+    # baseline мог создать chat_unread по новой модели — счётчик всё равно пересчитывается
+    conn.exec_driver_sql("DROP TABLE IF EXISTS chat_unread")
+    conn.exec_driver_sql(
+        "CREATE TABLE chat_unread ("
+        "recipient_fio VARCHAR(255) NOT NULL PRIMARY KEY, unread INTEGER NOT NULL)"
+    )
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_chat_messages_recipient_read "
+        "ON chat_messages (recipient_fio, is_read)"
+    )
+    conn.exec_driver_sql(
+        "INSERT INTO chat_unread (recipient_fio, unread) "
+        "SELECT recipient_fio, count(*) FROM chat_messages WHERE is_read = 0 "
+        "GROUP BY recipient_fio"
+    )
+
+    triggers = {
+        "insert": ("AFTER INSERT ON chat_messages WHEN NEW.is_read = 0",
+                   _chat_unread_delta("NEW.recipient_fio", 1, "recipient_fio")),
+        "delete": ("AFTER DELETE ON chat_messages WHEN OLD.is_read = 0",
+                   _chat_unread_delta("OLD.recipient_fio", -1, "recipient_fio")),
+        # «прочитано», «снова непрочитано» или смена получателя
+        "update": ("AFTER UPDATE OF is_read, recipient_fio ON chat_messages "
+                   "WHEN (OLD.is_read = 0) IS NOT (NEW.is_read = 0) "
+                   "OR OLD.recipient_fio IS NOT NEW.recipient_fio",
+                   "INSERT INTO chat_unread (recipient_fio, unread) "
+                   "SELECT OLD.recipient_fio, -1 WHERE OLD.is_read = 0 "
+                   "ON CONFLICT (recipient_fio) DO UPDATE SET unread = unread - 1; "
+                   "INSERT INTO chat_unread (recipient_fio, unread) "
+                   "SELECT NEW.recipient_fio, 1 WHERE NEW.is_read = 0 "
+                   "ON CONFLICT (recipient_fio) DO UPDATE SET unread = unread + 1;"),
+    }
+    for event, (when, body) in triggers.items():
+        conn.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS trg_chat_unread_{event} {when} "
+            f"BEGIN {body} {_CHAT_UNREAD_BUMP} END"
+        )
+
+
+
+def m011_chat_pair_index(conn):
+    """
+    Индекс (sender_fio, recipient_fio, id) для постраничной истории диалога;
+    одиночный индекс по sender_fio — его префикс, удаляется.
+    """
+    if not _has_column(conn, "chat_messages", "sender_fio"):
+        return
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_chat_messages_pair "
+        "ON chat_messages (sender_fio, recipient_fio, id)"
+    )
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_chat_messages_sender_fio")
+
+
+# общий ящик техподдержки: так он подписан в старых сообщениях
+_LEGACY_TECH_NAME = "Техническая Поддержка"
+
+
+def _chat_recipient(row: str) -> str:
+    """Получатель сообщения row (NEW/OLD) — второй участник его диалога."""
+    return (
+        f"(SELECT CASE WHEN c.a_id = {row}.sender_id THEN c.b_id ELSE c.a_id END "
+        f"FROM conversations c WHERE c.id = {row}.conversation_id)"
+    )
+
+
+def _chat_participants_from_fio(conn) -> None:
+    """
+    Перевести chat_messages с пар ФИО на диалоги участников.
+
+    ФИО сопоставляются так же, как при входе: tech и «Техническая
+    Поддержка» — ящик поддержки, иначе сотрудник (users.fio), иначе
+    студент (students.full_name). Кого уже нет — участник только с подписью.
+    """
+    for event in ("insert", "delete", "update"):
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS trg_chat_unread_{event}")
+
+    conn.exec_driver_sql(
+        "CREATE TEMP TABLE chat_names AS "
+        "SELECT sender_fio AS fio, NULL AS pid FROM chat_messages "
+        "UNION SELECT recipient_fio, NULL FROM chat_messages"
+    )
+    conn.exec_driver_sql("CREATE UNIQUE INDEX temp.ix_chat_names_fio ON chat_names (fio)")
+
+    conn.exec_driver_sql(
+        "UPDATE chat_names SET pid = (SELECT id FROM chat_participants WHERE kind = 'support') "
+        "WHERE fio = ? OR fio IN (SELECT fio FROM users WHERE role = 'tech')",
+        (_LEGACY_TECH_NAME,),
+    )
+    sources = (
+        ("user", "user_id", "SELECT min(id) FROM users WHERE fio = n.fio"),
+        ("student", "student_id", "SELECT min(id) FROM students WHERE full_name = n.fio"),
+    )
+    for kind, column, lookup in sources:
+        conn.exec_driver_sql(
+            f"INSERT INTO chat_participants (kind, {column}, name) "
+            f"SELECT ?, ({lookup}), n.fio FROM chat_names n "
+            f"WHERE n.pid IS NULL AND ({lookup}) IS NOT NULL "
+            f"AND ({lookup}) NOT IN (SELECT {column} FROM chat_participants "
+            f"WHERE {column} IS NOT NULL)",
+            (kind,),
+        )
+        conn.exec_driver_sql(
+            f"UPDATE chat_names AS n SET pid = (SELECT p.id FROM chat_participants p "
+            f"WHERE p.{column} = ({lookup})) WHERE n.pid IS NULL"
+        )
+    conn.exec_driver_sql(
+        "INSERT INTO chat_participants (kind, name) "
+        "SELECT 'user', fio FROM chat_names WHERE pid IS NULL"
+    )
+    conn.exec_driver_sql(
+        "UPDATE chat_names AS n SET pid = (SELECT p.id FROM chat_participants p "
+        "WHERE p.kind = 'user' AND p.user_id IS NULL AND p.student_id IS NULL "
+        "AND p.name = n.fio) WHERE n.pid IS NULL"
+    )
+
+    pair = (
+        "FROM chat_messages_old o "
+        "JOIN chat_names s ON s.fio = o.sender_fio "
+        "JOIN chat_names r ON r.fio = o.recipient_fio"
+    )
+    _drop_indexes(conn, "chat_messages")
+    conn.exec_driver_sql("ALTER TABLE chat_messages RENAME TO chat_messages_old")
+    conn.exec_driver_sql(
+        f"INSERT OR IGNORE INTO conversations (a_id, b_id) "
+        f"SELECT DISTINCT min(s.pid, r.pid), max(s.pid, r.pid) {pair}"
+    )
+    ChatMessage.__table__.create(conn)
+    conn.exec_driver_sql(
+        f"INSERT INTO chat_messages (id, conversation_id, sender_id, message, created_at, is_read) "
+        f"SELECT o.id, c.id, s.pid, o.message, o.created_at, o.is_read {pair} "
+        f"JOIN conversations c ON c.a_id = min(s.pid, r.pid) AND c.b_id = max(s.pid, r.pid)"
+    )
+    conn.exec_driver_sql("DROP TABLE chat_messages_old")
+    conn.exec_driver_sql("DROP TABLE temp.chat_names")
+
+    conn.exec_driver_sql("DROP TABLE IF EXISTS chat_unread")
+    ChatUnread.__table__.create(conn)
+
+
+def m012_conversations(conn):
+    """
+    Чат по диалогам вместо пар ФИО: участники (chat_participants) с
+    целочисленными id, диалоги (conversations), в сообщениях —
+    conversation_id и sender_id, индекс (conversation_id, id). История и
+    пометка «прочитано» — диапазон по одному диалогу; переименование
+    человека переписку не разрывает.
+
+    chat_unread ведётся по id участника; триггеры заодно держат
+    conversations.last_message_id для списка диалогов.
+    """
+    ChatParticipant.__table__.create(conn, checkfirst=True)
+    Conversation.__table__.create(conn, checkfirst=True)
+    conn.exec_driver_sql(
+        "INSERT INTO chat_participants (kind, name) SELECT 'support', ? "
+        "WHERE NOT EXISTS (SELECT 1 FROM chat_participants WHERE kind = 'support')",
+        (_LEGACY_TECH_NAME,),
+    )
+    conn.exec_driver_sql(
+        "INSERT OR IGNORE INTO cache_versions (name, version) VALUES ('chat_unread', 0)"
+    )
+    if _has_column(conn, "chat_messages", "sender_fio"):
+        _chat_participants_from_fio(conn)
+
+    conn.exec_driver_sql(
+        "UPDATE conversations SET last_message_id = "
+        "(SELECT max(id) FROM chat_messages m WHERE m.conversation_id = conversations.id)"
+    )
+    conn.exec_driver_sql("DELETE FROM chat_unread")
+    conn.exec_driver_sql(
+        f"INSERT INTO chat_unread (participant_id, unread) "
+        f"SELECT {_chat_recipient('m')} AS pid, count(*) FROM chat_messages m "
+        f"WHERE m.is_read = 0 GROUP BY pid"
+    )
+
+    _chat_triggers(conn)
+
+
+def _chat_triggers(conn) -> None:
+    """
+    Триггеры chat_messages: chat_unread по получателю (+ версия
+    'chat_unread') и conversations.last_message_id. Объявления
+    (conversation_id IS NULL) счётчиков диалогов не касаются.
+    """
+    triggers = {
+        "trg_chat_unread_insert": (
+            "AFTER INSERT ON chat_messages "
+            "WHEN NEW.is_read = 0 AND NEW.conversation_id IS NOT NULL",
+            _chat_unread_delta(_chat_recipient("NEW"), 1) + " " + _CHAT_UNREAD_BUMP,
+        ),
+        "trg_chat_unread_delete": (
+            "AFTER DELETE ON chat_messages "
+            "WHEN OLD.is_read = 0 AND OLD.conversation_id IS NOT NULL",
+            _chat_unread_delta(_chat_recipient("OLD"), -1) + " " + _CHAT_UNREAD_BUMP,
+        ),
+        # «прочитано», «снова непрочитано» или перенос в другой диалог
+        "trg_chat_unread_update": (
+            "AFTER UPDATE OF is_read, conversation_id, sender_id ON chat_messages "
+            "WHEN (OLD.is_read = 0) IS NOT (NEW.is_read = 0) "
+            "OR OLD.conversation_id IS NOT NEW.conversation_id "
+            "OR OLD.sender_id IS NOT NEW.sender_id",
+            f"INSERT INTO chat_unread (participant_id, unread) "
+            f"SELECT {_chat_recipient('OLD')}, -1 "
+            f"WHERE OLD.is_read = 0 AND OLD.conversation_id IS NOT NULL "
+            f"ON CONFLICT (participant_id) DO UPDATE SET unread = unread - 1; "
+            f"INSERT INTO chat_unread (participant_id, unread) "
+            f"SELECT {_chat_recipient('NEW')}, 1 "
+            f"WHERE NEW.is_read = 0 AND NEW.conversation_id IS NOT NULL "
+            f"ON CONFLICT (participant_id) DO UPDATE SET unread = unread + 1; "
+            + _CHAT_UNREAD_BUMP,
+        ),
+        "trg_conversation_last_insert": (
+            "AFTER INSERT ON chat_messages",
+            "UPDATE conversations SET last_message_id = NEW.id "
+            "WHERE id = NEW.conversation_id "
+            "AND (last_message_id IS NULL OR last_message_id < NEW.id);",
+        ),
+        "trg_conversation_last_delete": (
+            "AFTER DELETE ON chat_messages",
+            "UPDATE conversations SET last_message_id = (SELECT max(id) FROM chat_messages m "
+            "WHERE m.conversation_id = OLD.conversation_id) "
+            "WHERE id = OLD.conversation_id AND last_message_id = OLD.id;",
+        ),
+    }
+    for name, (when, body) in triggers.items():
+        conn.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {name} {when} BEGIN {body} END")
+
+
+def m013_chat_broadcasts(conn):
+    """
+    Объявления техподдержки всем: строка chat_messages без диалога
+    (conversation_id NULL) + у каждого участника отметка, до какого
+    объявления он дочитал (chat_participants.broadcast_read_id).
+    Новое объявление и «прочитал» увеличивают версию 'chat_unread',
+    чтобы пуш-канал пересчитал счётчики во всех воркерах.
+    """
+    if not _has_column(conn, "chat_participants", "broadcast_read_id"):
+        conn.exec_driver_sql(
+            "ALTER TABLE chat_participants "
+            "ADD COLUMN broadcast_read_id INTEGER NOT NULL DEFAULT 0"
+        )
+    notnull = {
+        r[1]: r[3] for r in conn.exec_driver_sql("PRAGMA table_info(chat_messages)")
+    }
+    if notnull.get("conversation_id"):
+        # SQLite не снимает NOT NULL «на месте»; триггеры уходят вместе со старой таблицей
+        _drop_indexes(conn, "chat_messages")
+        conn.exec_driver_sql("ALTER TABLE chat_messages RENAME TO chat_messages_old")
+        ChatMessage.__table__.create(conn)
+        cols = "id, conversation_id, sender_id, message, created_at, is_read"
+        conn.exec_driver_sql(
+            f"INSERT INTO chat_messages ({cols}) SELECT {cols} FROM chat_messages_old"
+        )
+        conn.exec_driver_sql("DROP TABLE chat_messages_old")
+    _chat_triggers(conn)
+
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS trg_chat_broadcast_insert AFTER INSERT ON chat_messages "
+        f"WHEN NEW.conversation_id IS NULL BEGIN {_CHAT_UNREAD_BUMP} END"
+    )
+    _version_trigger(conn, "chat_participants", "UPDATE OF broadcast_read_id", "chat_unread")
+
+
+def m014_period_skip_covering_index(conn):
+    """
+    ix_period_skip_group_date дополнен period_code: отчёты и журнал берут
+    снятые пары по группе и дате прямо из индекса. Без этого столбца
+    планировщик выбирал уникальный индекс (date, period_code, group_id)
+    и перебирал все снятия за день по колледжу.
+    """
+    cols = [r[2] for r in conn.exec_driver_sql("PRAGMA index_info(ix_period_skip_group_date)")]
+    if cols == ["group_id", "date", "period_code"]:
+        return
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_period_skip_group_date")
+    conn.exec_driver_sql(
+        "CREATE INDEX ix_period_skip_group_date ON period_skips (group_id, date, period_code)"
+    )
+
+
+def m015_holidays_in_summary(conn):
+    """
+    Праздники больше не считаются в attendance_daily: пересчитать уже
+    заполненные дни. Правка праздника меняет отчёты всех затронутых групп
+    (общий праздник — всех), поэтому увеличивает их group_versions.
+    """
+    from core.summary import refresh_holiday
+
+    for d, gid in conn.execute(select(Holiday.date, Holiday.group_id)).all():
+        refresh_holiday(conn, d, gid)
+    affected = {
+        "INSERT": "NEW.group_id IS NULL OR id = NEW.group_id",
+        "UPDATE": "NEW.group_id IS NULL OR id = NEW.group_id "
+                  "OR OLD.group_id IS NULL OR id = OLD.group_id",
+        "DELETE": "OLD.group_id IS NULL OR id = OLD.group_id",
+    }
+    for event, cond in affected.items():
+        conn.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS trg_group_version_holidays_{event.lower()} "
+            f"AFTER {event} ON holidays BEGIN "
+            f"INSERT INTO group_versions (group_id, version) SELECT id, 1 FROM groups WHERE {cond} "
+            f"ON CONFLICT (group_id) DO UPDATE SET version = version + 1; END"
+        )
+
+
+def m016_group_code_version(conn):
+    """
+    Переименование группы увеличивает её group_versions: код группы
+    виден в отчётах, а ключ кэша отчётов — только версия самой группы.
+    """
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS trg_group_version_groups_update "
+        f"AFTER UPDATE OF code ON groups BEGIN {_group_version_bump('NEW.id')} END"
+    )
+
+
+def m017_student_version_columns(conn):
+    """
+    Версию группы меняет только правка студента, видная в отчётах (группа,
+    ФИО): смена пароля или uid кэш отчётов больше не сбрасывает.
+    """
+    body = _group_version_bump("NEW.group_id") + " " + _group_version_bump(
+        "CASE WHEN OLD.group_id IS NOT NEW.group_id THEN OLD.group_id END"
+    )
+    conn.exec_driver_sql("DROP TRIGGER IF EXISTS trg_group_version_students_update")
+    conn.exec_driver_sql(
+        "CREATE TRIGGER trg_group_version_students_update "
+        f"AFTER UPDATE OF group_id, full_name ON students BEGIN {body} END"
+    )
+
+
+MIGRATIONS = [
+    (1, "baseline", m001_baseline),
+    (2, "attendance_status_reason", m002_attendance_status_reason),
+    (3, "trim_group_codes", m003_trim_group_codes),
+    (4, "drop_duplicate_attendance_indexes", m004_drop_duplicate_attendance_indexes),
+    (5, "groups", m005_groups),
+    (6, "attendance_daily", m006_attendance_daily),
+    (7, "role_scopes", m007_role_scopes),
+    (8, "timetable_calendar", m008_timetable_calendar),
+    (9, "group_versions", m009_group_versions),
+    (10, "chat_unread", m010_chat_unread),
+    (11, "chat_pair_index", m011_chat_pair_index),
+    (12, "conversations", m012_conversations),
+    (13, "chat_broadcasts", m013_chat_broadcasts),
+    (14, "period_skip_covering_index", m014_period_skip_covering_index),
+    (15, "holidays_in_summary", m015_holidays_in_summary),
+    (16, "group_code_version", m016_group_code_version),
+    (17, "student_version_columns", m017_student_version_columns),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# ───────────────── раннер ─────────────────
+
+
+def current_version(eng=engine) -> int:
+    """Версия схемы одним запросом (0 — таблицы schema_version ещё нет)."""
+    try:
+        with eng.connect() as conn:
+            return conn.execute(text("SELECT max(version) FROM schema_version")).scalar() or 0
+    except OperationalError:
+        return 0
+
+
+def _lock_path(eng) -> Path:
+    db = eng.url.database
+    if eng.url.get_backend_name() == "sqlite" and db and db != ":memory:":
+        return Path(db).resolve().with_name(Path(db).name + ".migrate.lock")
+    return Path(tempfile.gettempdir()) / "ldo.migrate.lock"
+
+
+@contextmanager
+def _file_lock(path: Path):
+    """Межпроцессная блокировка (несколько воркеров gunicorn стартуют одновременно)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as fh:
+        if os.name == "nt":
+            import msvcrt
+
+            fh.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def _atomic(eng):
+    """
+    Транзакция на одну миграцию — вместе с DDL.
+
+    pysqlite сам открывает транзакцию только перед DML, а CREATE / ALTER /
+    DROP выполняет вне её: миграция, упавшая после RENAME, оставила бы
+    схему наполовину изменённой. Поэтому драйвер переводится в AUTOCOMMIT
+    (isolation_level=None), а BEGIN IMMEDIATE / COMMIT / ROLLBACK — свои.
+    """
+    if eng.url.get_backend_name() != "sqlite":
+        with eng.begin() as conn:
+            yield conn
+        return
+    with eng.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT")
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.exec_driver_sql("ROLLBACK")
+            raise
+        conn.exec_driver_sql("COMMIT")
+
+
+def upgrade(eng=engine) -> list[int]:
+    """Применить недостающие миграции. Возвращает список применённых версий."""
+    if current_version(eng) >= LATEST_VERSION:
+        return []
+
+    applied = []
+    with _file_lock(_lock_path(eng)):
+        # пока ждали блокировку, схему мог обновить другой воркер
+        version = current_version(eng)
+        for num, name, fn in MIGRATIONS:
+            if num <= version:
+                continue
+            with _atomic(eng) as conn:
+                conn.exec_driver_sql(
+                    "CREATE TABLE IF NOT EXISTS schema_version ("
+                    "version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_at DATETIME NOT NULL)"
+                )
+                fn(conn)
+                conn.exec_driver_sql(
+                    "INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                    (num, name, datetime.utcnow().isoformat(sep=" ")),
+                )
+            applied.append(num)
+    return applied
+
+
+if __name__ == "__main__":
+    # python -m core.migrations — применить миграции вручную (например, перед рестартом)
+    done = upgrade()
+    print(f"schema_version: {current_version()} (применены: {done or 'нет'})")
@@ -1,74 +1,249 @@
 # core/permissions.py
-from typing import List
-from models import SessionLocal, Student
-from sqlalchemy import func
+"""
+Зоны ответственности: куратор/староста → группы, заведующая → префиксы кодов групп.
+
+Назначения хранятся в БД (role_scopes, head_prefixes). Каждый воркер держит
+в памяти собранный индекс: код → id группы, отсортированные коды (поиск по
+префиксу через bisect), состав групп (множества id студентов) и назначения.
+Актуальность индекса проверяется не чаще раза в SCOPE_CHECK_INTERVAL секунд
+одним SELECT счётчика cache_versions['scope'] — его увеличивают триггеры на
+groups/students/role_scopes/head_prefixes. В остальное время проверки прав
+в БД не ходят.
+
+Правка назначений (воркеры подхватят сами):
+    python -m core.permissions list
+    python -m core.permissions add curator "ФИО" PO-175 PO-323
+    python -m core.permissions remove starosta "ФИО" PO-175
+    python -m core.permissions add head "ФИО" PO-
+"""
+import argparse
+import os
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+
+from models import (
+    engine, SessionLocal, Group, HeadPrefix, RoleScope, Student,
+    SCOPE_ROLES, get_or_create_group,
+)
+from core.versions import VersionWatch
+
+SCOPE_CHECK_INTERVAL = float(os.getenv("SCOPE_CHECK_INTERVAL", "2"))
+
+
+# ───────────────── индекс в памяти воркера ─────────────────
+
+
+class ScopeIndex:
+    """Снимок назначений и состава групп (только для чтения)."""
+
+    __slots__ = ("version", "group_ids", "group_codes", "codes_with_students", "group_students",
+                 "student_group", "scopes", "head_prefixes")
+
+    def __init__(self, version: int, conn):
+        self.version = version
+        self.group_ids: Dict[str, int] = {
+            code: gid for gid, code in conn.execute(select(Group.id, Group.code))
+        }
+
+        self.group_codes: Dict[int, str] = {gid: code for code, gid in self.group_ids.items()}
+
+        self.student_group: Dict[int, int] = {}
+        members: Dict[int, Set[int]] = defaultdict(set)
+        for sid, gid in conn.execute(
+            select(Student.id, Student.group_id).where(Student.group_id.is_not(None))
+        ):
+            members[gid].add(sid)
+            self.student_group[sid] = gid
+        self.group_students: Dict[int, FrozenSet[int]] = {
+            gid: frozenset(ids) for gid, ids in members.items()
+        }
+        self.codes_with_students: List[str] = sorted(self.group_codes[g] for g in members)
+
+        scopes: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+        for role, fio, code in conn.execute(
+            select(RoleScope.role, RoleScope.fio, Group.code)
+            .join(Group, Group.id == RoleScope.group_id)
+            .order_by(Group.code)
+        ):
+            scopes[(role, fio)].append(code)
+        self.scopes: Dict[Tuple[str, str], Tuple[str, ...]] = {
+            k: tuple(v) for k, v in scopes.items()
+        }
+
+        prefixes: Dict[str, List[str]] = defaultdict(list)
+        for fio, prefix in conn.execute(
+            select(HeadPrefix.fio, HeadPrefix.prefix).order_by(HeadPrefix.prefix)
+        ):
+            prefixes[fio].append(prefix)
+        self.head_prefixes: Dict[str, Tuple[str, ...]] = {
+            k: tuple(v) for k, v in prefixes.items()
+        }
+
+
+_INDEX: Optional[ScopeIndex] = None
+_VERSION = VersionWatch("scope", SCOPE_CHECK_INTERVAL)
+_LOCK = threading.Lock()
+
+
+def _scope_index(force: bool = False) -> ScopeIndex:
+    """
+    Актуальный индекс. force=True — сверить версию прямо сейчас
+    (например, спросили про группу/студента, которых в снимке нет).
+    """
+    global _INDEX
+    version = _VERSION.get(force)
+    idx = _INDEX
+    if idx is not None and idx.version == version:
+        return idx
+
+    with _LOCK:
+        if _INDEX is None or _INDEX.version != version:
+            # версия прочитана до данных: если между ними кто-то записал,
+            # снимок окажется новее версии и просто пересоберётся ещё раз
+            with engine.connect() as conn:
+                _INDEX = ScopeIndex(version, conn)
+        return _INDEX
+
+
+def invalidate_scope_cache() -> None:
+    """Сбросить индекс (следующая проверка прав сверит версию с БД)."""
+    _VERSION.reset()
+
+
+# ───────────────── группы ─────────────────
+
+
+def group_ids_for_codes(codes: Iterable[str]) -> Dict[str, int]:
+    """Код группы -> id (неизвестные коды в ответ не попадают)."""
+    codes = {c.strip() for c in codes if c and c.strip()}
+    idx = _scope_index()
+    if any(c not in idx.group_ids for c in codes):
+        idx = _scope_index(force=True)
+    return {c: idx.group_ids[c] for c in codes if c in idx.group_ids}
+
+
+def group_id_for_code(code: str) -> Optional[int]:
+    return group_ids_for_codes([code]).get((code or "").strip())
+
+
+def group_code_for_id(group_id: int) -> Optional[str]:
+    idx = _scope_index()
+    if group_id not in idx.group_codes:
+        idx = _scope_index(force=True)
+    return idx.group_codes.get(group_id)
+
+
+def group_id_of_student(student_id: int) -> Optional[int]:
+    """id группы студента (из индекса, без запроса)."""
+    idx = _scope_index()
+    if student_id not in idx.student_group:
+        idx = _scope_index(force=True)
+    return idx.student_group.get(student_id)
+
+
+def group_student_ids(group_id: int) -> FrozenSet[int]:
+    """id студентов группы (из индекса, без запроса)."""
+    return _scope_index().group_students.get(group_id, frozenset())
+
+
+def _students_in_groups(student_ids: Iterable[int], group_ids: List[int]) -> Set[int]:
+    """Подмножество student_ids, входящее в группы group_ids."""
+    ids = {int(x) for x in student_ids}
+    if not ids or not group_ids:
+        return set()
+
+    def pick(idx: ScopeIndex) -> Set[int]:
+        found: Set[int] = set()
+        for gid in group_ids:
+            found |= ids & idx.group_students.get(gid, frozenset())
+        return found
+
+    idx = _scope_index()
+    if any(sid not in idx.student_group for sid in ids):
+        # студента могли только что добавить — сверяем версию
+        idx = _scope_index(force=True)
+    return pick(idx)
+
+
+def _scope_groups(role: str, fio: str) -> List[str]:
+    return list(_scope_index().scopes.get((role, fio), ()))
+
+
+# ───────────────── кураторы ─────────────────
 
-# Карта кураторов -> список их групп (строго те же строки, что в students.group_code)
-CURATOR_GROUPS = {
-    "Султангазинова Диана Сериковна": ["PO-115", "PO-393"],  # при необходимости убери
-    "Брусенко Владислав Сергеевич": ["PO-175", "PO-323"],
-}
 
 def get_curator_groups(curator_fio: str) -> List[str]:
     """Возвращает список групп, за которые отвечает данный куратор."""
-    return CURATOR_GROUPS.get(curator_fio, [])
+    return _scope_groups("curator", curator_fio)
+
+def get_curator_group_ids(curator_fio: str) -> List[int]:
+    """id групп куратора."""
+    return list(group_ids_for_codes(get_curator_groups(curator_fio)).values())
+
+def students_in_curator_scope(curator_fio: str, student_ids: Iterable[int]) -> Set[int]:
+    """Какие из студентов относятся к группам данного куратора."""
+    return _students_in_groups(student_ids, get_curator_group_ids(curator_fio))
 
 def student_in_curator_scope(curator_fio: str, student_id: int) -> bool:
     """Проверяем, что студент относится к одной из групп данного куратора."""
-    groups = get_curator_groups(curator_fio)
-    if not groups:
-        return False
-    with SessionLocal() as s:
-        st = s.query(Student).filter(Student.id == student_id).first()
-        if not st:
-            return False
-        return (st.group_code or "") in groups
+    return student_id in students_in_curator_scope(curator_fio, [student_id])
+
 
+# ───────────────── старосты ─────────────────
 
-# Карта старост -> список их групп
-STAROSTA_GROUPS = {
-    "Староста ПО175": ["PO-175"],
-}
 
 def get_starosta_groups(starosta_fio: str) -> list[str]:
     """Список групп, за которые отвечает староста."""
-    return STAROSTA_GROUPS.get(starosta_fio, [])
+    return _scope_groups("starosta", starosta_fio)
+
+def get_starosta_group_ids(starosta_fio: str) -> list[int]:
+    """id групп старосты."""
+    return list(group_ids_for_codes(get_starosta_groups(starosta_fio)).values())
+
+def students_in_starosta_scope(starosta_fio: str, student_ids: Iterable[int]) -> Set[int]:
+    """Какие из студентов относятся к группе старосты."""
+    return _students_in_groups(student_ids, get_starosta_group_ids(starosta_fio))
 
 def student_in_starosta_scope(starosta_fio: str, student_id: int) -> bool:
     """Проверяем, что студент относится к группе старосты."""
-    groups = get_starosta_groups(starosta_fio)
-    if not groups:
-        return False
-    with SessionLocal() as s:
-        st = s.query(Student).filter(Student.id == student_id).first()
-        if not st:
-            return False
-        return (st.group_code or "") in groups
+    return student_id in students_in_starosta_scope(starosta_fio, [student_id])
+
+
+# ───────────────── заведующие ─────────────────
 
-HEAD_PREFIXES = {
-    # "ФИО заведующей": ["PO-"],
-    "Иванова Галина Петровна": ["PO-"],
-}
 
 def get_head_allowed_prefixes(head_fio: str) -> list[str]:
-    return HEAD_PREFIXES.get(head_fio, [])
+    return list(_scope_index().head_prefixes.get(head_fio, ()))
+
+def get_all_head_prefixes() -> list[str]:
+    """Префиксы всех заведующих вместе (для пакетных задач по отделениям)."""
+    return sorted({p for prefixes in _scope_index().head_prefixes.values() for p in prefixes})
+
+def _prefix_upper_bound(prefix: str) -> str:
+    """Наименьшая строка, которая больше всех строк с данным префиксом."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
 
 def head_list_groups_for_prefixes(prefixes: list[str]) -> list[str]:
-    """Вернуть список групп из БД, начинающихся с указанных префиксов."""
-    if not prefixes:
-        return []
-    with SessionLocal() as s:
-        q = s.query(func.trim(Student.group_code)).filter(Student.group_code.isnot(None))
-        # склеиваем условия по префиксам
-        cond = None
-        for pfx in prefixes:
-            like_expr = f"{pfx}%"
-            part = Student.group_code.like(like_expr)
-            cond = part if cond is None else (cond | part)
-        if cond is not None:
-            q = q.filter(cond)
-        groups = sorted({(g or "").strip() for (g,) in q.distinct().all() if (g or "").strip()})
-        return groups
+    """Вернуть список групп (со студентами), коды которых начинаются с указанных префиксов.
+
+    Коды в индексе отсортированы, поэтому префикс — это срез [pfx, pfx+1),
+    который находится двумя bisect.
+    """
+    codes = _scope_index().codes_with_students
+    found: Set[str] = set()
+    for pfx in prefixes:
+        if not pfx:
+            continue
+        lo = bisect_left(codes, pfx)
+        hi = bisect_left(codes, _prefix_upper_bound(pfx), lo)
+        found.update(codes[lo:hi])
+    return sorted(found)
+
 
 def head_group_allowed(head_fio: str, group_code: str) -> bool:
     """Можно ли заведующей видеть конкретную группу."""
@@ -76,4 +251,57 @@ def head_group_allowed(head_fio: str, group_code: str) -> bool:
     if not prefixes:
         return False
     g = (group_code or "").strip()
-    return any(g.startswith(p) for p in prefixes)
\ No newline at end of file
+    return any(g.startswith(p) for p in prefixes)
+
+
+# ───────────────── CLI ─────────────────
+
+
+def _cli_list() -> None:
+    idx = _scope_index(force=True)
+    for (role, fio), codes in sorted(idx.scopes.items()):
+        print(f"{role:<9} {fio}: {', '.join(codes)}")
+    for fio, prefixes in sorted(idx.head_prefixes.items()):
+        print(f"{'head':<9} {fio}: {', '.join(prefixes)}")
+
+
+def _cli_change(action: str, role: str, fio: str, values: List[str]) -> None:
+    with SessionLocal() as s:
+        for value in values:
+            if role == "head":
+                q = s.query(HeadPrefix).filter(HeadPrefix.fio == fio, HeadPrefix.prefix == value)
+                if action == "add" and not q.first():
+                    s.add(HeadPrefix(fio=fio, prefix=value))
+                elif action == "remove":
+                    q.delete()
+                continue
+
+            if action == "add":
+                gid = get_or_create_group(s, value).id
+                exists = s.query(RoleScope).filter(
+                    RoleScope.role == role, RoleScope.fio == fio, RoleScope.group_id == gid
+                ).first()
+                if not exists:
+                    s.add(RoleScope(role=role, fio=fio, group_id=gid))
+            else:
+                gid = s.query(Group.id).filter(Group.code == value.strip()).scalar()
+                s.query(RoleScope).filter(
+                    RoleScope.role == role, RoleScope.fio == fio, RoleScope.group_id == gid
+                ).delete()
+        s.commit()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Зоны ответственности кураторов/старост/заведующих")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list")
+    for cmd in ("add", "remove"):
+        p = sub.add_parser(cmd)
+        p.add_argument("role", choices=SCOPE_ROLES + ("head",))
+        p.add_argument("fio")
+        p.add_argument("values", nargs="+", help="коды групп (для head — префиксы)")
+    args = ap.parse_args()
+
+    if args.cmd != "list":
+        _cli_change(args.cmd, args.role, args.fio, args.values)
+    _cli_list()
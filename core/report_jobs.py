@@ -0,0 +1,327 @@
+# core/report_jobs.py
+"""
+Фоновые отчёты по группе и их кэш на диске.
+
+Тяжёлая выгрузка (Excel за семестр) ставится в пул потоков, а воркер
+сразу отвечает. Результат лежит в REPORT_CACHE_DIR под ключом
+
+    {group_id}-{start}-{end}-{fmt}-r{REPORT_FORMAT_VERSION}m{версия схемы}v{версия группы}
+
+Версия группы (group_versions) растёт при любой записи в отметки,
+снятые пары, праздники, состав или код группы — правки других групп
+её не трогают. Поэтому, пока данные не менялись, повторная выгрузка
+отдаётся готовым файлом и не пересчитывается; после правки ключ другой,
+а старые файлы того же отчёта удаляются при записи нового.
+
+REPORT_FORMAT_VERSION и версия схемы (core.migrations.LATEST_VERSION) —
+отпечаток кода: после деплоя, меняющего подсчёт или вид отчёта, прежние
+файлы не отдаются. Правишь расчёт/вёрстку без миграции — увеличь
+REPORT_FORMAT_VERSION.
+
+Состояние задачи видно всем воркерам по файлам рядом с результатом:
+    <key>.xlsx|.json  — готово
+    <key>.job         — в работе (старше REPORT_JOB_TIMEOUT — считается брошенной)
+    <key>.err         — упала, внутри текст ошибки
+
+Форматы: xlsx — лист как в group_export_excel; json — students/stats/detail
+из build_group_report (по нему /head/group за месяц/семестр не считает
+отчёт заново, см. cached_report).
+
+Ночной прогон — заранее посчитать месяц и семестр по всем группам
+заведующих, параллельно на всех ядрах:
+    python -m core.report_jobs prerender [--date 2025-12-01] [--workers 4]
+    # cron: 30 2 * * *  cd /srv/ldo && python -m core.report_jobs prerender
+Уже посчитанные для текущих данных отчёты пропускаются.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime
+from pathlib import Path
+from typing import Iterator, Optional
+
+from config import BASE_DIR
+from models import engine, SessionLocal
+from core.migrations import LATEST_VERSION
+from core.reports import GroupReport, StudentRow, build_group_report
+from core.versions import read_group_version
+
+REPORT_CACHE_DIR = Path(os.getenv("REPORT_CACHE_DIR", str(BASE_DIR / "report_cache")))
+REPORT_JOB_WORKERS = int(os.getenv("REPORT_JOB_WORKERS", "2"))
+REPORT_JOB_TIMEOUT = int(os.getenv("REPORT_JOB_TIMEOUT", "600"))  # сек
+
+REPORT_FORMAT_VERSION = 1  # увеличить при изменении подсчёта или вида отчётов
+
+REPORT_MIMETYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "json": "application/json",
+}
+
+_KEY_RE = re.compile(r"^(\d+)-(\d{8})-(\d{8})-(xlsx|json)-r\d+m\d+v\d+$")
+
+
+@dataclass(frozen=True)
+class ReportJob:
+    group_id: int
+    group_code: str
+    start: date
+    end: date
+    fmt: str
+    period_title: str
+    stamp: str
+
+    @property
+    def params_key(self) -> str:
+        return f"{self.group_id}-{self.start:%Y%m%d}-{self.end:%Y%m%d}-{self.fmt}"
+
+    @property
+    def key(self) -> str:
+        return f"{self.params_key}-{self.stamp}"
+
+    @property
+    def path(self) -> Path:
+        return REPORT_CACHE_DIR / f"{self.key}.{self.fmt}"
+
+
+def data_stamp(group_id: int) -> str:
+    """Отпечаток кода отчёта и данных группы: меняется при любой правке, влияющей на отчёт."""
+    with engine.connect() as conn:
+        version = read_group_version(conn, group_id)
+    return f"r{REPORT_FORMAT_VERSION}m{LATEST_VERSION}v{version}"
+
+
+def make_job(group_id: int, group_code: str, start: date, end: date,
+             fmt: str, period_title: str = "") -> ReportJob:
+    if fmt not in REPORT_MIMETYPES:
+        raise ValueError(f"Неизвестный формат отчёта: {fmt}")
+    return ReportJob(group_id, group_code, start, end, fmt, period_title, data_stamp(group_id))
+
+
+def parse_key(key: str) -> Optional[int]:
+    """group_id из ключа задачи (None — ключ не наш, например с '../')."""
+    m = _KEY_RE.match(key or "")
+    return int(m.group(1)) if m else None
+
+
+def result_path(key: str) -> Optional[Path]:
+    m = _KEY_RE.match(key or "")
+    if not m:
+        return None
+    path = REPORT_CACHE_DIR / f"{key}.{m.group(4)}"
+    return path if path.exists() else None
+
+
+# ───────────────── рендер ─────────────────
+
+
+def _render(job: ReportJob, out: Path) -> None:
+    if job.fmt == "xlsx":
+        from openpyxl import Workbook
+        from core.excel import add_sheet, write_group_sheet
+
+        wb = Workbook(write_only=True)
+        add_sheet(wb, "Посещаемость", lambda ws: write_group_sheet(
+            ws, job.group_code, job.period_title,
+            build_group_report(job.group_id, job.start, job.end).detail,
+        ))
+        wb.save(out)
+    else:
+        report = build_group_report(job.group_id, job.start, job.end)
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(
+                {"students": report.students, "stats": report.stats, "detail": report.detail},
+                f, ensure_ascii=False,
+            )
+
+
+def _prune_stale(job: ReportJob) -> None:
+    """Удалить результаты того же отчёта для прежних версий данных и кода."""
+    for old in REPORT_CACHE_DIR.glob(f"{job.params_key}-*.{job.fmt}"):
+        if old != job.path:
+            old.unlink(missing_ok=True)
+
+
+def _marker(job: ReportJob, suffix: str) -> Path:
+    return REPORT_CACHE_DIR / f"{job.key}.{suffix}"
+
+
+def _tmp_path(job: ReportJob) -> Path:
+    # уникально для процесса и потока: один отчёт могут писать два воркера
+    return REPORT_CACHE_DIR / f"{job.key}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def _run(job: ReportJob) -> bool:
+    tmp = _tmp_path(job)
+    try:
+        _render(job, tmp)
+        os.replace(tmp, job.path)
+        _prune_stale(job)
+        return True
+    except Exception as e:
+        _marker(job, "err").write_text(f"{type(e).__name__}: {e}", encoding="utf-8")
+        return False
+    finally:
+        tmp.unlink(missing_ok=True)
+        _marker(job, "job").unlink(missing_ok=True)
+        SessionLocal.remove()  # сессия потока пула (scoped_session)
+
+
+# ───────────────── очередь ─────────────────
+
+
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_LOCK = threading.Lock()
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        _EXECUTOR = ThreadPoolExecutor(
+            max_workers=REPORT_JOB_WORKERS, thread_name_prefix="report-job"
+        )
+    return _EXECUTOR
+
+
+def report_state(key: str) -> dict:
+    """{"state": done|running|failed|missing[, "error": ...]}."""
+    if result_path(key) is not None:
+        return {"state": "done"}
+    marker = REPORT_CACHE_DIR / f"{key}.job"
+    try:
+        if time.time() - marker.stat().st_mtime < REPORT_JOB_TIMEOUT:
+            return {"state": "running"}
+    except FileNotFoundError:
+        pass
+    err = REPORT_CACHE_DIR / f"{key}.err"
+    if err.exists():
+        return {"state": "failed", "error": err.read_text(encoding="utf-8")}
+    return {"state": "missing"}
+
+
+def submit_report(job: ReportJob) -> str:
+    """
+    Поставить отчёт в очередь. Возвращает состояние: done (уже в кэше),
+    running (такой же уже считается — в этом или другом воркере) или queued.
+    """
+    if job.path.exists():
+        return "done"
+    REPORT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    with _LOCK:
+        if report_state(job.key)["state"] == "running":
+            return "running"
+        _marker(job, "err").unlink(missing_ok=True)
+        _marker(job, "job").touch()
+        _executor().submit(_run, job)
+    return "queued"
+
+
+# ───────────────── кэш для синхронных выгрузок ─────────────────
+
+
+def tee_to_cache(job: ReportJob, chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """
+    Отдаёт куски потоковой выгрузки и параллельно пишет их в кэш:
+    файл появится, только если клиент дочитал выгрузку до конца.
+    """
+    REPORT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = _tmp_path(job)
+    complete = False
+    try:
+        with open(tmp, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+                yield chunk
+        os.replace(tmp, job.path)
+        complete = True
+        _prune_stale(job)
+    finally:
+        if not complete:
+            tmp.unlink(missing_ok=True)
+
+
+
+def cached_report(job: ReportJob) -> Optional[GroupReport]:
+    """GroupReport из готового json-результата (без day_map/skips) или None."""
+    try:
+        with open(job.path, encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    return GroupReport(
+        students=[StudentRow(*st) for st in data["students"]],
+        stats=data["stats"],
+        detail=data["detail"],
+    )
+
+
+# ───────────────── ночной прогон ─────────────────
+
+
+def _pool_init() -> None:
+    # соединения пула родителя в дочернем процессе не используем
+    engine.dispose(close=False)
+
+
+def prerender(day: date, workers: Optional[int] = None,
+              modes=("month", "semester"), formats=tuple(REPORT_MIMETYPES)) -> dict:
+    """
+    Посчитать отчёты за месяц и семестр (от day) по всем группам заведующих.
+    Возвращает счётчики {"fresh": уже были, "rendered": ..., "failed": ...}.
+    """
+    from core.head_bp import _export_period
+    from core.permissions import (
+        get_all_head_prefixes, group_ids_for_codes, head_list_groups_for_prefixes,
+    )
+
+    codes = head_list_groups_for_prefixes(get_all_head_prefixes())
+    periods = [_export_period(day, mode) for mode in modes]
+    jobs = []
+    for code, gid in sorted(group_ids_for_codes(codes).items()):
+        stamp = data_stamp(gid)
+        jobs.extend(
+            ReportJob(gid, code, start, end, fmt, title, stamp)
+            for start, end, title in periods
+            for fmt in formats
+        )
+    todo = [job for job in jobs if not job.path.exists()]
+    counts = {"fresh": len(jobs) - len(todo), "rendered": 0, "failed": 0}
+    if not todo:
+        return counts
+
+    REPORT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    for job in todo:
+        _marker(job, "job").touch()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_pool_init) as pool:
+        for ok in pool.map(_run, todo, chunksize=4):
+            counts["rendered" if ok else "failed"] += 1
+    return counts
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Фоновые отчёты по группам")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p_pre = sub.add_parser("prerender", help="посчитать месяц и семестр по всем группам")
+    p_pre.add_argument("--date", default=date.today().isoformat())
+    p_pre.add_argument("--workers", type=int, default=None, help="процессов (по умолчанию — ядер)")
+    p_pre.add_argument("--modes", default="month,semester")
+    p_pre.add_argument("--formats", default=",".join(REPORT_MIMETYPES))
+    args = ap.parse_args()
+
+    started = time.perf_counter()
+    result = prerender(
+        datetime.strptime(args.date, "%Y-%m-%d").date(),
+        workers=args.workers,
+        modes=[m for m in args.modes.split(",") if m],
+        formats=[f for f in args.formats.split(",") if f in REPORT_MIMETYPES],
+    )
+    print(
+        f"готово за {time.perf_counter() - started:.1f} с: посчитано {result['rendered']}, "
+        f"актуальных {result['fresh']}, с ошибкой {result['failed']} → {REPORT_CACHE_DIR}"
+    )
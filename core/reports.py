@@ -0,0 +1,197 @@
+# core/reports.py
+"""
+Отчёт по группе за период — общий для заведующей, куратора и выгрузки Excel.
+
+build_group_report() открывает одну сессию и делает:
+  1) один сгруппированный запрос «студенты группы LEFT JOIN attendance_daily»
+     (суммы по статусам и причинам на студента) — из него же считаются
+     и агрегаты по группе, и таблица по студентам;
+  2) если нужен конкретный день — снятые пары и отметки за день.
+Строки лёгкие (кортежи/словари), ORM-объекты не создаются.
+
+Движок агрегации выбирается REPORT_ENGINE (или аргументом engine=):
+  * summary — суммы по attendance_daily в SQL (по умолчанию);
+  * matrix  — сырые отметки в массивах NumPy, см. core.matrix.
+Результат у обоих одинаковый: отметки считаются за нынешней группой студента.
+"""
+from __future__ import annotations
+
+import os
+
+from dataclasses import dataclass, field
+from datetime import date
+from typing import NamedTuple, Optional
+
+from sqlalchemy import and_, func, select
+
+from models import SessionLocal, Attendance, AttendanceDaily, PeriodSkip, Student
+from core.summary import STATUSES, MISSED_REASONS
+
+HOURS_PER_LESSON = 2  # если в колледже другая длительность пары — поменяй это значение
+REPORT_ENGINE = os.getenv("REPORT_ENGINE", "summary")  # summary | matrix
+
+_COLS = STATUSES + MISSED_REASONS
+
+
+class StudentRow(NamedTuple):
+    id: int
+    full_name: str
+
+
+class DayMark(NamedTuple):
+    period_code: str
+    status: Optional[str]
+    reason: Optional[str]
+
+
+class SkipRow(NamedTuple):
+    period_code: str
+
+
+@dataclass
+class GroupReport:
+    students: list[StudentRow]
+    stats: dict
+    detail: dict
+    day_map: dict[int, list[DayMark]] = field(default_factory=dict)
+    skips: list[SkipRow] = field(default_factory=list)
+
+
+def _student_row(num: int, full_name: str, c: dict) -> dict:
+    """Строка таблицы «по студентам» (пропуски — в академических часах)."""
+    total_lessons = sum(c[k] for k in STATUSES)
+    missed_lessons = c["absent"] + c["excused"]
+
+    row = {
+        "num": num,
+        "full_name": full_name,
+        "total": missed_lessons * HOURS_PER_LESSON,
+        **{k: c[k] * HOURS_PER_LESSON for k in MISSED_REASONS},
+    }
+    if total_lessons:
+        row["pct"] = (total_lessons - missed_lessons) * 100.0 / total_lessons
+    else:
+        # если по студенту нет отметок — считаем 100% посещаемость
+        row["pct"] = 100.0
+    return row
+
+
+def _stats(counts: dict) -> dict:
+    total = sum(counts.values())
+    pct = {k: (v * 100.0 / total) if total else 0.0 for k, v in counts.items()}
+    return {"counts": counts, "total": total, "pct": pct}
+
+
+def day_skips(s, group_id: int, day: date) -> list[SkipRow]:
+    """Снятые за день пары группы."""
+    return [
+        SkipRow(pc) for (pc,) in s.execute(
+            select(PeriodSkip.period_code)
+            .where(PeriodSkip.group_id == group_id, PeriodSkip.date == day)
+            .order_by(PeriodSkip.period_code)
+        )
+    ]
+
+
+def _summary_rows(s, group_id: int, start: date, end: date):
+    """(id, full_name, *суммы _COLS) по студентам группы из attendance_daily."""
+    return s.execute(
+        select(
+            Student.id,
+            Student.full_name,
+            *[func.coalesce(func.sum(getattr(AttendanceDaily, k)), 0) for k in _COLS],
+        )
+        .outerjoin(
+            AttendanceDaily,
+            and_(
+                # по студенту, а не по attendance_daily.group_id: там группа на момент
+                # отметки, а отчёт — по нынешнему составу (как матрица и прежний отчёт)
+                AttendanceDaily.student_id == Student.id,
+                AttendanceDaily.date >= start,
+                AttendanceDaily.date <= end,
+            ),
+        )
+        .where(Student.group_id == group_id)
+        .group_by(Student.id)
+        .order_by(Student.full_name)
+    ).all()
+
+
+def _summary_report(rows) -> tuple[list[StudentRow], dict, dict]:
+    students: list[StudentRow] = []
+    detail_rows: list[dict] = []
+    counts = dict.fromkeys(STATUSES, 0)
+    for num, (sid, full_name, *sums) in enumerate(rows, start=1):
+        c = dict(zip(_COLS, sums))
+        students.append(StudentRow(sid, full_name))
+        detail_rows.append(_student_row(num, full_name, c))
+        for k in STATUSES:
+            counts[k] += c[k]
+
+    group_pct = (
+        sum(r["pct"] for r in detail_rows) / len(detail_rows) if detail_rows else 0.0
+    )
+    return students, counts, {"rows": detail_rows, "group_pct": group_pct}
+
+
+def build_group_report(
+    group_id: int,
+    start: date,
+    end: date,
+    *,
+    day: Optional[date] = None,
+    with_marks: bool = True,
+    engine: Optional[str] = None,
+) -> GroupReport:
+    """
+    Отчёт по группе за [start..end].
+
+    Считаются только пары, которые реально были (снятые PeriodSkip пары
+    и праздники исключены ещё при заполнении attendance_daily), причины уже разложены
+    по колонкам в core.summary.classify_missed.
+
+    day — если задан, дополнительно грузятся снятые за этот день пары
+    и (при with_marks) отметки за день для мини-журнала.
+    engine — "summary" / "matrix", по умолчанию REPORT_ENGINE.
+    """
+    engine = engine or REPORT_ENGINE
+    with SessionLocal() as s:
+        if engine == "matrix":
+            from core.matrix import AttendanceMatrix  # numpy нужен только этому движку
+
+            matrix = AttendanceMatrix.load(s, group_id, start, end)
+            students, counts, detail = matrix.students, matrix.stats_counts(), matrix.detail()
+        else:
+            students, counts, detail = _summary_report(_summary_rows(s, group_id, start, end))
+
+        day_map: dict[int, list[DayMark]] = {}
+        skips: list[SkipRow] = []
+        if day is not None and with_marks and students:
+            # по id студентов, а не join по группе, и сортировка с student_id:
+            # иначе SQLite идёт от уникального индекса (date, period_code, …)
+            # и перебирает отметки всего колледжа за день
+            marks = s.execute(
+                select(
+                    Attendance.student_id,
+                    Attendance.period_code,
+                    Attendance.status,
+                    Attendance.reason,
+                )
+                .where(
+                    Attendance.student_id.in_([st.id for st in students]),
+                    Attendance.date == day,
+                )
+                .order_by(Attendance.student_id, Attendance.period_code)
+            )
+            for sid, period_code, status, reason in marks:
+                day_map.setdefault(sid, []).append(DayMark(period_code, status, reason))
+        if day is not None:
+            skips = day_skips(s, group_id, day)
+
+    return GroupReport(
+        students=students,
+        stats=_stats(counts),
+        detail=detail,
+        day_map=day_map,
+        skips=skips,
+    )
@@ -0,0 +1,210 @@
+# core/schedule.py
+"""
+Действующее расписание группы на дату: звонки из БД, праздники, семестры.
+
+schedule_for(group_id, d) возвращает скомпилированное config.Schedule:
+  * праздник (общий или только этой группы) → пустое расписание;
+  * у группы есть свои строки timetable_periods на этот день недели → они;
+  * иначе общие строки (group_id IS NULL) на этот день недели;
+  * таблица звонков пуста → config.WEEKLY_SCHEDULE, как раньше.
+
+Таблицы маленькие, поэтому каждый воркер держит их снимок в памяти,
+а ответы кэширует в LRU по (group_id, date). Снимок (вместе с LRU)
+пересобирается, когда меняется cache_versions['schedule'] — его
+увеличивают триггеры на timetable_periods / academic_terms / holidays.
+
+Снятые куратором пары (PeriodSkip) сюда не входят: это ручная отметка
+на конкретный день поверх расписания, её показывает журнал.
+
+Управление:
+    python -m core.schedule show [--group PO-175] [--date 2025-09-01]
+    python -m core.schedule holiday add 2025-11-07 [--group PO-175] [--title "..."]
+    python -m core.schedule holiday remove 2025-11-07 [--group PO-175]
+    python -m core.schedule term add "Осень 2025" 2025-09-01 2025-12-27
+    python -m core.schedule term list
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import threading
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Optional
+
+from sqlalchemy import select
+
+from config import COMPILED_WEEKLY_SCHEDULE, EMPTY_SCHEDULE, Schedule, compile_schedule
+from models import engine, SessionLocal, AcademicTerm, Group, Holiday, TimetablePeriod
+from core.summary import refresh_holiday
+from core.versions import VersionWatch
+
+SCHEDULE_CHECK_INTERVAL = float(os.getenv("SCHEDULE_CHECK_INTERVAL", "5"))
+SCHEDULE_CACHE_SIZE = int(os.getenv("SCHEDULE_CACHE_SIZE", "4096"))
+
+
+# ───────────────── снимок таблиц ─────────────────
+
+
+class _Calendar:
+    __slots__ = ("version", "weekly", "holidays", "term_starts", "terms", "resolve")
+
+    def __init__(self, version: int, conn):
+        self.version = version
+
+        rows: dict[tuple[Optional[int], int], list[dict]] = defaultdict(list)
+        for gid, wd, code, title, start, end in conn.execute(
+            select(
+                TimetablePeriod.group_id, TimetablePeriod.weekday, TimetablePeriod.code,
+                TimetablePeriod.title, TimetablePeriod.start, TimetablePeriod.end,
+            )
+        ):
+            rows[(gid, wd)].append({"code": code, "title": title, "start": start, "end": end})
+        if rows:
+            self.weekly = {key: compile_schedule(items) for key, items in rows.items()}
+        else:
+            self.weekly = {(None, wd): s for wd, s in COMPILED_WEEKLY_SCHEDULE.items()}
+
+        self.holidays = {
+            (d, gid) for d, gid in conn.execute(select(Holiday.date, Holiday.group_id))
+        }
+
+        self.terms = list(conn.execute(
+            select(AcademicTerm.start_date, AcademicTerm.end_date)
+            .order_by(AcademicTerm.start_date)
+        ))
+        self.term_starts = [start for start, _end in self.terms]
+
+        self.resolve = lru_cache(maxsize=SCHEDULE_CACHE_SIZE)(self._resolve)
+
+    def _resolve(self, group_id: Optional[int], d: date) -> Schedule:
+        if (d, None) in self.holidays or (group_id is not None and (d, group_id) in self.holidays):
+            return EMPTY_SCHEDULE
+        wd = d.weekday()
+        if group_id is not None:
+            own = self.weekly.get((group_id, wd))
+            if own is not None:
+                return own
+        return self.weekly.get((None, wd), EMPTY_SCHEDULE)
+
+
+_CALENDAR: Optional[_Calendar] = None
+_VERSION = VersionWatch("schedule", SCHEDULE_CHECK_INTERVAL)
+_LOCK = threading.Lock()
+
+
+def _calendar() -> _Calendar:
+    global _CALENDAR
+    version = _VERSION.get()
+    cal = _CALENDAR
+    if cal is not None and cal.version == version:
+        return cal
+    with _LOCK:
+        if _CALENDAR is None or _CALENDAR.version != version:
+            with engine.connect() as conn:
+                _CALENDAR = _Calendar(version, conn)
+        return _CALENDAR
+
+
+def invalidate_schedule_cache() -> None:
+    """Следующий вызов сверит версию расписания с БД."""
+    _VERSION.reset()
+
+
+# ───────────────── API ─────────────────
+
+
+def schedule_for(group_id: Optional[int], d: Optional[date] = None) -> Schedule:
+    """Действующее расписание группы на дату (group_id=None — общее)."""
+    return _calendar().resolve(group_id, d or date.today())
+
+
+def is_holiday(group_id: Optional[int], d: date) -> bool:
+    holidays = _calendar().holidays
+    return (d, None) in holidays or (group_id is not None and (d, group_id) in holidays)
+
+
+def term_range(d: date) -> tuple[date, date]:
+    """
+    Границы учебного периода, в который попадает d. Если в academic_terms
+    такого нет — прежнее правило: 01.09..31.12 и 01.01..31.05.
+    """
+    cal = _calendar()
+    i = bisect_right(cal.term_starts, d) - 1
+    if i >= 0 and d <= cal.terms[i][1]:
+        return cal.terms[i][0], cal.terms[i][1]
+    if d.month >= 9:  # осенний
+        return date(d.year, 9, 1), date(d.year, 12, 31)
+    return date(d.year, 1, 1), date(d.year, 5, 31)  # весенний
+
+
+# ───────────────── CLI ─────────────────
+
+
+def _parse(s: str) -> date:
+    return datetime.strptime(s, "%Y-%m-%d").date()
+
+
+def _group_id(s, code: Optional[str]) -> Optional[int]:
+    if not code:
+        return None
+    gid = s.query(Group.id).filter(Group.code == code.strip()).scalar()
+    if gid is None:
+        raise SystemExit(f"Группа {code} не найдена")
+    return gid
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Расписание, праздники и учебные периоды")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p_show = sub.add_parser("show")
+    p_show.add_argument("--group")
+    p_show.add_argument("--date", default=date.today().isoformat())
+
+    p_hol = sub.add_parser("holiday")
+    p_hol.add_argument("action", choices=("add", "remove"))
+    p_hol.add_argument("date")
+    p_hol.add_argument("--group")
+    p_hol.add_argument("--title", default="")
+
+    p_term = sub.add_parser("term")
+    p_term.add_argument("action", choices=("add", "list"))
+    p_term.add_argument("name", nargs="?")
+    p_term.add_argument("start", nargs="?")
+    p_term.add_argument("end", nargs="?")
+
+    args = ap.parse_args()
+
+    with SessionLocal() as s:
+        if args.cmd == "show":
+            d = _parse(args.date)
+            sched = schedule_for(_group_id(s, args.group), d)
+            start, end = term_range(d)
+            print(f"{d} ({args.group or 'общее'}), семестр {start}..{end}")
+            for p in sched:
+                print(f"  {p.code:<3} {p.start}-{p.end}  {p.title}")
+            if not sched:
+                print("  занятий нет")
+        elif args.cmd == "holiday":
+            d = _parse(args.date)
+            gid = _group_id(s, args.group)
+            q = s.query(Holiday).filter(Holiday.date == d, Holiday.group_id.is_(gid))
+            if args.action == "add" and not q.first():
+                s.add(Holiday(date=d, group_id=gid, title=args.title))
+            elif args.action == "remove":
+                q.delete()
+            # отметки этого дня уходят из сводки отчётов (или возвращаются)
+            refresh_holiday(s, d, gid)
+            s.commit()
+        elif args.action == "add":
+            if not (args.name and args.start and args.end):
+                raise SystemExit("term add NAME FROM TO")
+            s.add(AcademicTerm(name=args.name, start_date=_parse(args.start),
+                               end_date=_parse(args.end)))
+            s.commit()
+        else:
+            for t in s.query(AcademicTerm).order_by(AcademicTerm.start_date):
+                print(f"{t.start_date}..{t.end_date}  {t.name}")
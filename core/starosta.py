@@ -2,29 +2,35 @@ from __future__ import annotations
 from datetime import date, datetime, time as dtime
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session
 from sqlalchemy import select
-from models import SessionLocal, Student, Attendance, StarostaLock
+from models import SessionLocal, Student, StarostaLock
 from core.auth_bp import require_role
-from core.permissions import get_starosta_groups
-from config import get_schedule_for
+from core.permissions import (
+    get_starosta_groups, group_ids_for_codes, group_student_ids, students_in_starosta_scope,
+)
 from core.helpers import current_period_index
+from core.schedule import schedule_for
+from core.attendance import upsert_attendance
 
 starosta_bp = Blueprint("starosta", __name__, template_folder="../templates")
 
 
-def _starosta_group() -> str | None:
+def _starosta_group() -> tuple[str, int] | None:
+    """(код, id) группы старосты."""
     fio = (session.get("user") or {}).get("fio", "")
     groups = [g.strip() for g in get_starosta_groups(fio) if g and g.strip()]
+    ids = group_ids_for_codes(groups)
+    groups = [g for g in groups if g in ids]
     if not groups:
         return None
     # Предполагаем 1 группу на старосту; если больше — возьмём первую
-    return groups[0]
+    return groups[0], ids[groups[0]]
 
 
 @starosta_bp.route("/starosta", methods=["GET"])
 @require_role("starosta")
 def starosta_form():
-    g = _starosta_group()
-    if not g:
+    grp = _starosta_group()
+    if not grp:
         flash("Для вашего профиля не назначена группа. Обратитесь к куратору.", "error")
         return render_template(
             "starosta.html",
@@ -34,9 +40,10 @@ def starosta_form():
             group_code=None,
             locked=True,
         )
+    g, gid = grp
 
     today_d = date.today()
-    schedule = get_schedule_for(today_d)
+    schedule = schedule_for(gid, today_d)
     cur_idx = current_period_index(schedule=schedule)
     if cur_idx is None or cur_idx < 0 or cur_idx >= len(schedule):
         cur_idx = None
@@ -45,7 +52,7 @@ def starosta_form():
     with SessionLocal() as s:
         students = (
             s.query(Student)
-            .filter(Student.group_code == g)
+            .filter(Student.group_id == gid)
             .order_by(Student.full_name)
             .all()
         )
@@ -54,13 +61,13 @@ def starosta_form():
         locked = False
         period_code = None
         if cur_idx is not None:
-            period_code = schedule[cur_idx]["code"]
+            period_code = schedule[cur_idx].code
             lock = (
                 s.query(StarostaLock)
                 .filter(
                     StarostaLock.date == today_d,
                     StarostaLock.period_code == period_code,
-                    StarostaLock.group_code == g,
+                    StarostaLock.group_id == gid,
                 )
                 .first()
             )
@@ -80,18 +87,19 @@ def starosta_form():
 @starosta_bp.route("/starosta/submit", methods=["POST"])
 @require_role("starosta")
 def starosta_submit():
-    g = _starosta_group()
-    if not g:
+    grp = _starosta_group()
+    if not grp:
         flash("Не назначена группа старосты.", "error")
         return redirect(url_for("starosta.starosta_form"))
+    gid = grp[1]
 
     today_d = date.today()
-    schedule = get_schedule_for(today_d)
+    schedule = schedule_for(gid, today_d)
     cur_idx = current_period_index(schedule=schedule)
     if cur_idx is None or cur_idx < 0 or cur_idx >= len(schedule):
         flash("Сейчас нет активной пары для отметки.", "error")
         return redirect(url_for("starosta.starosta_form"))
-    period_code = schedule[cur_idx]["code"]
+    period_code = schedule[cur_idx].code
 
     status = (request.form.get("status") or "").strip()
     if status not in {"present", "absent", "excused"}:
@@ -107,6 +115,9 @@ def starosta_submit():
         return redirect(url_for("starosta.starosta_form"))
 
     fio = (session.get("user") or {}).get("fio", "")
+    # только студенты своей группы — одним запросом; пара, расписание и блокировка
+    # взяты для gid, поэтому студенты других групп старосты сюда не попадают
+    allowed = students_in_starosta_scope(fio, ids) & group_student_ids(gid)
 
     with SessionLocal() as s:
         # повторная отправка запрещена
@@ -115,7 +126,7 @@ def starosta_submit():
             .filter(
                 StarostaLock.date == today_d,
                 StarostaLock.period_code == period_code,
-                StarostaLock.group_code == g,
+                StarostaLock.group_id == gid,
             )
             .first()
         )
@@ -125,33 +136,14 @@ def starosta_submit():
 
         now_t = datetime.now().time()
         # применим статус ко всем выбранным
-        for sid in ids:
-            st = (
-                s.query(Student)
-                .filter(Student.id == sid, Student.group_code == g)
-                .first()
-            )
-            if not st:
-                continue
-            rec = (
-                s.query(Attendance)
-                .filter(
-                    Attendance.date == today_d,
-                    Attendance.period_code == period_code,
-                    Attendance.student_id == sid,
-                )
-                .first()
-            )
-            if not rec:
-                rec = Attendance(date=today_d, period_code=period_code, student_id=sid)
-                s.add(rec)
-            rec.status = status
-            rec.reason = reason
-            rec.time = now_t
+        upsert_attendance(
+            s,
+            [(today_d, period_code, sid, status, reason, now_t) for sid in ids if sid in allowed],
+        )
 
         # создаём блокировку
         lock = StarostaLock(
-            date=today_d, period_code=period_code, group_code=g, submitted_by=fio
+            date=today_d, period_code=period_code, group_id=gid, submitted_by=fio
         )
         s.add(lock)
         s.commit()
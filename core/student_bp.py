@@ -3,8 +3,10 @@ from flask import Blueprint, render_template, request, redirect, url_for, sessio
 from datetime import date, datetime, timedelta
 from models import SessionLocal, Student, Attendance
 from core.auth_bp import require_role
-from config import get_schedule_for, today_key
+from config import today_key
 from core.helpers import current_period_index
+from core.schedule import schedule_for
+from core.attendance import upsert_attendance
 
 student_bp = Blueprint("student_bp", __name__)
 
@@ -21,13 +23,13 @@ def dashboard():
         return redirect(url_for("auth_bp.login"))
 
     today = date.today()
-    schedule_today = get_schedule_for(today)
 
     with SessionLocal() as s:
         st = s.query(Student).filter(Student.full_name == fio).first()
         if not st:
             flash("Студент не найден в базе", "error")
             return redirect(url_for("auth_bp.logout"))
+        schedule_today = schedule_for(st.group_id, today)
 
         week_days = _week_range(today)
         recs = (
@@ -69,14 +71,6 @@ def student_checkin():
 
     today = date.today()
     now = datetime.now().time()
-    schedule = get_schedule_for(today)
-    idx = current_period_index(schedule=schedule)
-
-    if idx is None:
-        flash("Сейчас нет текущей пары, отметка не сохранена.", "error")
-        return redirect(url_for("student_bp.dashboard"))
-
-    period_code = schedule[idx]["code"]
 
     with SessionLocal() as s:
         st = s.query(Student).filter(Student.full_name == fio).first()
@@ -84,27 +78,14 @@ def student_checkin():
             flash("Студент не найден в базе", "error")
             return redirect(url_for("auth_bp.logout"))
 
-        rec = (
-            s.query(Attendance)
-             .filter(Attendance.date == today,
-                     Attendance.period_code == period_code,
-                     Attendance.student_id == st.id)
-             .first()
-        )
-        if not rec:
-            rec = Attendance(
-                date=today,
-                period_code=period_code,
-                time=now,
-                student_id=st.id,
-                status="present",
-                reason=None
-            )
-            s.add(rec)
-        else:
-            rec.time = now
-            rec.status = "present"
-            rec.reason = None
+        schedule = schedule_for(st.group_id, today)
+        idx = current_period_index(schedule=schedule)
+        if idx < 0:
+            flash("Сейчас нет текущей пары, отметка не сохранена.", "error")
+            return redirect(url_for("student_bp.dashboard"))
+        period_code = schedule[idx].code
+
+        upsert_attendance(s, [(today, period_code, st.id, "present", None, now)])
         s.commit()
 
     flash("Отметка «Я пришёл» сохранена", "success")
@@ -0,0 +1,215 @@
+# core/summary.py
+"""
+Дневная сводка посещаемости (таблица attendance_daily).
+
+Каждая запись в attendance / period_skips должна в той же транзакции
+вызвать refresh_daily(...) или refresh_group_day(...), а правка holidays —
+refresh_holiday(...) — тогда отчёты за месяц/семестр читают маленькие
+строки «студент × день», а не сырые отметки. Отменённые пары и праздники
+(общие и групповые) в сводку не попадают.
+
+Перевод студента в другую группу (Student.group_id через ORM) пересчитывает
+его строки сам — после flush (см. _refresh_transferred): снятые пары и
+праздники у групп разные. Перевод в обход ORM — python -m core.summary.
+
+Функции работают и с Session, и с Connection (только Core-запросы),
+поэтому их же использует миграция при первичном заполнении.
+
+Полная пересборка (например, после ручных правок в БД):
+    python -m core.summary [--from 2025-09-01] [--to 2025-12-31]
+"""
+from __future__ import annotations
+
+import argparse
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import and_, delete, event, exists, func, insert, inspect, or_, select
+from sqlalchemy.orm import Session
+
+from models import SessionLocal, Attendance, AttendanceDaily, Holiday, PeriodSkip, Student
+
+STATUSES = ("present", "late", "absent", "excused")
+MISSED_REASONS = ("statement", "sick", "competition", "other", "unexcused")
+
+REBUILD_CHUNK_DAYS = 31
+
+
+def classify_missed(status: Optional[str], reason: Optional[str]) -> Optional[str]:
+    """К какой колонке отчёта относится пропуск (None — это не пропуск)."""
+    status = (status or "").strip().lower()
+    reason = (reason or "").strip().lower()
+
+    # считаем только пропуски (отсутствовал или уважительная)
+    if status not in ("absent", "excused"):
+        return None
+
+    # Грубая эвристика по причинам — под реальные значения можно подстроить
+    if "заяв" in reason or reason in ("application",):
+        return "statement"
+    if "бол" in reason or reason in ("sick",):
+        return "sick"
+    if "соревн" in reason or reason in ("competition", "contest"):
+        return "competition"
+    if status == "absent":
+        # отсутствие без причины или с непонятной причиной → неуважительная
+        return "unexcused"
+    # все остальные уважительные
+    return "other"
+
+
+def not_holiday(group_id, day):
+    """Условие «day — не праздник ни для колледжа, ни для группы group_id»."""
+    return ~exists().where(
+        Holiday.date == day,
+        or_(Holiday.group_id.is_(None), Holiday.group_id == group_id),
+    )
+
+
+def _source_rows(s, *conds):
+    """Отметки (без отменённых пар и праздников) в разрезе student_id/date."""
+    q = (
+        select(
+            Attendance.student_id,
+            Attendance.date,
+            Student.group_id,
+            Attendance.status,
+            Attendance.reason,
+        )
+        .join(Student, Student.id == Attendance.student_id)
+        .outerjoin(
+            PeriodSkip,
+            and_(
+                PeriodSkip.group_id == Student.group_id,
+                PeriodSkip.date == Attendance.date,
+                PeriodSkip.period_code == Attendance.period_code,
+            ),
+        )
+        .where(
+            Attendance.status.in_(STATUSES),
+            PeriodSkip.id.is_(None),
+            not_holiday(Student.group_id, Attendance.date),
+            *conds,
+        )
+    )
+    return s.execute(q)
+
+
+def _aggregate(rows) -> list[dict]:
+    acc: dict[tuple[int, date], dict] = {}
+    for student_id, d, group_id, status, reason in rows:
+        row = acc.get((student_id, d))
+        if row is None:
+            row = dict.fromkeys(STATUSES + MISSED_REASONS, 0)
+            row.update(student_id=student_id, date=d, group_id=group_id)
+            acc[(student_id, d)] = row
+        row[status] += 1
+        bucket = classify_missed(status, reason)
+        if bucket:
+            row[bucket] += 1
+    return list(acc.values())
+
+
+def refresh_daily(s, keys: Iterable[tuple[int, date]]) -> None:
+    """Пересчитать сводку для пар (student_id, date) в текущей транзакции."""
+    by_date: dict[date, set[int]] = defaultdict(set)
+    for student_id, d in keys:
+        by_date[d].add(student_id)
+    if not by_date:
+        return
+    if hasattr(s, "flush"):
+        s.flush()
+
+    for d, student_ids in by_date.items():
+        ids = list(student_ids)
+        s.execute(
+            delete(AttendanceDaily).where(
+                AttendanceDaily.date == d, AttendanceDaily.student_id.in_(ids)
+            )
+        )
+        rows = _aggregate(
+            _source_rows(s, Attendance.date == d, Attendance.student_id.in_(ids))
+        )
+        if rows:
+            s.execute(insert(AttendanceDaily), rows)
+
+
+def refresh_group_day(s, group_id: int, d: date) -> None:
+    """Пересчитать сводку всей группы за день (после отмены/возврата пары)."""
+    student_ids = s.execute(select(Student.id).where(Student.group_id == group_id)).scalars()
+    refresh_daily(s, [(sid, d) for sid in student_ids])
+
+
+def refresh_holiday(s, d: date, group_id: Optional[int] = None) -> None:
+    """Пересчитать сводку за день после правки праздника (group_id None — весь колледж)."""
+    q = select(Attendance.student_id).where(Attendance.date == d).distinct()
+    if group_id is not None:
+        q = q.join(Student, Student.id == Attendance.student_id).where(
+            Student.group_id == group_id
+        )
+    refresh_daily(s, [(sid, d) for sid in s.execute(q).scalars()])
+
+
+@event.listens_for(Session, "after_flush")
+def _refresh_transferred(session, _ctx) -> None:
+    """После flush с переводом студентов — пересчитать их сводку по новой группе."""
+    moved = [
+        obj.id for obj in session.dirty
+        if isinstance(obj, Student) and inspect(obj).attrs.group_id.history.has_changes()
+    ]
+    if not moved:
+        return
+    conn = session.connection()  # внутри flush — без повторного flush
+    keys = conn.execute(
+        select(Attendance.student_id, Attendance.date)
+        .where(Attendance.student_id.in_(moved))
+        .distinct()
+    ).all()
+    refresh_daily(conn, keys)
+
+
+def rebuild(s, start: Optional[date] = None, end: Optional[date] = None) -> int:
+    """Пересобрать сводку за [start..end] (по умолчанию — за всё время). Возвращает число строк."""
+    lo, hi = s.execute(select(func.min(Attendance.date), func.max(Attendance.date))).one()
+    start = start or lo
+    end = end or hi
+
+    cond = []
+    if start:
+        cond.append(AttendanceDaily.date >= start)
+    if end:
+        cond.append(AttendanceDaily.date <= end)
+    s.execute(delete(AttendanceDaily).where(*cond))
+    if not (start and end):
+        return 0
+
+    total = 0
+    chunk_start = start
+    # окнами по месяцу, чтобы не держать в памяти всю историю
+    while chunk_start <= end:
+        chunk_end = min(end, chunk_start + timedelta(days=REBUILD_CHUNK_DAYS - 1))
+        rows = _aggregate(
+            _source_rows(s, Attendance.date >= chunk_start, Attendance.date <= chunk_end)
+        )
+        if rows:
+            s.execute(insert(AttendanceDaily), rows)
+            total += len(rows)
+        chunk_start = chunk_end + timedelta(days=1)
+    return total
+
+
+def _parse(s: Optional[str]) -> Optional[date]:
+    return datetime.strptime(s, "%Y-%m-%d").date() if s else None
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Пересборка attendance_daily")
+    ap.add_argument("--from", dest="start", help="YYYY-MM-DD")
+    ap.add_argument("--to", dest="end", help="YYYY-MM-DD")
+    args = ap.parse_args()
+
+    with SessionLocal() as s:
+        n = rebuild(s, _parse(args.start), _parse(args.end))
+        s.commit()
+    print(f"attendance_daily: пересобрано строк — {n}")
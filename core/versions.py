@@ -0,0 +1,68 @@
+# core/versions.py
+"""
+Счётчики cache_versions для кэшей в памяти воркера.
+
+Счётчик увеличивают триггеры БД (см. core.migrations), поэтому любая
+правка таблиц — из приложения, CLI или руками через sqlite3 — видна
+всем воркерам. VersionWatch перечитывает число не чаще раза в interval
+секунд, так что на горячем пути запросов к БД нет.
+
+group_versions — такой же счётчик, но по каждой группе: данные одной
+группы (отметки, снятые пары, состав) для кэша отчётов.
+"""
+from __future__ import annotations
+
+import time
+
+from sqlalchemy import select
+
+from models import engine, CacheVersion, GroupVersion
+
+
+def read_version(conn, name: str) -> int:
+    return conn.execute(
+        select(CacheVersion.version).where(CacheVersion.name == name)
+    ).scalar() or 0
+
+
+def read_group_version(conn, group_id: int) -> int:
+    """Версия данных группы (group_versions); 0 — записей ещё не было."""
+    return conn.execute(
+        select(GroupVersion.version).where(GroupVersion.group_id == group_id)
+    ).scalar() or 0
+
+
+def read_group_versions(conn, group_ids) -> dict:
+    """{group_id: версия} для нескольких групп одним запросом (нет строки — 0)."""
+    ids = list(group_ids)
+    if not ids:
+        return {}
+    found = dict(conn.execute(
+        select(GroupVersion.group_id, GroupVersion.version)
+        .where(GroupVersion.group_id.in_(ids))
+    ).all())
+    return {gid: found.get(gid, 0) for gid in ids}
+
+
+class VersionWatch:
+    """Версия cache_versions[name], закэшированная на interval секунд."""
+
+    __slots__ = ("name", "interval", "_version", "_checked_at")
+
+    def __init__(self, name: str, interval: float):
+        self.name = name
+        self.interval = interval
+        self._version = 0
+        self._checked_at = None
+
+    def get(self, force: bool = False) -> int:
+        now = time.monotonic()
+        if force or self._checked_at is None or now - self._checked_at >= self.interval:
+            with engine.connect() as conn:
+                self._version = read_version(conn, self.name)
+            self._checked_at = now
+        return self._version
+
+    def reset(self) -> None:
+        """Следующий get() обязательно сходит в БД."""
+        self._checked_at = None
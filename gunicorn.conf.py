@@ -0,0 +1,39 @@
+# gunicorn.conf.py
+"""
+Настройки gunicorn (подхватываются сами при запуске из корня репозитория):
+
+    gunicorn app:app
+
+SSE-потоки чата и счётчика непрочитанных (/api/chat/stream,
+/api/chat/unread_count/stream) держат ответ открытым до
+CHAT_STREAM_MAX_AGE (5 минут) на каждую вкладку. Синхронный воркер
+по умолчанию на это время занят целиком — пара открытых вкладок
+«съедает» все воркеры. Поэтому воркеры потоковые (gthread):
+открытый поток занимает один поток воркера, а не весь процесс.
+
+Переменные окружения:
+    GUNICORN_BIND     — адрес (по умолчанию 0.0.0.0:8000)
+    WEB_CONCURRENCY   — число процессов (по умолчанию 2)
+    GUNICORN_THREADS  — потоков на процесс (по умолчанию 64): с запасом
+                        на открытые вкладки плюс обычные запросы.
+                        К БД одновременно ходят не больше
+                        DB_POOL_SIZE + DB_MAX_OVERFLOW из них (models.py) —
+                        SSE-потоки держат соединение только на время чтения.
+"""
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "64"))
+
+# в gthread timeout — пульс самого воркера, а не длительность запроса:
+# долгий SSE-ответ по нему не обрывается
+timeout = 60
+# открытые SSE при перезапуске не ждём: браузер переподключится с Last-Event-ID
+graceful_timeout = 10
+keepalive = 5
+
+# приложение импортируется в каждом воркере: миграции — под файловой
+# блокировкой (core.migrations), поток chat_broker стартует после fork
+preload_app = False
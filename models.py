@@ -3,12 +3,12 @@ from typing import Optional
 from datetime import date, time as dtime, datetime
 
 from sqlalchemy import (
-    create_engine, Column, Integer, String, Date, Time, DateTime, Text, ForeignKey,
-    UniqueConstraint, Index, Boolean
+    create_engine, event, Column, Integer, String, Date, Time, DateTime, Text, ForeignKey,
+    UniqueConstraint, Index, Boolean, text
 )
 from sqlalchemy.orm import (
     DeclarativeBase, Mapped, mapped_column, relationship,
-    sessionmaker, scoped_session
+    sessionmaker, scoped_session, validates
 )
 
 # ──────────────────────────────────────────────────────────────────────────────
@@ -16,11 +16,71 @@ from sqlalchemy.orm import (
 # ──────────────────────────────────────────────────────────────────────────────
 DB_URL = os.getenv("DB_URL", "sqlite:///ldo.db")
 
+# Профиль SQLite для продакшена (gunicorn: несколько воркеров пишут одновременно).
+#   DB_SQLITE_PROFILE=wal  — WAL + настроенные PRAGMA (по умолчанию)
+#   DB_SQLITE_PROFILE=off  — «голый» SQLite (rollback-journal), например для сетевых ФС
+DB_SQLITE_PROFILE = os.getenv("DB_SQLITE_PROFILE", "wal")
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_CACHE_SIZE_KIB = int(os.getenv("DB_CACHE_SIZE_KIB", "20000"))  # ~20 МБ страничного кэша
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(128 * 1024 * 1024)))  # 128 МБ
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+
+SQLITE_PRAGMAS = (
+    ("journal_mode", "WAL"),          # читатели не блокируют писателя и наоборот
+    ("synchronous", "NORMAL"),        # в WAL безопасно и заметно быстрее FULL
+    ("busy_timeout", DB_BUSY_TIMEOUT_MS),
+    ("cache_size", -DB_CACHE_SIZE_KIB),  # отрицательное значение = KiB
+    ("mmap_size", DB_MMAP_SIZE),
+    ("temp_store", "MEMORY"),
+)
+
 
 class Base(DeclarativeBase):
     pass
 
 
+def normalize_group_code(value: Optional[str]) -> Optional[str]:
+    """
+    Код группы храним уже «чистым» (без пробелов по краям), чтобы в запросах
+    сравнивать колонку напрямую и не терять индексы на trim(...).
+    """
+    if value is None:
+        return None
+    return value.strip() or None
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# ГРУППЫ
+# ──────────────────────────────────────────────────────────────────────────────
+class Group(Base):
+    __tablename__ = "groups"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    # Код группы (например: "K-21", "IS-302") — только здесь, остальные таблицы ссылаются по id
+    code: Mapped[str] = mapped_column(String(32), unique=True, nullable=False)
+
+    students: Mapped[list["Student"]] = relationship(back_populates="group")
+
+    @validates("code")
+    def _normalize_code(self, _key, value):
+        return normalize_group_code(value)
+
+    def __repr__(self) -> str:
+        return f"<Group {self.id} {self.code}>"
+
+
+def get_or_create_group(s, code: str) -> Group:
+    """Найти группу по коду или создать (в текущей сессии, без commit)."""
+    code = normalize_group_code(code)
+    grp = s.query(Group).filter(Group.code == code).first()
+    if not grp:
+        grp = Group(code=code)
+        s.add(grp)
+        s.flush()
+    return grp
+
+
 # ──────────────────────────────────────────────────────────────────────────────
 # СТУДЕНТЫ
 # ──────────────────────────────────────────────────────────────────────────────
@@ -30,8 +90,10 @@ class Student(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     uid: Mapped[str] = mapped_column(String(64), unique=True, index=True)
     full_name: Mapped[str] = mapped_column(String(255), index=True)
-    # Код группы (например: "K-21", "IS-302")
-    group_code: Mapped[Optional[str]] = mapped_column(String(32), index=True, nullable=True)
+    group_id: Mapped[Optional[int]] = mapped_column(
+        Integer, ForeignKey("groups.id"), index=True, nullable=True
+    )
+    group: Mapped[Optional["Group"]] = relationship(back_populates="students")
     
     # НОВОЕ ПОЛЕ: Хеш пароля (для входа в личный кабинет)
     password_hash: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
@@ -42,6 +104,11 @@ class Student(Base):
         cascade="all, delete-orphan"
     )
 
+    @property
+    def group_code(self) -> Optional[str]:
+        """Код группы (для вывода; в запросах используем group_id)."""
+        return self.group.code if self.group else None
+
 
 # ──────────────────────────────────────────────────────────────────────────────
 # ЖУРНАЛ ПОСЕЩАЕМОСТИ
@@ -71,6 +138,47 @@ class Attendance(Base):
     )
 
 
+# ──────────────────────────────────────────────────────────────────────────────
+# ДНЕВНАЯ СВОДКА ПОСЕЩАЕМОСТИ (для отчётов за месяц/семестр)
+# ──────────────────────────────────────────────────────────────────────────────
+class AttendanceDaily(Base):
+    """
+    Одна строка = студент за день: сколько пар в каком статусе
+    и сколько пропусков по каким причинам. Отменённые пары (PeriodSkip) не входят.
+
+    Таблицу поддерживает core/summary.py в той же транзакции, что и запись
+    в attendance / period_skips; полностью пересобрать: python -m core.summary
+    """
+    __tablename__ = "attendance_daily"
+
+    student_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("students.id"), primary_key=True
+    )
+    date: Mapped[date] = mapped_column(Date, primary_key=True)
+    # группа на момент отметки (после перевода студента не меняется);
+    # отчёты берут строки по student_id — за нынешней группой
+    group_id: Mapped[Optional[int]] = mapped_column(
+        Integer, ForeignKey("groups.id"), nullable=True
+    )
+
+    # пары по статусам
+    present: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    late: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    absent: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    excused: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    # пропуски (absent + excused) по причинам
+    statement: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    sick: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    competition: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    other: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    unexcused: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_attendance_daily_group_date", "group_id", "date", "student_id"),
+    )
+
+
 # ──────────────────────────────────────────────────────────────────────────────
 # ОТМЕНА УЧЁТА ОТДЕЛЬНЫХ ПАР (НЕ УЧИТЫВАТЬ ПАРУ)
 # ──────────────────────────────────────────────────────────────────────────────
@@ -81,7 +189,7 @@ class PeriodSkip(Base):
     date: Mapped[date] = mapped_column(Date, index=True, nullable=False)
     period_code: Mapped[str] = mapped_column(String(8), index=True, nullable=False)
     # ВАЖНО: теперь указываем группу, для которой пара отменена
-    group_code: Mapped[str] = mapped_column(String(32), index=True, nullable=False)
+    group_id: Mapped[int] = mapped_column(Integer, ForeignKey("groups.id"), nullable=False)
 
     __table_args__ = (
         # Главный момент: уникальность по ТРЁМ полям,
@@ -89,14 +197,59 @@ class PeriodSkip(Base):
         UniqueConstraint(
             "date",
             "period_code",
-            "group_code",
+            "group_id",
             name="uq_period_skip_date_code_group",
         ),
-        Index("ix_period_skip_group_date", "group_code", "date"),
+        # period_code в конце — выборка снятых пар группы за день целиком из индекса
+        Index("ix_period_skip_group_date", "group_id", "date", "period_code"),
     )
 
     def __repr__(self) -> str:
-        return f"<PeriodSkip {self.date} {self.period_code} {self.group_code}>"
+        return f"<PeriodSkip {self.date} {self.period_code} group={self.group_id}>"
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# РАСПИСАНИЕ ЗВОНКОВ, УЧЕБНЫЕ ПЕРИОДЫ, ПРАЗДНИКИ
+# ──────────────────────────────────────────────────────────────────────────────
+class TimetablePeriod(Base):
+    """
+    Пара в расписании звонков на день недели.
+    group_id IS NULL — общее расписание; строки группы на этот день недели
+    полностью заменяют общее.
+    """
+    __tablename__ = "timetable_periods"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    group_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("groups.id"), nullable=True)
+    weekday: Mapped[int] = mapped_column(Integer, nullable=False)  # 0 = понедельник
+    code: Mapped[str] = mapped_column(String(8), nullable=False)  # kh, p1..p7
+    title: Mapped[str] = mapped_column(String(64), nullable=False)
+    start: Mapped[str] = mapped_column(String(5), nullable=False)  # "HH:MM"
+    end: Mapped[str] = mapped_column(String(5), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("group_id", "weekday", "code", name="uq_timetable_group_weekday_code"),
+    )
+
+
+class AcademicTerm(Base):
+    """Учебный период (семестр) — границы отчётов «за семестр»."""
+    __tablename__ = "academic_terms"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    name: Mapped[str] = mapped_column(String(64), nullable=False)
+    start_date: Mapped[date] = mapped_column(Date, nullable=False)
+    end_date: Mapped[date] = mapped_column(Date, nullable=False)
+
+
+class Holiday(Base):
+    """Нерабочий день: group_id IS NULL — для всего колледжа."""
+    __tablename__ = "holidays"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    date: Mapped[date] = mapped_column(Date, index=True, nullable=False)
+    group_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("groups.id"), nullable=True)
+    title: Mapped[str] = mapped_column(String(255), nullable=False, default="")
 
 
 # ──────────────────────────────────────────────────────────────────────────────
@@ -137,15 +290,15 @@ class StarostaLock(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     date: Mapped[date] = mapped_column(Date, index=True, nullable=False)
     period_code: Mapped[str] = mapped_column(String(8), index=True, nullable=False)
-    group_code: Mapped[str] = mapped_column(String(32), index=True, nullable=False)
+    group_id: Mapped[int] = mapped_column(Integer, ForeignKey("groups.id"), nullable=False)
     submitted_by: Mapped[str] = mapped_column(String(255), nullable=False)  # ФИО старосты
     created_at: Mapped[datetime] = mapped_column(
         DateTime, default=datetime.utcnow, nullable=False
     )
 
     __table_args__ = (
-        UniqueConstraint("date", "period_code", "group_code", name="uq_starosta_lock"),
-        Index("ix_starosta_lock_group_date", "group_code", "date"),
+        UniqueConstraint("date", "period_code", "group_id", name="uq_starosta_lock"),
+        Index("ix_starosta_lock_group_date", "group_id", "date"),
     )
 
 
@@ -161,7 +314,7 @@ class User(Base):
     )
     password_hash: Mapped[str] = mapped_column(String(255), nullable=False)
     role: Mapped[str] = mapped_column(
-        String(32), index=True, nullable=False, default="curator"
+        String(32), nullable=False, default="curator"
     )
     fio: Mapped[str] = mapped_column(String(255), nullable=False, default="")
 
@@ -171,71 +324,224 @@ class User(Base):
     )
 
 
+# ──────────────────────────────────────────────────────────────────────────────
+# ЗОНЫ ОТВЕТСТВЕННОСТИ (куратор/староста → группы, заведующая → префиксы)
+# ──────────────────────────────────────────────────────────────────────────────
+SCOPE_ROLES = ("curator", "starosta")
+
+
+class RoleScope(Base):
+    __tablename__ = "role_scopes"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    role: Mapped[str] = mapped_column(String(32), nullable=False)  # curator / starosta
+    fio: Mapped[str] = mapped_column(String(255), nullable=False)  # как в users.fio / сессии
+    group_id: Mapped[int] = mapped_column(Integer, ForeignKey("groups.id"), nullable=False)
+
+    group: Mapped["Group"] = relationship()
+
+    __table_args__ = (
+        UniqueConstraint("role", "fio", "group_id", name="uq_role_scope"),
+    )
+
+
+class HeadPrefix(Base):
+    __tablename__ = "head_prefixes"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    fio: Mapped[str] = mapped_column(String(255), nullable=False)
+    prefix: Mapped[str] = mapped_column(String(32), nullable=False)  # например "PO-"
+
+    __table_args__ = (
+        UniqueConstraint("fio", "prefix", name="uq_head_prefix"),
+    )
+
+
+class CacheVersion(Base):
+    """
+    Счётчики версий для кэшей в памяти воркеров.
+    Увеличиваются триггерами БД (см. миграции), воркер сверяет одно число.
+    """
+    __tablename__ = "cache_versions"
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class GroupVersion(Base):
+    """
+    Версия данных группы: растёт при любой записи в attendance / period_skips
+    / students этой группы (триггеры, см. миграции). Нет строки — версия 0.
+    По ней кэши отчётов понимают, что данные группы не менялись.
+    """
+    __tablename__ = "group_versions"
+
+    group_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("groups.id", ondelete="CASCADE"), primary_key=True
+    )
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
 # ──────────────────────────────────────────────────────────────────────────────
 # ЧАТ С ТЕХПОДДЕРЖКОЙ [НОВОЕ]
 # ──────────────────────────────────────────────────────────────────────────────
+class ChatParticipant(Base):
+    """
+    Участник чата: сотрудник (user_id), студент (student_id) или общий ящик
+    техподдержки (kind='support', один на всех tech). Переписка ссылается
+    на id участника, поэтому смена ФИО её не разрывает. name — подпись на
+    момент создания; показывается, только если человека уже нет в users/students.
+
+    broadcast_read_id — до какого объявления (id в chat_messages) участник
+    дочитал: объявления хранятся один раз, без строк на каждого получателя.
+    """
+    __tablename__ = "chat_participants"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    kind: Mapped[str] = mapped_column(String(16), nullable=False)  # support | user | student
+    user_id: Mapped[Optional[int]] = mapped_column(
+        Integer, ForeignKey("users.id"), unique=True, nullable=True
+    )
+    student_id: Mapped[Optional[int]] = mapped_column(
+        Integer, ForeignKey("students.id"), unique=True, nullable=True
+    )
+    name: Mapped[str] = mapped_column(String(255), nullable=False, default="")
+    broadcast_read_id: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
+
+
+class Conversation(Base):
+    """
+    Диалог двух участников (a_id < b_id). last_message_id ведут триггеры
+    на chat_messages — по нему список диалогов сортируется по свежести.
+    """
+    __tablename__ = "conversations"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    a_id: Mapped[int] = mapped_column(Integer, ForeignKey("chat_participants.id"), nullable=False)
+    b_id: Mapped[int] = mapped_column(Integer, ForeignKey("chat_participants.id"), nullable=False)
+    last_message_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("a_id", "b_id", name="uq_conversation_pair"),
+        Index("ix_conversations_a_last", "a_id", "last_message_id"),
+        Index("ix_conversations_b_last", "b_id", "last_message_id"),
+    )
+
+    def partner_of(self, pid: int) -> int:
+        return self.b_id if self.a_id == pid else self.a_id
+
+
 class ChatMessage(Base):
+    """
+    Сообщение диалога. conversation_id = NULL — объявление техподдержки
+    всем: одна строка, is_read у неё не используется (прочитанность — по
+    chat_participants.broadcast_read_id), в чат пользователя оно
+    подмешивается при чтении.
+    """
     __tablename__ = "chat_messages"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    sender_fio: Mapped[str] = mapped_column(String(255), index=True, nullable=False)
-    recipient_fio: Mapped[str] = mapped_column(String(255), index=True, nullable=False) 
+    conversation_id: Mapped[Optional[int]] = mapped_column(
+        Integer, ForeignKey("conversations.id"), nullable=True
+    )
+    sender_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("chat_participants.id"), nullable=False
+    )
     message: Mapped[str] = mapped_column(Text, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
     is_read: Mapped[bool] = mapped_column(Boolean, default=False)
 
+    __table_args__ = (
+        # история, догрузка новых, последнее сообщение — диапазон по одному диалогу
+        # (объявления — диапазон conversation_id IS NULL того же индекса)
+        Index("ix_chat_messages_conversation", "conversation_id", "id"),
+        # только непрочитанные: пометка «прочитано» и счётчики в списке диалогов
+        Index("ix_chat_messages_unread", "conversation_id", "sender_id",
+              sqlite_where=text("is_read = 0")),
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
-            "sender": self.sender_fio,
-            "recipient": self.recipient_fio,
+            "conversation_id": self.conversation_id,
+            "sender_id": self.sender_id,
             "message": self.message,
             "created_at": self.created_at.strftime("%Y-%m-%d %H:%M"),
             "is_read": self.is_read
         }
 
 
+class ChatUnread(Base):
+    """
+    Число непрочитанных сообщений участника. Ведут триггеры на chat_messages
+    (см. миграции): вставка, пометка «прочитано», удаление — кто бы ни писал.
+    Нет строки — 0. Заменяет COUNT(*) по chat_messages в /api/chat/unread_count.
+    """
+    __tablename__ = "chat_unread"
+
+    participant_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("chat_participants.id"), primary_key=True
+    )
+    unread: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
 # ──────────────────────────────────────────────────────────────────────────────
 # ИНИЦИАЛИЗАЦИЯ/СЕССИИ
 # ──────────────────────────────────────────────────────────────────────────────
-engine = create_engine(DB_URL, echo=False, future=True)
+def _is_sqlite_file(url: str) -> bool:
+    return url.startswith("sqlite") and ":memory:" not in url and url.rstrip("/") != "sqlite:"
+
+
+def make_engine(url: str = DB_URL, profile: str = DB_SQLITE_PROFILE):
+    """
+    Создаёт engine с нужным профилем.
+
+    Для файлового SQLite:
+    - busy timeout драйвера (вместо мгновенного «database is locked»),
+    - пул соединений, чтобы PRAGMA выполнялись один раз на соединение,
+    - при profile="wal" — PRAGMA из SQLITE_PRAGMAS на каждое новое соединение.
+    """
+    if not _is_sqlite_file(url):
+        return create_engine(url, echo=False, future=True)
+
+    eng = create_engine(
+        url,
+        echo=False,
+        future=True,
+        connect_args={
+            "timeout": DB_BUSY_TIMEOUT_MS / 1000.0,
+            "check_same_thread": False,
+        },
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_recycle=3600,
+    )
+
+    if profile == "wal":
+        @event.listens_for(eng, "connect")
+        def _sqlite_on_connect(dbapi_conn, _record):
+            cur = dbapi_conn.cursor()
+            try:
+                for name, value in SQLITE_PRAGMAS:
+                    cur.execute(f"PRAGMA {name}={value}")
+            finally:
+                cur.close()
+
+    return eng
+
+
+engine = make_engine()
 SessionLocal = scoped_session(
     sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 )
 
 
-def init_db() -> None:
-    """
-    Создаёт схемы и необходимые индексы.
-    """
-    if DB_URL.startswith("sqlite"):
-        with engine.connect() as conn:
-            conn.exec_driver_sql("PRAGMA foreign_keys=ON;")
-            conn.commit()
-
-    # 🔄 пересоздаём период-скипы (старое ограничение могло быть только по date+period_code)
-    from sqlalchemy import inspect
-
-    insp = inspect(engine)
-    if "period_skips" in insp.get_table_names():
-        PeriodSkip.__table__.drop(engine, checkfirst=True)
-
-    # создаём все таблицы (если нет)
-    Base.metadata.create_all(engine)
-
-    # индексы для attendance (как было)
-    if DB_URL.startswith("sqlite"):
-        with engine.connect() as conn:
-            conn.exec_driver_sql(
-                "CREATE UNIQUE INDEX IF NOT EXISTS ux_attendance_date_period_student "
-                "ON attendance(date, period_code, student_id);"
-            )
-            conn.exec_driver_sql(
-                "CREATE INDEX IF NOT EXISTS ix_attendance_student_date "
-                "ON attendance(student_id, date);"
-            )
-            conn.exec_driver_sql(
-                "CREATE INDEX IF NOT EXISTS ix_attendance_status_dup "
-                "ON attendance(status);"
-            )
-            conn.commit()
\ No newline at end of file
+def init_db(bind=None) -> None:
+    """
+    Создаёт недостающие таблицы и индексы по текущим моделям.
+
+    Вызывается из baseline-миграции (core/migrations.py), а не на каждом старте.
+    """
+    Base.metadata.create_all(bind if bind is not None else engine)
@@ -0,0 +1,18 @@
+"""
+Общие настройки тестов: отдельная временная БД SQLite.
+
+DB_URL читается models.py при импорте, поэтому окружение задаётся здесь,
+до импорта кода приложения.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+_TMP = tempfile.mkdtemp(prefix="ldo-tests-")
+os.environ["DB_URL"] = f"sqlite:///{Path(_TMP, 'test.db').as_posix()}"
+os.environ.setdefault("REPORT_CACHE_DIR", str(Path(_TMP, "report_cache")))
+os.environ.setdefault("ASSETS_DIR", str(Path(_TMP, "static_build")))
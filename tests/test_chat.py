@@ -0,0 +1,57 @@
+"""Чат техподдержки: опрос /api/chat/updates и SSE-поток /api/chat/stream."""
+import json
+
+import pytest
+
+import core.chat_bp as chat_bp
+from models import SessionLocal, ChatParticipant, Student, get_or_create_group
+from core.chat_broker import chat_broker
+from core.db_init import init_database
+
+STUDENT = "Чатов Студент Тестович"
+
+
+@pytest.fixture(scope="module")
+def student():
+    init_database()
+    with SessionLocal() as s:
+        gid = get_or_create_group(s, "CH-100").id
+        s.add(Student(uid="chat-1", full_name=STUDENT, group_id=gid))
+        s.commit()
+    from app import app
+
+    c = app.test_client()
+    with c.session_transaction() as sess:
+        sess["user"] = {"role": "student", "fio": STUDENT}
+    resp = c.post("/api/chat/send", json={"text": "здравствуйте", "recipient": ""})
+    assert resp.get_json()["ok"]
+    return c, resp.get_json()["id"]
+
+
+def test_updates_bad_last_id(student):
+    c, msg_id = student
+    resp = c.get("/api/chat/updates?last_id=abc")
+    assert resp.status_code == 200
+    assert msg_id in [m["id"] for m in resp.get_json()["messages"]]
+
+
+def test_stream_dedupes_batch(student, monkeypatch):
+    c, msg_id = student
+    monkeypatch.setattr(chat_bp, "CHAT_STREAM_MAX_AGE", 0.5)
+    resp = c.get(f"/api/chat/stream?last_id={msg_id}", buffered=False)
+    chunks = iter(resp.response)
+    assert next(chunks).startswith(b"retry:")  # подписка на тему уже есть
+
+    with SessionLocal() as s:
+        me = s.query(ChatParticipant.id).filter_by(name=STUDENT).scalar()
+        conv = chat_bp._conversation(s, me, chat_bp._support_id(s))
+        payload = {**chat_bp._conversation_after(s, conv.id, 0)[0], "id": msg_id + 1}
+    # то же сообщение и от publish, и от наблюдателя — в одной пачке
+    chat_broker.publish(conv, [payload])
+    chat_broker.publish(conv, [payload])
+
+    events = [
+        json.loads(chunk.decode().split("data: ", 1)[1])
+        for chunk in chunks if b"data: " in chunk
+    ]
+    assert [m["id"] for m in events] == [msg_id + 1]
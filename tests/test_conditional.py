@@ -0,0 +1,41 @@
+"""ETag страниц (core.conditional.page_etag): от чего зависит версия страницы."""
+from datetime import date
+
+import pytest
+
+import core.head_bp as head_bp
+from models import SessionLocal, get_or_create_group
+from core.db_init import init_database
+
+HEAD = "Иванова Галина Петровна"  # легаси-префикс PO- (m007)
+
+
+@pytest.fixture
+def client():
+    init_database()
+    with SessionLocal() as s:
+        get_or_create_group(s, "PO-175")
+        s.commit()
+    from app import app
+
+    c = app.test_client()
+    with c.session_transaction() as sess:
+        sess["user"] = {"role": "head", "fio": HEAD}
+    return c
+
+
+def _etag(client, day: date, minutes: int, monkeypatch) -> str:
+    monkeypatch.setattr(head_bp, "now_minutes", lambda: minutes)
+    resp = client.get(f"/head/group?g=PO-175&day={day}&mode=day")
+    assert resp.status_code == 200
+    return resp.headers["ETag"]
+
+
+def test_head_day_etag_follows_clock_today(client, monkeypatch):
+    today = date.today()
+    assert _etag(client, today, 8 * 60, monkeypatch) != _etag(client, today, 10 * 60, monkeypatch)
+
+
+def test_head_day_etag_stable_for_past_day(client, monkeypatch):
+    past = date(2025, 9, 2)
+    assert _etag(client, past, 8 * 60, monkeypatch) == _etag(client, past, 10 * 60, monkeypatch)
@@ -0,0 +1,55 @@
+"""Потоковая отдача .xlsx (core.excel.stream_workbook): конец потока и обрывы."""
+import io
+import time
+
+import pytest
+from openpyxl import load_workbook
+
+from core import excel
+
+
+def _fill(rows):
+    def fill(wb):
+        ws = wb.create_sheet("Лист")
+        for i in range(rows):
+            ws.append([i, f"строка {i}" * 5])
+    return fill
+
+
+def test_full_workbook():
+    data = b"".join(excel.stream_workbook(_fill(200)))
+    ws = load_workbook(io.BytesIO(data)).active
+    assert ws.max_row == 200
+
+
+def test_fill_error_reaches_client():
+    def fill(wb):
+        raise ValueError("сломалось")
+
+    with pytest.raises(ValueError, match="сломалось"):
+        b"".join(excel.stream_workbook(fill))
+
+
+def test_stalled_client_gets_error(monkeypatch):
+    # мелкие куски и короткая очередь — поток упрётся в медленного клиента
+    monkeypatch.setattr(excel, "STREAM_CHUNK_SIZE", 256)
+    monkeypatch.setattr(excel, "STREAM_QUEUE_CHUNKS", 2)
+    monkeypatch.setattr(excel, "STREAM_PUT_TIMEOUT", 0.05)
+    monkeypatch.setattr(excel, "STREAM_GET_TIMEOUT", 5)
+
+    chunks = excel.stream_workbook(_fill(2000))
+    next(chunks)
+    time.sleep(0.5)
+    with pytest.raises(excel._Cancelled):
+        for _ in chunks:
+            pass
+
+
+def test_silent_producer_times_out(monkeypatch):
+    monkeypatch.setattr(excel, "STREAM_GET_TIMEOUT", 0.1)
+
+    def fill(wb):
+        time.sleep(1)
+
+    with pytest.raises(RuntimeError):
+        b"".join(excel.stream_workbook(fill))
@@ -0,0 +1,72 @@
+"""Движки отчёта summary (attendance_daily) и matrix (NumPy) дают одно и то же."""
+import random
+from datetime import date, time, timedelta
+
+import pytest
+
+from models import (
+    SessionLocal, Attendance, Holiday, PeriodSkip, Student, get_or_create_group,
+)
+from core import summary
+from core.db_init import init_database
+from core.reports import build_group_report
+
+START = date(2025, 3, 3)
+DAYS = 20
+PERIODS = ("p1", "p2", "p3", "p4")
+REASONS = (None, "sick", "заявление", "соревнования", "family", "болел")
+
+
+@pytest.fixture(scope="module")
+def groups():
+    init_database()
+    rnd = random.Random(14)
+    with SessionLocal() as s:
+        main = get_or_create_group(s, "MX-1").id
+        other = get_or_create_group(s, "MX-2").id
+        students = [Student(uid=f"mx-{i}", full_name=f"Матрицын {i:02d}", group_id=main)
+                    for i in range(15)]
+        moved = Student(uid="mx-moved", full_name="Матрицын Переведённый", group_id=other)
+        s.add_all(students + [moved])
+        s.flush()
+        s.execute(Attendance.__table__.insert(), [
+            {"date": START + timedelta(days=k), "period_code": pc, "student_id": st.id,
+             "status": (status := rnd.choice(summary.STATUSES)),
+             "reason": rnd.choice(REASONS) if status in ("absent", "excused") else None,
+             "time": time(8, 10)}
+            for st in students + [moved]
+            for k in range(DAYS) for pc in PERIODS
+            if rnd.random() < 0.9  # часть клеток пустая
+        ])
+        s.add_all([
+            PeriodSkip(date=START + timedelta(days=3), period_code="p2", group_id=main),
+            PeriodSkip(date=START + timedelta(days=5), period_code="p4", group_id=main),
+            Holiday(date=START + timedelta(days=7), group_id=main, title="праздник группы"),
+        ])
+        s.flush()
+        summary.rebuild(s, START, START + timedelta(days=DAYS))
+        s.commit()
+        moved.group_id = main  # перевод после отметок
+        s.commit()
+    return main, other
+
+
+@pytest.mark.parametrize("span", [(0, DAYS - 1), (2, 9), (7, 7)])
+def test_engines_agree(groups, span):
+    start, end = (START + timedelta(days=d) for d in span)
+    for gid in groups:
+        a = build_group_report(gid, start, end, engine="summary")
+        b = build_group_report(gid, start, end, engine="matrix")
+        assert a.students == b.students
+        assert a.stats["counts"] == b.stats["counts"]
+        assert a.stats["pct"] == pytest.approx(b.stats["pct"])
+        assert a.detail["group_pct"] == pytest.approx(b.detail["group_pct"])
+        for ra, rb in zip(a.detail["rows"], b.detail["rows"], strict=True):
+            assert ra == pytest.approx(rb)
+
+
+def test_holiday_and_skips_excluded(groups):
+    main, _ = groups
+    holiday = START + timedelta(days=7)
+    report = build_group_report(main, holiday, holiday, engine="matrix")
+    assert sum(report.stats["counts"].values()) == 0
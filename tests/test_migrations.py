@@ -0,0 +1,65 @@
+"""Версионные миграции: прогон с исходной БД и откат упавшей миграции."""
+import shutil
+import sqlite3
+
+import pytest
+
+from models import make_engine
+from core import migrations
+from conftest import ROOT
+
+TABLES = ("students", "attendance", "period_skips", "users")
+
+
+def _engine(path):
+    return make_engine(f"sqlite:///{path.as_posix()}")
+
+
+def _counts(path) -> dict:
+    with sqlite3.connect(path) as conn:
+        return {t: conn.execute(f"SELECT count(*) FROM {t}").fetchone()[0] for t in TABLES}
+
+
+def _tables(path) -> set:
+    with sqlite3.connect(path) as conn:
+        return {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+
+
+def test_upgrade_from_baseline(tmp_path):
+    """ldo.db из репозитория (до версионных миграций) доводится до актуальной схемы без потерь."""
+    db = tmp_path / "baseline.db"
+    shutil.copy(ROOT / "ldo.db", db)
+    before = _counts(db)
+    eng = _engine(db)
+
+    assert migrations.current_version(eng) == 0
+    assert migrations.upgrade(eng) == [num for num, _, _ in migrations.MIGRATIONS]
+    assert migrations.current_version(eng) == migrations.LATEST_VERSION
+    assert migrations.upgrade(eng) == []  # повторный старт — только SELECT версии
+    eng.dispose()
+    assert _counts(db) == before
+
+
+def test_failed_migration_rolls_back(tmp_path, monkeypatch):
+    db = tmp_path / "fresh.db"
+    eng = _engine(db)
+    migrations.upgrade(eng)
+    latest = migrations.LATEST_VERSION
+
+    def broken(conn):
+        conn.exec_driver_sql("ALTER TABLE period_skips RENAME TO period_skips_old")
+        conn.exec_driver_sql("CREATE TABLE half_done (id INTEGER PRIMARY KEY)")
+        raise RuntimeError("миграция упала посередине")
+
+    monkeypatch.setattr(
+        migrations, "MIGRATIONS", migrations.MIGRATIONS + [(latest + 1, "broken", broken)]
+    )
+    monkeypatch.setattr(migrations, "LATEST_VERSION", latest + 1)
+    with pytest.raises(RuntimeError):
+        migrations.upgrade(eng)
+
+    assert migrations.current_version(eng) == latest
+    eng.dispose()
+    tables = _tables(db)
+    assert "period_skips" in tables
+    assert not {"period_skips_old", "half_done"} & tables
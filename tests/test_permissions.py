@@ -0,0 +1,86 @@
+"""Зоны ответственности: индекс в памяти воркера и проверки старосты."""
+from datetime import date
+
+import pytest
+from sqlalchemy import select
+
+from models import SessionLocal, engine, Attendance, RoleScope, Student, get_or_create_group
+import core.starosta as starosta
+from core import permissions
+from core.db_init import init_database
+from core.schedule import schedule_for
+from core.versions import read_version
+
+STAROSTA = "Старостин Тест"
+CURATOR = "Кураторов Тест"
+MONDAY = date(2025, 9, 1)
+
+
+@pytest.fixture(scope="module")
+def groups():
+    init_database()
+    with SessionLocal() as s:
+        ids = {g: get_or_create_group(s, g).id for g in ("ST-1", "ST-2")}
+        s.add_all(Student(uid=f"st-{g}", full_name=f"Студент {g}", group_id=gid)
+                  for g, gid in ids.items())
+        s.add_all(RoleScope(role="starosta", fio=STAROSTA, group_id=gid) for gid in ids.values())
+        s.commit()
+    permissions.invalidate_scope_cache()
+    return ids
+
+
+def _student_id(code: str) -> int:
+    with SessionLocal() as s:
+        return s.execute(select(Student.id).where(Student.uid == f"st-{code}")).scalar_one()
+
+
+def test_scope_version_bumped_by_triggers(groups):
+    with engine.connect() as conn:
+        before = read_version(conn, "scope")
+    with SessionLocal() as s:
+        s.add(RoleScope(role="curator", fio=CURATOR, group_id=groups["ST-1"]))
+        s.commit()
+    with engine.connect() as conn:
+        assert read_version(conn, "scope") > before
+
+
+def test_index_rebuilt_after_interval(groups, monkeypatch):
+    permissions.get_curator_groups(CURATOR)  # снимок уже есть
+    with SessionLocal() as s:
+        s.add(RoleScope(role="curator", fio=CURATOR, group_id=groups["ST-2"]))
+        s.commit()
+    monkeypatch.setattr(permissions._VERSION, "interval", 0)
+    assert set(permissions.get_curator_groups(CURATOR)) == {"ST-1", "ST-2"}
+
+
+def test_unknown_student_forces_refresh(groups, monkeypatch):
+    monkeypatch.setattr(permissions._VERSION, "interval", 3600)
+    permissions.students_in_starosta_scope(STAROSTA, [])  # снимок без нового студента
+    with SessionLocal() as s:
+        st = Student(uid="st-new", full_name="Новенький", group_id=groups["ST-1"])
+        s.add(st)
+        s.commit()
+        sid = st.id
+    assert permissions.students_in_starosta_scope(STAROSTA, [sid]) == {sid}
+
+
+def test_submit_marks_only_first_group(groups, monkeypatch):
+    """Пара и блокировка — первой группы старосты; студенты второй не отмечаются."""
+    schedule = schedule_for(None, MONDAY)
+    monkeypatch.setattr(starosta, "schedule_for", lambda gid, d: schedule)
+    monkeypatch.setattr(starosta, "current_period_index", lambda schedule: 0)
+    own, other = _student_id("ST-1"), _student_id("ST-2")
+
+    from app import app
+
+    c = app.test_client()
+    with c.session_transaction() as sess:
+        sess["user"] = {"role": "starosta", "fio": STAROSTA}
+    resp = c.post("/starosta/submit", data={"status": "present", "student_ids": [own, other]})
+    assert resp.status_code == 302
+
+    with SessionLocal() as s:
+        marked = set(s.execute(
+            select(Attendance.student_id).where(Attendance.period_code == schedule[0].code)
+        ).scalars())
+    assert own in marked and other not in marked
@@ -0,0 +1,134 @@
+"""
+Планы запросов отчётов, журнала и отметки.
+
+Запросы снимаются с настоящих путей (build_group_report обоих движков,
+day_skips, /journal за день и за диапазон, /checkin) и прогоняются через
+EXPLAIN QUERY PLAN: отметки и снятые пары должны браться по индексам
+группы/студента и даты, без полного перебора attendance / period_skips.
+"""
+import re
+from contextlib import contextmanager
+from datetime import date, time, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from models import SessionLocal, engine, Attendance, PeriodSkip, Student, get_or_create_group
+from core import summary
+from core.db_init import init_database
+from core.reports import build_group_report, day_skips
+
+# куратор из легаси-прав (m007): PO-175 и PO-323
+CURATOR = "Брусенко Владислав Сергеевич"
+GROUPS = ("PO-175", "PO-323", "IS-101")
+DAY = date(2025, 9, 2)
+
+SCAN = re.compile(r"\bSCAN (attendance|period_skips|students)\b")
+
+
+@pytest.fixture(scope="module")
+def gids():
+    init_database()
+    with SessionLocal() as s:
+        ids = {g: get_or_create_group(s, g).id for g in GROUPS}
+        for g, gid in ids.items():
+            s.add_all(
+                Student(uid=f"{g}-{i}", full_name=f"Студент {g} {i:02d}", group_id=gid)
+                for i in range(20)
+            )
+        s.flush()
+        students = [sid for (sid,) in s.query(Student.id)]
+        start = date(2025, 9, 1)
+        s.execute(Attendance.__table__.insert(), [
+            {"date": start + timedelta(days=k), "period_code": pc, "student_id": sid,
+             "status": "present", "time": time(8, 30)}
+            for k in range(30) for sid in students for pc in ("p1", "p2")
+        ])
+        s.add(PeriodSkip(date=DAY, period_code="p2", group_id=ids["PO-175"]))
+        summary.rebuild(s)
+        s.commit()
+    return ids
+
+
+@pytest.fixture
+def client(gids):
+    from app import app
+
+    c = app.test_client()
+    with c.session_transaction() as sess:
+        sess["user"] = {"role": "curator", "fio": CURATOR}
+    return c
+
+
+@contextmanager
+def plans():
+    """Собрать планы всех SELECT по attendance / period_skips / students внутри блока."""
+    stmts = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        stmts.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    found: list[str] = []
+    try:
+        yield found
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    with engine.connect() as conn:
+        for statement, parameters in stmts:
+            if not statement.lstrip().upper().startswith("SELECT"):
+                continue
+            if not re.search(r"\b(attendance|period_skips|students)\b", statement):
+                continue
+            rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+            found.append("\n".join(r[-1] for r in rows))
+
+
+def _check(found: list[str], *indexes: str) -> None:
+    assert found, "запросы не записались"
+    text = "\n".join(found)
+    assert not SCAN.search(text), text
+    for name in indexes:
+        assert f"INDEX {name} " in text, f"{name} не используется:\n{text}"
+
+
+@pytest.mark.parametrize("engine_name", ["summary", "matrix"])
+def test_group_report_day(gids, engine_name):
+    with plans() as found:
+        report = build_group_report(
+            gids["PO-175"], date(2025, 9, 1), date(2025, 12, 31), day=DAY, engine=engine_name,
+        )
+    assert report.day_map and [r.period_code for r in report.skips] == ["p2"]
+    _check(found, "ix_students_group_id", "ix_attendance_student_date",
+           "ix_period_skip_group_date")
+    if engine_name == "summary":
+        _check(found, "sqlite_autoindex_attendance_daily_1")  # PK (student_id, date)
+
+
+def test_day_skips(gids):
+    with plans() as found:
+        with SessionLocal() as s:
+            assert day_skips(s, gids["PO-175"], DAY)
+    _check(found, "ix_period_skip_group_date")
+
+
+@pytest.mark.parametrize("query", ["d=2025-09-02", "d=2025-09-02&g=PO-175"])
+def test_journal_day(client, query):
+    with plans() as found:
+        assert client.get(f"/journal?{query}").status_code == 200
+    _check(found, "ix_students_group_id", "ix_attendance_student_date",
+           "ix_period_skip_group_date")
+
+
+def test_journal_range(client):
+    with plans() as found:
+        resp = client.get("/journal?from=2025-09-01&to=2025-09-07&g=PO-175")
+        assert resp.status_code == 200
+    _check(found, "ix_students_group_id", "ix_attendance_student_date",
+           "ix_period_skip_group_date")
+
+
+def test_checkin(client):
+    with plans() as found:
+        assert client.get("/checkin?g=PO-175").status_code == 200
+    _check(found, "ix_students_group_id")
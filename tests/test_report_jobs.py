@@ -0,0 +1,96 @@
+"""Кэш фоновых отчётов: ключи и их инвалидация."""
+from datetime import date, time
+
+import pytest
+
+from models import SessionLocal, Attendance, Group, Student, get_or_create_group
+from core import report_jobs
+from core.db_init import init_database
+from core.migrations import LATEST_VERSION
+from core.report_jobs import make_job, parse_key, report_state, result_path
+
+START, END = date(2025, 11, 1), date(2025, 11, 30)
+
+
+@pytest.fixture(scope="module")
+def groups():
+    init_database()
+    with SessionLocal() as s:
+        ids = {g: get_or_create_group(s, g).id for g in ("RJ-1", "RJ-2")}
+        s.add_all(Student(uid=f"rj-{g}", full_name=f"Отчётов {g}", group_id=gid)
+                  for g, gid in ids.items())
+        s.commit()
+    return ids
+
+
+def _job(gid, code="RJ-1", fmt="json"):
+    return make_job(gid, code, START, END, fmt, "ноябрь")
+
+
+def _student(s, gid) -> Student:
+    return s.query(Student).filter(Student.group_id == gid).first()
+
+
+def test_key_format(groups):
+    job = _job(groups["RJ-1"])
+    assert job.key.endswith(f"-r{report_jobs.REPORT_FORMAT_VERSION}m{LATEST_VERSION}"
+                            f"v{job.stamp.rsplit('v', 1)[1]}")
+    assert parse_key(job.key) == groups["RJ-1"]
+    assert parse_key("../" + job.key) is None
+    assert parse_key(f"{job.params_key}-v1s1") is None  # ключ до отпечатка кода
+
+
+def test_format_version_changes_key(groups, monkeypatch):
+    before = _job(groups["RJ-1"]).key
+    monkeypatch.setattr(
+        report_jobs, "REPORT_FORMAT_VERSION", report_jobs.REPORT_FORMAT_VERSION + 1
+    )
+    assert _job(groups["RJ-1"]).key != before
+
+
+def test_only_own_group_invalidates(groups):
+    a, b = groups["RJ-1"], groups["RJ-2"]
+    key_a, key_b = _job(a).key, _job(b).key
+
+    with SessionLocal() as s:
+        s.add(Attendance(date=START, period_code="p1", student_id=_student(s, b).id,
+                         status="present", time=time(8, 10)))
+        s.commit()
+    assert _job(a).key == key_a and _job(b).key != key_b
+
+    key_b = _job(b).key
+
+    with SessionLocal() as s:
+        st = _student(s, b)
+        st.password_hash, st.uid = "новый-хэш", "rj-new-uid"  # в отчётах не видно
+        s.commit()
+    assert _job(b).key == key_b
+
+    with SessionLocal() as s:
+        _student(s, b).full_name = "Отчётов Переименованный"
+        s.commit()
+    assert _job(b).key != key_b
+    key_b = _job(b).key
+
+    with SessionLocal() as s:
+        s.get(Group, a).code = "RJ-1A"  # код группы — в заголовке выгрузки
+        s.commit()
+    assert _job(a).key != key_a and _job(b).key == key_b
+
+
+def test_cached_result_pruned_after_change(groups):
+    gid = groups["RJ-2"]
+    report_jobs.REPORT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    old = _job(gid, "RJ-2")
+    assert report_state(old.key)["state"] == "missing"
+    assert report_jobs._run(old)
+    assert report_state(old.key)["state"] == "done" and result_path(old.key) == old.path
+
+    with SessionLocal() as s:
+        s.add(Attendance(date=START, period_code="p2", student_id=_student(s, gid).id,
+                         status="absent", time=time(9, 50)))
+        s.commit()
+    new = _job(gid, "RJ-2")
+    assert new.key != old.key and report_state(new.key)["state"] == "missing"
+    assert report_jobs._run(new)
+    assert not old.path.exists() and new.path.exists()
@@ -0,0 +1,164 @@
+"""Сводка attendance_daily: праздники, переводы студентов, запись из журнала."""
+from datetime import date, time
+
+import pytest
+from sqlalchemy import select
+
+from models import (
+    SessionLocal, Attendance, AttendanceDaily, Group, GroupVersion, Holiday, PeriodSkip, Student,
+    get_or_create_group,
+)
+from core import summary
+from core.db_init import init_database
+from core.reports import build_group_report
+
+WORKDAY = date(2025, 10, 6)
+HOLIDAY = date(2025, 10, 7)
+
+
+@pytest.fixture(scope="module")
+def gid():
+    init_database()
+    with SessionLocal() as s:
+        gid = get_or_create_group(s, "HD-200").id
+        s.add_all(Student(uid=f"hd-{i}", full_name=f"Праздников {i}", group_id=gid)
+                  for i in range(3))
+        s.flush()
+        ids = s.execute(select(Student.id).where(Student.group_id == gid)).scalars().all()
+        s.add_all(
+            Attendance(date=d, period_code="p1", student_id=sid, status=status,
+                       time=time(8, 10))
+            for sid in ids for d, status in ((WORKDAY, "present"), (HOLIDAY, "absent"))
+        )
+        s.flush()
+        summary.rebuild(s)
+        s.commit()
+    return gid
+
+
+def _totals(gid):
+    return {
+        engine: build_group_report(gid, WORKDAY, HOLIDAY, engine=engine).stats["counts"]
+        for engine in ("summary", "matrix")
+    }
+
+
+def _version(s, gid):
+    return s.get(GroupVersion, gid).version if s.get(GroupVersion, gid) else 0
+
+
+@pytest.mark.parametrize("holiday_group", ["group", "college"])
+def test_holiday_excluded(gid, holiday_group):
+    group_id = gid if holiday_group == "group" else None
+    assert _totals(gid)["summary"]["absent"] == 3
+
+    with SessionLocal() as s:
+        before = _version(s, gid)
+        s.add(Holiday(date=HOLIDAY, group_id=group_id, title="праздник"))
+        summary.refresh_holiday(s, HOLIDAY, group_id)
+        s.commit()
+        assert _version(s, gid) > before  # кэш отчётов группы устарел
+    for counts in _totals(gid).values():
+        assert counts["present"] == 3 and counts["absent"] == 0
+
+    with SessionLocal() as s:
+        s.query(Holiday).filter(Holiday.date == HOLIDAY).delete()
+        summary.refresh_holiday(s, HOLIDAY, group_id)
+        s.commit()
+    for counts in _totals(gid).values():
+        assert counts["present"] == 3 and counts["absent"] == 3
+
+
+def test_transfer_counts_in_current_group():
+    """Отметка, поставленная в группе A, после перевода считается за B — в обоих движках."""
+    init_database()
+    with SessionLocal() as s:
+        a = get_or_create_group(s, "TR-A").id
+        b = get_or_create_group(s, "TR-B").id
+        st = Student(uid="tr-1", full_name="Переведённый Студент", group_id=a)
+        s.add(st)
+        s.flush()
+        s.add(Attendance(date=WORKDAY, period_code="p1", student_id=st.id, status="absent",
+                         time=time(8, 10)))
+        s.flush()
+        summary.refresh_daily(s, [(st.id, WORKDAY)])
+        s.commit()
+        st.group_id = b
+        s.commit()
+
+    old, new = _totals(a), _totals(b)
+    assert old["summary"] == old["matrix"]
+    assert new["summary"] == new["matrix"]
+    assert old["summary"]["absent"] == 0 and new["summary"]["absent"] == 1
+
+
+def test_transfer_applies_new_group_skips():
+    """После перевода снятые пары новой группы исключаются и из сводки (как в матрице)."""
+    with SessionLocal() as s:
+        a = get_or_create_group(s, "TS-A").id
+        b = get_or_create_group(s, "TS-B").id
+        st = Student(uid="ts-1", full_name="Переведённый Со Снятой", group_id=a)
+        s.add(st)
+        s.add(PeriodSkip(date=WORKDAY, period_code="p1", group_id=b))
+        s.flush()
+        s.add_all(Attendance(date=WORKDAY, period_code=pc, student_id=st.id, status=status,
+                             time=time(8, 10))
+                  for pc, status in (("p1", "absent"), ("p2", "present")))
+        s.flush()
+        summary.refresh_daily(s, [(st.id, WORKDAY)])
+        s.commit()
+        st.group_id = b
+        s.commit()
+
+    totals = _totals(b)
+    assert totals["summary"] == totals["matrix"]
+    assert totals["summary"]["absent"] == 0 and totals["summary"]["present"] == 1
+
+
+def _daily(group_code: str) -> list:
+    with SessionLocal() as s:
+        return s.execute(
+            select(AttendanceDaily)
+            .join(Student, Student.id == AttendanceDaily.student_id)
+            .join(Group, Group.id == Student.group_id)
+            .where(Group.code == group_code)
+            .order_by(AttendanceDaily.student_id, AttendanceDaily.date)
+        ).scalars().all()
+
+
+def test_route_writes_match_rebuild():
+    """Отметки и снятие пар через журнал поддерживают сводку так же, как полная пересборка."""
+    with SessionLocal() as s:
+        gid = get_or_create_group(s, "PO-323").id
+        s.add_all(Student(uid=f"jr-{i}", full_name=f"Журналов {i}", group_id=gid)
+                  for i in range(3))
+        s.commit()
+        ids = s.execute(select(Student.id).where(Student.uid.like("jr-%"))).scalars().all()
+    from app import app
+
+    c = app.test_client()
+    with c.session_transaction() as sess:
+        sess["user"] = {"role": "curator", "fio": "Брусенко Владислав Сергеевич"}
+    for sid, (pc, status, reason) in zip(ids * 2, [
+        ("p1", "absent", None), ("p1", "excused", "sick"), ("p1", "late", None),
+        ("p2", "present", None), ("p2", "excused", "competition"), ("p2", "absent", None),
+    ]):
+        data = {"d": WORKDAY.isoformat(), "student_id": sid, "period_code": pc,
+                "status": status, "reason": reason or ""}
+        assert c.post("/journal/set", data=data).get_json()["ok"]
+    form = {"d": WORKDAY.isoformat(), "code": "p2", "g": "PO-323"}
+    assert c.post("/journal/skip", data={**form, "on": "1"}).get_json()["ok"]
+
+    def snapshot():
+        return [
+            {k: getattr(r, k) for k in ("student_id", "date", *summary.STATUSES,
+                                        *summary.MISSED_REASONS)}
+            for r in _daily("PO-323") if r.student_id in ids
+        ]
+
+    incremental = snapshot()
+    assert sum(r["absent"] + r["excused"] + r["late"] for r in incremental) == 3  # p2 снята
+    with SessionLocal() as s:
+        summary.rebuild(s, WORKDAY, WORKDAY)
+        s.commit()
+    assert snapshot() == incremental